@@ -0,0 +1,234 @@
+"""Response cache for the ``http.request`` node, following HTTP caching rules.
+
+Only successful ``GET`` responses are stored, and only when their headers
+allow a shared cache to keep them: ``no-store`` and ``private`` responses
+are skipped, as are responses to requests carrying ``Authorization`` unless
+the response is explicitly ``public`` or has ``s-maxage``.  Freshness comes
+from ``s-maxage``/``max-age`` (minus ``Age``) or ``Expires``; a stale entry
+with an ``ETag`` or ``Last-Modified`` validator is kept and revalidated with
+a conditional request, so an unchanged resource costs a ``304`` instead of
+its body.  Responses that name request headers in ``Vary`` are matched on
+those headers.
+
+Entries live in an LRU bounded both by count and by total body size.
+Caching is opt-in per node through its ``cache`` param.
+"""
+
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+
+# Response headers a 304 may update on the stored entry.
+_REVALIDATION_HEADERS = ("cache-control", "expires", "etag", "last-modified", "date", "age")
+
+
+def parse_cache_control(value: str) -> Dict[str, Optional[str]]:
+    """Return the directives of a ``Cache-Control`` header, lower-cased."""
+
+    directives: Dict[str, Optional[str]] = {}
+    for part in value.split(","):
+        name, _, arg = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = arg.strip('"') if arg else None
+    return directives
+
+
+def _seconds(value: Optional[str]) -> Optional[float]:
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _lower(headers: Optional[Dict[str, str]]) -> Dict[str, str]:
+    return {k.lower(): v for k, v in (headers or {}).items()}
+
+
+def freshness_lifetime(headers: Dict[str, str]) -> float:
+    """Return how many seconds a response with ``headers`` stays fresh."""
+
+    directives = parse_cache_control(headers.get("cache-control", ""))
+    if "no-cache" in directives:
+        return 0.0
+    for name in ("s-maxage", "max-age"):
+        lifetime = _seconds(directives.get(name))
+        if lifetime is not None:
+            return lifetime
+    if "expires" in headers:
+        try:
+            expires = parsedate_to_datetime(headers["expires"]).timestamp()
+            date = parsedate_to_datetime(headers["date"]).timestamp()
+        except (KeyError, TypeError, ValueError):
+            return 0.0
+        return max(0.0, expires - date)
+    return 0.0
+
+
+class CachedResponse:
+    """A stored response and the request header values it varies on."""
+
+    __slots__ = ("status", "headers", "body", "vary", "stored_at", "lifetime")
+
+    def __init__(
+        self, status: int, headers: Dict[str, str], body: bytes, vary: Dict[str, str]
+    ) -> None:
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.vary = vary
+        self.refresh(headers)
+
+    def refresh(self, headers: Dict[str, str]) -> None:
+        # ``Age`` is time the response already spent in upstream caches.
+        self.stored_at = time.monotonic() - (_seconds(headers.get("age")) or 0.0)
+        self.lifetime = freshness_lifetime(headers)
+
+    def fresh(self) -> bool:
+        return time.monotonic() - self.stored_at < self.lifetime
+
+    def validators(self) -> Dict[str, str]:
+        """Return the conditional request headers that revalidate this entry."""
+
+        conditional = {}
+        if "etag" in self.headers:
+            conditional["If-None-Match"] = self.headers["etag"]
+        if "last-modified" in self.headers:
+            conditional["If-Modified-Since"] = self.headers["last-modified"]
+        return conditional
+
+
+class HTTPCache:
+    """LRU of cacheable ``GET`` responses.
+
+    Parameters
+    ----------
+    max_entries: int
+        Number of responses kept.
+    max_bytes: int
+        Total size of the stored bodies.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._bytes = 0
+        self.hits = self.misses = self.revalidated = self.evictions = 0
+
+    def _matches(self, entry: CachedResponse, request_headers: Dict[str, str]) -> bool:
+        return all(request_headers.get(name) == value for name, value in entry.vary.items())
+
+    def lookup(
+        self, url: str, request_headers: Optional[Dict[str, str]] = None
+    ) -> Tuple[Optional[CachedResponse], bool]:
+        """Return ``(entry, fresh)`` for a ``GET`` of ``url``.
+
+        A fresh entry can be served as is (a hit); a stale one (``fresh``
+        False, counted as a miss) must be revalidated with
+        :meth:`CachedResponse.validators` first.  A request with
+        ``Cache-Control: no-cache`` always revalidates.
+        """
+
+        request_headers = _lower(request_headers)
+        entry = self._entries.get(url)
+        if entry is None or not self._matches(entry, request_headers):
+            self.misses += 1
+            return None, False
+        self._entries.move_to_end(url)
+        no_cache = "no-cache" in parse_cache_control(request_headers.get("cache-control", ""))
+        if entry.fresh() and not no_cache:
+            self.hits += 1
+            return entry, True
+        self.misses += 1
+        if not entry.validators():
+            self._drop(url)
+            return None, False
+        return entry, False
+
+    def revalidate(self, entry: CachedResponse, headers: Dict[str, str]) -> CachedResponse:
+        """Apply the headers of a ``304`` answer to ``entry`` and return it."""
+
+        for name in _REVALIDATION_HEADERS:
+            if name in headers:
+                entry.headers[name] = headers[name]
+        entry.refresh(entry.headers)
+        self.revalidated += 1
+        return entry
+
+    def store(
+        self,
+        url: str,
+        request_headers: Optional[Dict[str, str]],
+        status: int,
+        headers: Dict[str, str],
+        body: bytes,
+    ) -> bool:
+        """Keep the response if HTTP caching rules allow it; return whether it was kept."""
+
+        request_headers = _lower(request_headers)
+        headers = _lower(headers)
+        response_cc = parse_cache_control(headers.get("cache-control", ""))
+        request_cc = parse_cache_control(request_headers.get("cache-control", ""))
+        vary = [v.strip().lower() for v in headers.get("vary", "").split(",") if v.strip()]
+        storable = (
+            status == 200
+            and "no-store" not in response_cc
+            and "no-store" not in request_cc
+            and "private" not in response_cc
+            and "*" not in vary
+            and len(body) <= self.max_bytes
+            and (
+                "authorization" not in request_headers
+                or "public" in response_cc
+                or "s-maxage" in response_cc
+            )
+        )
+        entry = CachedResponse(
+            status, headers, body, {name: request_headers.get(name) for name in vary}
+        )
+        if not storable or (entry.lifetime <= 0 and not entry.validators()):
+            self._drop(url)
+            return False
+        self._drop(url)
+        self._entries[url] = entry
+        self._bytes += len(body)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted.body)
+            self.evictions += 1
+        return True
+
+    def _drop(self, url: str) -> None:
+        entry = self._entries.pop(url, None)
+        if entry is not None:
+            self._bytes -= len(entry.body)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidated": self.revalidated,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+HTTP_CACHE = HTTPCache()
+
+
+def configure(max_entries: int = 1024, *, max_bytes: int = 64 * 1024 * 1024) -> HTTPCache:
+    """Replace the shared cache."""
+
+    global HTTP_CACHE
+    HTTP_CACHE = HTTPCache(max_entries, max_bytes)
+    return HTTP_CACHE
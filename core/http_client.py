@@ -0,0 +1,476 @@
+"""Natively async HTTP/1.1 client with keep-alive connection pooling.
+
+Node handlers used to run ``urllib`` inside ``asyncio.to_thread``, which costs
+an executor thread and a fresh TCP connection per call.  This client speaks
+HTTP/1.1 directly over :mod:`asyncio` streams instead and keeps idle
+connections per ``(scheme, host, port)`` for reuse.  It is shared by every
+caller of the LiteLLM gateway (``llm.chat``, embeddings) through
+:func:`get_client`.
+
+Requests are retried with exponential backoff on connection errors and on
+``429``/``5xx`` responses, honouring ``Retry-After``.  The ``timeout`` of a
+request bounds the whole exchange including retries.
+:meth:`AsyncHTTPClient.stream` hands out the body incrementally, e.g. for
+server-sent events.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json as jsonlib
+import random
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+_NO_BODY_STATUSES = frozenset({204, 304})
+
+
+class HTTPError(Exception):
+    """Raised by :meth:`Response.raise_for_status` for non-2xx responses."""
+
+    def __init__(self, status: int, body: bytes = b"") -> None:
+        super().__init__(f"HTTP_{status}")
+        self.status = status
+        self.body = body
+
+
+class Response:
+    """Fully read HTTP response."""
+
+    def __init__(self, status: int, headers: Dict[str, str], body: bytes) -> None:
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def json(self) -> Any:
+        return jsonlib.loads(self.body)
+
+    def raise_for_status(self) -> None:
+        if not 200 <= self.status < 300:
+            raise HTTPError(self.status, self.body)
+
+
+class StreamResponse:
+    """HTTP response whose body is read incrementally."""
+
+    def __init__(
+        self,
+        status: int,
+        headers: Dict[str, str],
+        reader: Optional[asyncio.StreamReader],
+        body: Optional[bytes] = None,
+    ) -> None:
+        self.status = status
+        self.headers = headers
+        self._reader = reader
+        self._body = body
+        self.consumed = False
+
+    async def aiter_bytes(self) -> AsyncIterator[bytes]:
+        if self._body is not None:
+            if self._body:
+                yield self._body
+        else:
+            async for chunk in _iter_body(self._reader, self.headers):
+                yield chunk
+        self.consumed = True
+
+    async def aiter_lines(self) -> AsyncIterator[str]:
+        """Yield decoded lines without their line terminators."""
+
+        buffer = b""
+        async for chunk in self.aiter_bytes():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                yield line.rstrip(b"\r").decode("utf-8")
+        if buffer:
+            yield buffer.rstrip(b"\r").decode("utf-8")
+
+    async def aread(self) -> bytes:
+        return b"".join([chunk async for chunk in self.aiter_bytes()])
+
+    def raise_for_status(self) -> None:
+        if not 200 <= self.status < 300:
+            raise HTTPError(self.status)
+
+
+class _Connection:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.reader = reader
+        self.writer = writer
+        self.last_used = time.monotonic()
+
+    def usable(self, idle_timeout_s: float) -> bool:
+        return (
+            not self.writer.is_closing()
+            and not self.reader.at_eof()
+            and time.monotonic() - self.last_used < idle_timeout_s
+        )
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+class _HostPool:
+    def __init__(self, limit: int) -> None:
+        self.idle: Deque[_Connection] = deque()
+        self.slots = asyncio.Semaphore(limit)
+
+
+async def _read_head(reader: asyncio.StreamReader) -> Tuple[int, Dict[str, str]]:
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionResetError("connection closed before response")
+    parts = status_line.decode("latin-1").split(None, 2)
+    status = int(parts[1])
+    headers: Dict[str, str] = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return status, headers
+
+
+async def _iter_body(
+    reader: asyncio.StreamReader, headers: Dict[str, str], chunk_size: int = 65_536
+) -> AsyncIterator[bytes]:
+    """Yield the response body as it arrives (chunked, sized or until EOF)."""
+
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        while True:
+            size = int((await reader.readline()).split(b";", 1)[0].strip(), 16)
+            if size == 0:
+                # Trailers end with an empty line.
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                return
+            yield await reader.readexactly(size)
+            await reader.readexactly(2)
+    elif "content-length" in headers:
+        remaining = int(headers["content-length"])
+        while remaining:
+            chunk = await reader.read(min(remaining, chunk_size))
+            if not chunk:
+                raise asyncio.IncompleteReadError(b"", remaining)
+            remaining -= len(chunk)
+            yield chunk
+    else:
+        while chunk := await reader.read(chunk_size):
+            yield chunk
+
+
+def _keep_alive(headers: Dict[str, str]) -> bool:
+    if headers.get("connection", "").lower() == "close":
+        return False
+    return "content-length" in headers or "transfer-encoding" in headers
+
+
+class AsyncHTTPClient:
+    """Pooled keep-alive HTTP client.
+
+    Parameters
+    ----------
+    max_connections: int
+        Maximum number of concurrently open connections per host.
+    host_limits: dict, optional
+        Per-host overrides of ``max_connections`` keyed by ``"host:port"``
+        or ``"host"``.
+    retries: int
+        Retries after the first attempt for retryable failures.
+    backoff_s: float
+        Base delay of the exponential backoff between retries.
+    idle_timeout_s: float
+        Idle connections older than this are discarded instead of reused.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 64,
+        retries: int = 2,
+        backoff_s: float = 0.2,
+        idle_timeout_s: float = 30.0,
+        host_limits: Optional[Dict[str, int]] = None,
+    ) -> None:
+        self.max_connections = max_connections
+        self.host_limits = dict(host_limits or {})
+        self.retries = retries
+        self.backoff_s = backoff_s
+        self.idle_timeout_s = idle_timeout_s
+        self._pools: Dict[Tuple[str, str, int], _HostPool] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.connections_opened = 0
+
+    # ------------------------------------------------------------------
+    # Connection management
+    # ------------------------------------------------------------------
+
+    def _pool(self, key: Tuple[str, str, int]) -> _HostPool:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Streams and semaphores are bound to the loop that created them.
+            self._pools = {}
+            self._loop = loop
+        pool = self._pools.get(key)
+        if pool is None:
+            _, host, port = key
+            limit = self.host_limits.get(f"{host}:{port}", self.host_limits.get(host))
+            pool = self._pools[key] = _HostPool(limit or self.max_connections)
+        return pool
+
+    async def _connect(self, scheme: str, host: str, port: int) -> _Connection:
+        reader, writer = await asyncio.open_connection(
+            host, port, ssl=True if scheme == "https" else None
+        )
+        self.connections_opened += 1
+        return _Connection(reader, writer)
+
+    def _checkout(self, pool: _HostPool) -> Optional[_Connection]:
+        while pool.idle:
+            conn = pool.idle.pop()
+            if conn.usable(self.idle_timeout_s):
+                return conn
+            conn.close()
+        return None
+
+    def _release(self, pool: _HostPool, conn: _Connection, reusable: bool) -> None:
+        if reusable and not conn.writer.is_closing():
+            conn.last_used = time.monotonic()
+            pool.idle.append(conn)
+        else:
+            conn.close()
+
+    async def aclose(self) -> None:
+        """Close every idle connection."""
+
+        for pool in self._pools.values():
+            while pool.idle:
+                pool.idle.pop().close()
+        self._pools = {}
+
+    # ------------------------------------------------------------------
+    # Requests
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _encode(
+        method: str,
+        host: str,
+        target: str,
+        headers: Optional[Dict[str, str]],
+        body: bytes,
+    ) -> bytes:
+        lines = [f"{method} {target} HTTP/1.1", f"Host: {host}"]
+        merged = {"Connection": "keep-alive", "Content-Length": str(len(body))}
+        merged.update(headers or {})
+        lines.extend(f"{k}: {v}" for k, v in merged.items())
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+    async def _start(
+        self, method: str, url: str, headers: Optional[Dict[str, str]], body: bytes
+    ) -> Tuple[_HostPool, _Connection, int, Dict[str, str]]:
+        """Send the request and read the response head.
+
+        On success the caller owns a pool slot and the connection and must
+        hand both back through :meth:`_finish`.
+        """
+
+        parts = urlsplit(url)
+        scheme = parts.scheme or "http"
+        host = parts.hostname or "localhost"
+        port = parts.port or (443 if scheme == "https" else 80)
+        target = parts.path or "/"
+        if parts.query:
+            target += "?" + parts.query
+        payload = self._encode(method, parts.netloc, target, headers, body)
+
+        pool = self._pool((scheme, host, port))
+        await pool.slots.acquire()
+        conn: Optional[_Connection] = None
+        try:
+            conn = self._checkout(pool)
+            reused = conn is not None
+            if conn is None:
+                conn = await self._connect(scheme, host, port)
+            try:
+                conn.writer.write(payload)
+                await conn.writer.drain()
+                status, resp_headers = await _read_head(conn.reader)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                if not reused:
+                    raise
+                # The server closed an idle keep-alive connection.
+                conn.close()
+                conn = await self._connect(scheme, host, port)
+                conn.writer.write(payload)
+                await conn.writer.drain()
+                status, resp_headers = await _read_head(conn.reader)
+        except BaseException:
+            if conn is not None:
+                conn.close()
+            pool.slots.release()
+            raise
+        return pool, conn, status, resp_headers
+
+    def _finish(self, pool: _HostPool, conn: _Connection, reusable: bool) -> None:
+        self._release(pool, conn, reusable)
+        pool.slots.release()
+
+    def _delay(self, attempt: int, response: Optional[Response]) -> float:
+        if response is not None and "retry-after" in response.headers:
+            try:
+                return float(response.headers["retry-after"])
+            except ValueError:
+                pass
+        return self.backoff_s * (2**attempt) * (0.5 + random.random())
+
+    async def _read_rest(
+        self,
+        method: str,
+        started: Tuple[_HostPool, _Connection, int, Dict[str, str]],
+    ) -> bytes:
+        """Read the remaining body of ``started`` and give the connection back."""
+
+        pool, conn, status, headers = started
+        if method == "HEAD" or status in _NO_BODY_STATUSES:
+            self._finish(pool, conn, _keep_alive(headers))
+            return b""
+        try:
+            body = b"".join([chunk async for chunk in _iter_body(conn.reader, headers)])
+        except BaseException:
+            self._finish(pool, conn, False)
+            raise
+        self._finish(pool, conn, _keep_alive(headers))
+        return body
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        json: Any = None,
+        data: Optional[bytes] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+        retries: Optional[int] = None,
+    ) -> Response:
+        """Send a request and return the final :class:`Response`.
+
+        ``json`` is serialized as the request body.  Retryable failures are
+        retried up to ``retries`` (default :attr:`retries`) times within
+        ``timeout`` seconds; the last response is returned even when its
+        status is an error.
+        """
+
+        async def exchange() -> Response:
+            async with self.stream(
+                method,
+                url,
+                json=json,
+                data=data,
+                headers=headers,
+                timeout=timeout,
+                retries=retries,
+            ) as resp:
+                return Response(resp.status, resp.headers, await resp.aread())
+
+        return await asyncio.wait_for(exchange(), timeout)
+
+    @contextlib.asynccontextmanager
+    async def stream(
+        self,
+        method: str,
+        url: str,
+        *,
+        json: Any = None,
+        data: Optional[bytes] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+        retries: Optional[int] = None,
+    ) -> AsyncIterator[StreamResponse]:
+        """Send a request and yield a :class:`StreamResponse` for its body.
+
+        Retries follow :meth:`request` but only happen before the body is
+        handed out; ``timeout`` bounds the wait for the response head.  The
+        connection returns to the pool if the body was read to the end.
+        """
+
+        headers, body = _prepare(headers, json, data)
+        retries = self.retries if retries is None else retries
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        attempt = 0
+        while True:
+            remaining = None if deadline is None else deadline - loop.time()
+            if remaining is not None and remaining <= 0:
+                raise asyncio.TimeoutError()
+            failed: Optional[Response] = None
+            try:
+                started = await asyncio.wait_for(
+                    self._start(method, url, headers, body), remaining
+                )
+            except (ConnectionError, asyncio.IncompleteReadError):
+                if attempt >= retries:
+                    raise
+            else:
+                status, resp_headers = started[2], started[3]
+                if status not in RETRY_STATUSES or attempt >= retries:
+                    break
+                error_body = await self._read_rest(method, started)
+                failed = Response(status, resp_headers, error_body)
+            delay = self._delay(attempt, failed)
+            if deadline is not None and loop.time() + delay >= deadline:
+                if failed is None:
+                    raise asyncio.TimeoutError()
+                # No time left for another attempt: surface the last answer.
+                yield StreamResponse(failed.status, failed.headers, None, failed.body)
+                return
+            await asyncio.sleep(delay)
+            attempt += 1
+
+        pool, conn, status, resp_headers = started
+        if method == "HEAD" or status in _NO_BODY_STATUSES:
+            stream = StreamResponse(status, resp_headers, None, b"")
+        else:
+            stream = StreamResponse(status, resp_headers, conn.reader)
+        try:
+            yield stream
+        finally:
+            self._finish(pool, conn, stream.consumed and _keep_alive(resp_headers))
+
+
+def _prepare(
+    headers: Optional[Dict[str, str]], json: Any, data: Optional[bytes]
+) -> Tuple[Dict[str, str], bytes]:
+    headers = dict(headers or {})
+    if json is not None:
+        data = jsonlib.dumps(json).encode("utf-8")
+        headers.setdefault("Content-Type", "application/json")
+    return headers, data or b""
+
+
+_DEFAULT: Optional[AsyncHTTPClient] = None
+
+
+def get_client() -> AsyncHTTPClient:
+    """Return the process-wide shared client."""
+
+    global _DEFAULT
+    if _DEFAULT is None:
+        _DEFAULT = AsyncHTTPClient()
+    return _DEFAULT
+
+
+def configure_client(**options: Any) -> AsyncHTTPClient:
+    """Replace the shared client with one built from ``options``."""
+
+    global _DEFAULT
+    _DEFAULT = AsyncHTTPClient(**options)
+    return _DEFAULT
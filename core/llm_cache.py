@@ -0,0 +1,189 @@
+"""Completion cache for the ``llm.chat`` node.
+
+Responses are keyed by a hash of the normalized request body (model, messages
+with whitespace collapsed, temperature) and kept in a size-bounded in-memory
+LRU with a TTL.  An optional SQLite file persists entries across restarts;
+it is written through a :class:`~core.sqlite_writer.SQLiteWriter`, so a cache
+store never blocks the event loop on an fsync.
+
+Caching is opt-in: a node enables it with its ``cache`` param, or
+:func:`configure` turns it on for every call made with ``temperature == 0``
+(the only setting for which a repeated answer is what the caller expects).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.sqlite_writer import SQLiteWriter
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS completions
+    (key TEXT PRIMARY KEY, expires_at REAL NOT NULL, response TEXT NOT NULL);
+"""
+
+
+def cache_key(body: Dict[str, Any]) -> str:
+    """Return the cache key of a chat completion request ``body``."""
+
+    normalized = {
+        "model": body.get("model"),
+        "temperature": float(body.get("temperature", 0)),
+        "messages": [
+            {"role": m.get("role"), "content": " ".join(str(m.get("content", "")).split())}
+            for m in body.get("messages", [])
+        ],
+    }
+    data = json.dumps(normalized, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+class CompletionCache:
+    """TTL-bounded LRU of completion responses.
+
+    Parameters
+    ----------
+    max_entries: int
+        Capacity of the in-memory tier.
+    ttl_s: float
+        Lifetime of an entry in seconds.
+    path: str, optional
+        SQLite file used as persistent tier.
+    """
+
+    def __init__(
+        self, max_entries: int = 1024, ttl_s: float = 3600.0, path: Optional[str] = None
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self.hits = self.misses = self.evictions = 0
+        self._db: Optional[sqlite3.Connection] = None
+        self._writer: Optional[SQLiteWriter] = None
+        if path is not None:
+            self._writer = SQLiteWriter(path, self._write, schema=_SCHEMA, name="llm-cache")
+            self._writer.put(("expire", time.time()))
+            self._db = sqlite3.connect(path, check_same_thread=False)
+
+    def _remember(self, key: str, expires_at: float, response: str) -> None:
+        self._memory[key] = (expires_at, response)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, body: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Return a fresh copy of the cached response for ``body``, if any."""
+
+        key = cache_key(body)
+        now = time.time()
+        entry = self._memory.get(key)
+        if entry is not None and entry[0] <= now:
+            del self._memory[key]
+            entry = None
+        if entry is None and self._writer is not None:
+            entry = self._writer.pending(key)
+            if entry is not None and entry[0] > now:
+                self._remember(key, *entry)
+            else:
+                entry = None
+        if entry is None and self._db is not None:
+            row = self._db.execute(
+                "SELECT expires_at, response FROM completions WHERE key = ? AND expires_at > ?",
+                (key, now),
+            ).fetchone()
+            if row is not None:
+                entry = (row[0], row[1])
+                self._remember(key, *entry)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._memory.move_to_end(key)
+        self.hits += 1
+        return json.loads(entry[1])
+
+    def put(self, body: Dict[str, Any], response: Dict[str, Any]) -> None:
+        key = cache_key(body)
+        expires_at = time.time() + self.ttl_s
+        serialized = json.dumps(response, ensure_ascii=False)
+        self._remember(key, expires_at, serialized)
+        if self._writer is not None:
+            entry = (expires_at, serialized)
+            self._writer.put(("put", (key, entry)), {key: entry})
+
+    def clear(self) -> None:
+        self._memory.clear()
+        if self._writer is not None:
+            self._writer.discard_pending()
+            self._writer.put(("clear", None))
+
+    @staticmethod
+    def _write(connection: sqlite3.Connection, writes: List[Any]) -> None:
+        for kind, arg in writes:
+            if kind == "put":
+                key, (expires_at, response) = arg
+                connection.execute(
+                    "INSERT OR REPLACE INTO completions (key, expires_at, response)"
+                    " VALUES (?, ?, ?)",
+                    (key, expires_at, response),
+                )
+            elif kind == "expire":
+                connection.execute("DELETE FROM completions WHERE expires_at <= ?", (arg,))
+            else:
+                connection.execute("DELETE FROM completions")
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until every write queued so far is committed."""
+
+        return self._writer is None or self._writer.flush(timeout)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._memory),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._db.close()
+            self._writer = self._db = None
+
+
+COMPLETION_CACHE = CompletionCache()
+
+# Cache every call made with ``temperature == 0`` even without the node param.
+CACHE_DETERMINISTIC = False
+
+
+def configure(
+    max_entries: int = 1024,
+    *,
+    ttl_s: float = 3600.0,
+    path: Optional[str] = None,
+    deterministic: bool = False,
+) -> CompletionCache:
+    """Replace the shared cache and set the global ``temperature == 0`` policy."""
+
+    global COMPLETION_CACHE, CACHE_DETERMINISTIC
+    COMPLETION_CACHE.close()
+    COMPLETION_CACHE = CompletionCache(max_entries, ttl_s=ttl_s, path=path)
+    CACHE_DETERMINISTIC = deterministic
+    return COMPLETION_CACHE
+
+
+def should_cache(params: Dict[str, Any]) -> bool:
+    """Return whether an ``llm.chat`` call with ``params`` uses the cache."""
+
+    if params.get("cache", False):
+        return True
+    return CACHE_DETERMINISTIC and params.get("temperature", 0.2) == 0
@@ -0,0 +1,269 @@
+"""In-process metrics registry with Prometheus text exposition.
+
+Counters, gauges and histograms keep one small series object per label
+combination; after the first use of a combination, recording is an attribute
+update plus (for histograms) a ``bisect`` over the bucket bounds.  Series are
+created under a lock, updates take none: they run on the event loop thread,
+and the occasional lost increment from another thread is an accepted cost of
+staying cheap enough to leave on in production.
+
+:data:`METRICS` is the shared registry the runtime records into; callers can
+register extra collectors (e.g. cache statistics read at scrape time) and
+render everything with :meth:`Registry.render`.
+"""
+
+from __future__ import annotations
+
+import bisect
+import math
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Latency buckets in milliseconds.
+LATENCY_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+Sample = Tuple[Dict[str, str], float]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._series: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _new(self) -> object:
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """Return the series of ``values`` (one per label name), creating it once."""
+
+        series = self._series.get(values)
+        if series is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"LABEL_COUNT_MISMATCH:{self.name}")
+            with self._lock:
+                series = self._series.setdefault(values, self._new())
+        return series
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+    def _render(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        return lines + self._render()
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Counter(_Metric):
+    """Monotonic counter; ``labels(...).inc(n)``."""
+
+    kind = "counter"
+
+    def _new(self) -> _Value:
+        return _Value()
+
+    def _render(self) -> List[str]:
+        return [
+            f"{self.name}{_labels(self.labelnames, k)} {_number(s.value)}"
+            for k, s in list(self._series.items())
+        ]
+
+
+class Gauge(Counter):
+    """Value that goes up and down; ``labels(...).inc()/dec()/set()``."""
+
+    kind = "gauge"
+
+
+class _Buckets:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Sequence[float]) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram(_Metric):
+    """Fixed-bucket histogram; ``labels(...).observe(value)``."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS_MS,
+    ) -> None:
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new(self) -> _Buckets:
+        return _Buckets(self.buckets)
+
+    def _render(self) -> List[str]:
+        lines = []
+        for key, series in list(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), series.counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_number(series.sum)}")
+            lines.append(f"{self.name}_count{labels} {series.count}")
+        return lines
+
+
+# A collector returns ``(name, kind, help, samples)`` tuples at scrape time.
+Collector = Callable[[], Iterable[Tuple[str, str, str, List[Sample]]]]
+
+
+class Registry:
+    """Named metrics plus scrape-time collectors."""
+
+    def __init__(self) -> None:
+        self.enabled = True
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Collector] = []
+
+    def _add(self, metric: _Metric) -> _Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._add(Gauge(name, help, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS_MS,
+    ) -> Histogram:
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def register_collector(self, collector: Collector) -> None:
+        self._collectors.append(collector)
+
+    def clear(self) -> None:
+        """Reset every series (metrics and collectors stay registered)."""
+
+        for metric in self._metrics.values():
+            metric.clear()
+
+    def render(self) -> str:
+        """Return all metrics in the Prometheus text exposition format."""
+
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        # Collectors may report the same family (e.g. one cache each).
+        families: Dict[str, Tuple[str, str, List[Sample]]] = {}
+        for collector in self._collectors:
+            for name, kind, help, samples in collector():
+                families.setdefault(name, (kind, help, []))[2].extend(samples)
+        for name, (kind, help, samples) in families.items():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                rendered = _labels(list(labels), list(labels.values()))
+                lines.append(f"{name}{rendered} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Registry()
+
+STEP_LATENCY = METRICS.histogram(
+    "flow_step_latency_ms", "Latency of node executions.", ["node_type"]
+)
+STEPS = METRICS.counter(
+    "flow_steps_total", "Finished node executions by outcome.", ["node_type", "status"]
+)
+STEPS_IN_FLIGHT = METRICS.gauge(
+    "flow_steps_in_flight", "Node executions currently running.", ["node_type"]
+)
+RUN_LATENCY = METRICS.histogram("flow_run_latency_ms", "Latency of whole runs.", ["flow"])
+RUNS = METRICS.counter("flow_runs_total", "Finished runs by outcome.", ["flow", "status"])
+RUNS_IN_FLIGHT = METRICS.gauge("flow_runs_in_flight", "Runs currently executing.")
+TOKENS = METRICS.counter(
+    "llm_tokens_total", "LLM tokens reported by node executions.", ["node_type", "kind"]
+)
+NODE_CACHE = METRICS.counter(
+    "node_cache_lookups_total", "Node-level cache lookups by result.", ["node_type", "result"]
+)
+
+
+def cache_collector(name: str, stats: Callable[[], Optional[Dict[str, float]]]) -> Collector:
+    """Return a collector exporting ``hits``/``misses``/``hit_rate`` of a cache.
+
+    ``stats`` is called at scrape time (so a replaced cache object is picked
+    up) and may return ``None`` when the cache is disabled.
+    """
+
+    def collect():
+        values = stats()
+        if not values:
+            return []
+        labels = {"cache": name}
+        return [
+            ("cache_hits_total", "counter", "Cache hits.", [(labels, values["hits"])]),
+            ("cache_misses_total", "counter", "Cache misses.", [(labels, values["misses"])]),
+            ("cache_hit_ratio", "gauge", "Cache hit rate.", [(labels, values["hit_rate"])]),
+            ("cache_entries", "gauge", "Cached entries in memory.", [(labels, values["entries"])]),
+        ]
+
+    return collect
@@ -25,6 +25,12 @@ NODE_CATALOG: Dict[str, Any] = {
                         "default": 5,
                     },
                     "filters": {"type": "object", "default": {}},
+                    "mode": {
+                        "type": "string",
+                        "enum": ["vector", "lexical", "hybrid", "shortlist"],
+                        "default": "vector",
+                    },
+                    "candidates": {"type": "integer", "minimum": 1, "maximum": 10000},
                 },
                 "required": ["top_k"],
                 "additionalProperties": False,
@@ -42,11 +48,50 @@ NODE_CATALOG: Dict[str, Any] = {
                         "maximum": 2,
                         "default": 0.2,
                     },
+                    "stream": {"type": "boolean", "default": False},
+                    "cache": {"type": "boolean", "default": False},
                 },
                 "required": ["model"],
                 "additionalProperties": False,
             }
         },
+        "http.request": {
+            "schema": {
+                "type": "object",
+                "properties": {
+                    "url": {"type": "string", "minLength": 1},
+                    "method": {"type": "string", "enum": ["GET", "POST"], "default": "GET"},
+                    "headers": {"type": "object", "default": {}},
+                    "body": {},
+                    "cache": {"type": "boolean", "default": False},
+                    "max_bytes": {
+                        "type": "integer",
+                        "minimum": 1,
+                        "maximum": 100 * 1024 * 1024,
+                        "default": 5 * 1024 * 1024,
+                    },
+                },
+                "required": ["url", "method"],
+                "additionalProperties": False,
+            }
+        },
+        "code.exec": {
+            "schema": {
+                "type": "object",
+                "properties": {
+                    "language": {"type": "string", "enum": ["python"], "default": "python"},
+                    "code": {"type": "string", "minLength": 1},
+                    "timeout_ms": {
+                        "type": "integer",
+                        "minimum": 100,
+                        "maximum": 5000,
+                        "default": 3000,
+                    },
+                },
+                "required": ["language", "code"],
+                "additionalProperties": False,
+            }
+        },
         "output": {
             "schema": {
                 "type": "object",
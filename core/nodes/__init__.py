@@ -4,24 +4,51 @@ This module exposes a mapping between node ``type`` strings used in a
 ``FlowSpec`` and the coroutine implementing the node's behaviour.  Tests use
 ``NODE_HANDLERS`` to execute small flows end‑to‑end, so any new node handler
 should be added here.
+
+``code.exec`` runs arbitrary Python on the server, so it is only registered
+once :func:`enable_code_exec` has been called; the web server does that when
+``CODE_EXEC_ENABLED`` is set.
+
+``BATCH_HANDLERS`` maps node types to optional batch variants, called with a
+list of contexts and returning one output per context; the batch runner
+uses them to process many inputs of a flow in one call.
 """
 
 from .input import node_input
 from .output import node_output
 from .llm_chat import node_llm_chat
-from .rag_retrieve import node_rag_retrieve
+from .code_exec import node_code_exec
+from .http_request import node_http_request
+from .rag_retrieve import node_rag_retrieve, node_rag_retrieve_batch
 
 NODE_HANDLERS = {
     "input": node_input,
     "output": node_output,
     "llm.chat": node_llm_chat,
     "rag.retrieve": node_rag_retrieve,
+    "http.request": node_http_request,
+}
+
+BATCH_HANDLERS = {
+    "rag.retrieve": node_rag_retrieve_batch,
 }
 
+
+def enable_code_exec() -> None:
+    """Register the ``code.exec`` handler, which is off by default."""
+
+    NODE_HANDLERS["code.exec"] = node_code_exec
+
+
 __all__ = [
     "node_input",
     "node_output",
     "node_llm_chat",
     "node_rag_retrieve",
+    "node_rag_retrieve_batch",
+    "node_code_exec",
+    "node_http_request",
     "NODE_HANDLERS",
+    "BATCH_HANDLERS",
+    "enable_code_exec",
 ]
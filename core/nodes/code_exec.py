@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+from core import sandbox
+from core.runtime.contracts import NodeContext
+
+
+async def node_code_exec(ctx: NodeContext):
+    """Run a Python snippet in the warm sandbox pool of :mod:`core.sandbox`.
+
+    The snippet sees the step payload as the global ``inputs`` and may fill
+    the global ``artifacts`` dict with JSON-serializable results.  It gets
+    ``timeout_ms`` (at most 5s) or what is left of the step budget, whichever
+    is smaller.  Returns ``{"stdout", "stderr", "artifacts"}``; a snippet
+    that raises fails the step with a ``SandboxError`` carrying its output.
+    """
+
+    language = ctx.params.get("language", "python")
+    if language != "python":
+        raise ValueError(f"UNSUPPORTED_LANGUAGE:{language}")
+    timeout_ms = min(ctx.params.get("timeout_ms", 3000), ctx.timeout_ms)
+    with ctx.span("sandbox.run", timeout_ms=timeout_ms):
+        result = await sandbox.get_pool().run(ctx.params["code"], ctx.inputs, timeout_ms)
+    if result["stderr"]:
+        ctx.logger(result["stderr"].rstrip()[-500:])
+    return result
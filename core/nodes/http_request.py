@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, Optional
+
+from core import http_cache
+from core.http_client import AsyncHTTPClient, HTTPError
+from core.runtime.contracts import NodeContext
+
+# Largest response body read when the node does not set ``max_bytes``.
+MAX_RESPONSE_BYTES = 5 * 1024 * 1024
+
+# Methods retried on connection errors and 429/5xx answers.
+_IDEMPOTENT = frozenset({"GET", "HEAD"})
+
+# Methods the node may send; the catalog's ``method`` enum lists the same.
+METHODS = frozenset({"GET", "POST"})
+
+_CLIENT: Optional[AsyncHTTPClient] = None
+
+
+def get_client() -> AsyncHTTPClient:
+    """Return the client used by ``http.request``, separate from the gateway's."""
+
+    global _CLIENT
+    if _CLIENT is None:
+        _CLIENT = AsyncHTTPClient(max_connections=16)
+    return _CLIENT
+
+
+def configure_client(**options: Any) -> AsyncHTTPClient:
+    """Replace the ``http.request`` client, e.g. with ``host_limits``."""
+
+    global _CLIENT
+    _CLIENT = AsyncHTTPClient(**options)
+    return _CLIENT
+
+
+def _decode(headers: Dict[str, str], body: bytes) -> Any:
+    if "json" in headers.get("content-type", "") and body:
+        return json.loads(body)
+    return body.decode("utf-8", errors="replace")
+
+
+async def node_http_request(ctx: NodeContext):
+    """Call an HTTP API and return ``{"status", "headers", "body", "cache_hit"}``.
+
+    Requests go through a dedicated pooled client: connections are kept
+    alive per host and at most ``max_connections`` (or the host's entry in
+    ``host_limits``, see :func:`configure_client`) are open to one host, so
+    many concurrent runs queue instead of flooding an internal service.
+    Only ``GET`` and ``POST`` are sent and only ``GET`` is retried; another
+    method fails with ``UNSUPPORTED_METHOD`` and an empty ``url`` with
+    ``URL_REQUIRED`` before anything is sent.  The body is read incrementally and the step
+    fails with ``RESPONSE_TOO_LARGE`` once it exceeds ``max_bytes``; JSON
+    bodies are decoded, anything else is returned as text.  Non-2xx answers
+    fail the step with ``HTTP_<status>``.
+
+    With the ``cache`` param, ``GET`` responses are served from and stored in
+    :mod:`core.http_cache` according to their ``Cache-Control``/``ETag``
+    headers; stale entries are revalidated with a conditional request.
+    """
+
+    method = ctx.params.get("method", "GET").upper()
+    if method not in METHODS:
+        raise ValueError(f"UNSUPPORTED_METHOD:{method}")
+    url = ctx.params["url"]
+    if not url:
+        raise ValueError("URL_REQUIRED")
+    headers = dict(ctx.params.get("headers") or {})
+    max_bytes = ctx.params.get("max_bytes", MAX_RESPONSE_BYTES)
+    body = ctx.params.get("body")
+    data = None
+    if isinstance(body, (bytes, str)):
+        data = body.encode("utf-8") if isinstance(body, str) else body
+        body = None
+
+    cache = http_cache.HTTP_CACHE if ctx.params.get("cache", False) and method == "GET" else None
+    entry = None
+    if cache is not None:
+        entry, fresh = cache.lookup(url, headers)
+        if fresh:
+            ctx.annotations["cache_hit"] = True
+            return {
+                "status": entry.status,
+                "headers": dict(entry.headers),
+                "body": _decode(entry.headers, entry.body),
+                "cache_hit": True,
+            }
+        if entry is not None:
+            headers.update(entry.validators())
+
+    with ctx.span("http.request", method=method, url=url) as span:
+        async with get_client().stream(
+            method,
+            url,
+            json=body,
+            data=data,
+            headers=headers,
+            timeout=ctx.timeout_ms / 1000,
+            retries=None if method in _IDEMPOTENT else 0,
+        ) as resp:
+            length = resp.headers.get("content-length")
+            if length is not None and int(length) > max_bytes:
+                raise ValueError("RESPONSE_TOO_LARGE")
+            chunks = []
+            size = 0
+            async for chunk in resp.aiter_bytes():
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ValueError("RESPONSE_TOO_LARGE")
+                chunks.append(chunk)
+        span.set(status=resp.status, bytes=size)
+
+    if cache is not None:
+        ctx.annotations["cache_hit"] = resp.status == 304 and entry is not None
+    if resp.status == 304 and entry is not None:
+        cache.revalidate(entry, resp.headers)
+        ctx.logger("revalidated cached response")
+        return {
+            "status": entry.status,
+            "headers": dict(entry.headers),
+            "body": _decode(entry.headers, entry.body),
+            "cache_hit": True,
+        }
+    content = b"".join(chunks)
+    if not 200 <= resp.status < 300:
+        raise HTTPError(resp.status, content)
+    if cache is not None:
+        cache.store(url, ctx.params.get("headers"), resp.status, resp.headers, content)
+    return {
+        "status": resp.status,
+        "headers": resp.headers,
+        "body": _decode(resp.headers, content),
+        "cache_hit": False,
+    }
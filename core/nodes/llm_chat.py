@@ -2,15 +2,84 @@ from __future__ import annotations
 
 import asyncio
 import json
-from urllib import request
+import time
+from typing import Any, Dict
 
+from core import llm_cache
+from core.http_client import get_client
 from core.runtime.contracts import NodeContext
 
 LITELLM_URL = "http://localhost:4000/v1/chat/completions"
 
 
+async def _stream_completion(ctx: NodeContext, body: Dict[str, Any]) -> Dict[str, Any]:
+    """Consume an SSE chat completion, emitting a ``step_token`` per delta.
+
+    The returned dict mirrors a non-streaming completion so callers can treat
+    both modes alike.
+    """
+
+    body = dict(body, stream=True, stream_options={"include_usage": True})
+    pieces = []
+    last: Dict[str, Any] = {}
+    usage = None
+    finish_reason = None
+    start = time.perf_counter()
+    async with get_client().stream(
+        "POST", LITELLM_URL, json=body, timeout=ctx.timeout_ms / 1000
+    ) as resp:
+        if not 200 <= resp.status < 300:
+            await resp.aread()
+            resp.raise_for_status()
+        async for line in resp.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                continue
+            last = json.loads(data)
+            usage = last.get("usage") or usage
+            for choice in last.get("choices") or ():
+                finish_reason = choice.get("finish_reason") or finish_reason
+                token = (choice.get("delta") or {}).get("content")
+                if token:
+                    if not pieces:
+                        ttft_ms = (time.perf_counter() - start) * 1000
+                        ctx.logger(f"first token after {ttft_ms:.0f}ms")
+                    pieces.append(token)
+                    ctx.emit({"type": "step_token", "node_id": ctx.node_id, "token": token})
+    text = "".join(pieces)
+    return {
+        "id": last.get("id"),
+        "object": "chat.completion",
+        "model": last.get("model", body["model"]),
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": finish_reason,
+            }
+        ],
+        "usage": usage,
+    }
+
+
 async def node_llm_chat(ctx: NodeContext):
-    """Call the LiteLLM gateway to get a chat completion using standard library."""
+    """Call the LiteLLM gateway to get a chat completion.
+
+    The request goes through the shared pooled client from
+    :mod:`core.http_client`, so concurrent runs reuse keep-alive connections
+    and transient ``429``/``5xx`` answers are retried within ``ctx.timeout_ms``.
+    With ``stream`` enabled the completion is read as server-sent events and
+    every content delta is forwarded as a ``step_token`` event through
+    ``ctx.emit``; the returned payload is the same in both modes.
+
+    Calls opted into :mod:`core.llm_cache` (``cache`` param, or globally for
+    ``temperature == 0``) are answered from the cache when possible; the
+    result and the step event carry a ``cache_hit`` flag.  Calls that reach
+    the gateway also annotate the step event with the reported
+    ``token_usage``.
+    """
 
     body = {
         "model": ctx.params.get("model", "gpt-4o-mini"),
@@ -25,16 +94,40 @@ async def node_llm_chat(ctx: NodeContext):
         ],
         "temperature": ctx.params.get("temperature", 0.2),
     }
-    ctx.logger("calling litellm...")
+    use_cache = llm_cache.should_cache(ctx.params)
+    with ctx.span("llm_cache.get", enabled=use_cache):
+        cached = llm_cache.COMPLETION_CACHE.get(body) if use_cache else None
+    ctx.annotations["cache_hit"] = cached is not None
+    if cached is not None:
+        ctx.logger("completion cache hit")
+        text = cached["choices"][0]["message"]["content"]
+        if ctx.params.get("stream", False):
+            ctx.emit({"type": "step_token", "node_id": ctx.node_id, "token": text})
+        return {"text": text, "raw": cached, "cache_hit": True}
 
-    def _call():
-        data = json.dumps(body).encode("utf-8")
-        req = request.Request(
-            LITELLM_URL, data=data, headers={"Content-Type": "application/json"}
+    ctx.logger("calling litellm...")
+    stream = ctx.params.get("stream", False)
+    with ctx.span("litellm.request", model=body["model"], stream=stream) as span:
+        if stream:
+            data = await asyncio.wait_for(_stream_completion(ctx, body), ctx.timeout_ms / 1000)
+        else:
+            resp = await get_client().request(
+                "POST", LITELLM_URL, json=body, timeout=ctx.timeout_ms / 1000
+            )
+            resp.raise_for_status()
+            with ctx.span("json.decode"):
+                data = resp.json()
+    if use_cache:
+        llm_cache.COMPLETION_CACHE.put(body, data)
+    usage = data.get("usage")
+    if usage:
+        ctx.annotations["token_usage"] = {
+            "prompt": usage.get("prompt_tokens", 0),
+            "completion": usage.get("completion_tokens", 0),
+        }
+        span.set(
+            prompt_tokens=usage.get("prompt_tokens", 0),
+            completion_tokens=usage.get("completion_tokens", 0),
         )
-        with request.urlopen(req, timeout=ctx.timeout_ms / 1000) as resp:
-            return json.loads(resp.read())
-
-    data = await asyncio.to_thread(_call)
     text = data["choices"][0]["message"]["content"]
-    return {"text": text, "raw": data}
+    return {"text": text, "raw": data, "cache_hit": False}
@@ -1,9 +1,23 @@
 from __future__ import annotations
 
+from typing import Any, Dict, List
+
 from core.runtime.contracts import NodeContext
 from core import vector_store
 
 
+def _query_text(inputs: Any) -> str:
+    return inputs.get("message") if isinstance(inputs, dict) else str(inputs)
+
+
+def _with_citations(chunks: List[Dict[str, Any]]) -> Dict[str, Any]:
+    citations = [
+        {"source": c.get("meta", {}).get("source"), "page": c.get("meta", {}).get("page")}
+        for c in chunks
+    ]
+    return {"chunks": chunks, "citations": citations}
+
+
 async def node_rag_retrieve(ctx: NodeContext):
     """Retrieve relevant chunks from the in-memory vector store.
 
@@ -12,19 +26,42 @@ async def node_rag_retrieve(ctx: NodeContext):
     those functions or use the provided in-memory implementation.  The node
     returns the retrieved chunks together with a list of citation dictionaries
     as described in the prototype specification.
+
+    The ``mode`` param picks vector, lexical (BM25), hybrid or
+    lexically-shortlisted retrieval, see :func:`core.vector_store.query`.
     """
 
-    query_text = (
-        ctx.inputs.get("message") if isinstance(ctx.inputs, dict) else str(ctx.inputs)
-    )
-    embedding = await vector_store.embed(query_text)
+    text = _query_text(ctx.inputs)
+    mode = ctx.params.get("mode", "vector")
+    embedding = None if mode == "lexical" else await vector_store.embed(text)
     chunks = await vector_store.query(
-        embedding, top_k=ctx.params["top_k"], filters=ctx.params.get("filters", {})
+        embedding,
+        top_k=ctx.params["top_k"],
+        filters=ctx.params.get("filters", {}),
+        text=text,
+        mode=mode,
+        candidates=ctx.params.get("candidates"),
     )
     ctx.logger(f"retrieved {len(chunks)} chunks")
-    citations = [
-        {"source": c.get("meta", {}).get("source"), "page": c.get("meta", {}).get("page")}
-        for c in chunks
-    ]
-    return {"chunks": chunks, "citations": citations}
+    return _with_citations(chunks)
 
+
+async def node_rag_retrieve_batch(ctxs: List[NodeContext]):
+    """Batch variant of :func:`node_rag_retrieve` used by the batch runner.
+
+    All contexts belong to the same node, so they share ``top_k`` and
+    ``filters``: the questions are embedded with one ``embed_many`` call and
+    searched with one ``query_many`` call.  Modes other than ``vector`` are
+    answered one node at a time.
+    """
+
+    params = ctxs[0].params
+    if params.get("mode", "vector") != "vector":
+        return [await node_rag_retrieve(ctx) for ctx in ctxs]
+    embeddings = await vector_store.embed_many([_query_text(ctx.inputs) for ctx in ctxs])
+    results = await vector_store.query_many(
+        embeddings, top_k=params["top_k"], filters=params.get("filters", {})
+    )
+    for ctx, chunks in zip(ctxs, results):
+        ctx.logger(f"retrieved {len(chunks)} chunks")
+    return [_with_citations(chunks) for chunks in results]
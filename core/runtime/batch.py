@@ -0,0 +1,243 @@
+"""Run one flow over many inputs.
+
+:func:`run_batch` plans the flow once and feeds the inputs through it in
+chunks of ``batch_size``.  A chunk moves through the plan one node at a
+time: nodes with a batch handler (see ``core.nodes.BATCH_HANDLERS``) are
+called once for the whole chunk, others once per item concurrently.  Up to
+``concurrency`` chunks are in flight; results are yielded in input order as
+soon as their chunk completes, and inputs are only read as fast as results
+are consumed, so memory stays flat however long the input stream is.
+
+A failing item is reported with its error and skipped by later nodes; the
+rest of its chunk carries on.  An input that could not even be read (say, a
+malformed JSON line) is passed as an :class:`InvalidInput` and reported as
+failed in its place.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import uuid
+from collections import deque
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Union,
+)
+
+from .contracts import NodeContext, NodeHandler
+from .engine import StepTimeout, _RunState
+from .plan import ExecutionPlan, PlanStep, build_plan
+
+BatchHandler = Callable[[List[NodeContext]], Any]
+
+
+class InvalidInput:
+    """Stand-in for an unreadable input; reported as failed with ``error``."""
+
+    def __init__(self, error: str) -> None:
+        self.error = error
+
+
+def _topological_order(plan: ExecutionPlan) -> List[int]:
+    if plan.linear:
+        return list(plan.chain)
+    waiting = [len(s.predecessors) for s in plan.steps]
+    ready = [i for i, n in enumerate(waiting) if n == 0]
+    order = []
+    while ready:
+        i = ready.pop(0)
+        order.append(i)
+        for succ in plan.steps[i].successors:
+            waiting[succ] -= 1
+            if waiting[succ] == 0:
+                ready.append(succ)
+    return order
+
+
+async def _chunks(inputs: Union[Iterable, AsyncIterable], size: int) -> AsyncIterator[List]:
+    chunk: List[Any] = []
+    if hasattr(inputs, "__aiter__"):
+        async for item in inputs:
+            chunk.append(item)
+            if len(chunk) == size:
+                yield chunk
+                chunk = []
+    else:
+        for item in inputs:
+            chunk.append(item)
+            if len(chunk) == size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+class _Chunk:
+    """Inputs of one chunk and the outputs its items produced so far."""
+
+    def __init__(self, first: int, items: List[Any], steps: int) -> None:
+        self.first = first
+        self.items = items
+        self.outputs: List[List[Any]] = [[None] * steps for _ in items]
+        self.errors: List[Optional[str]] = [
+            item.error if isinstance(item, InvalidInput) else None for item in items
+        ]
+
+
+async def _call(step: PlanStep, handler: Any, arg: Any, timeout_ms: int) -> Any:
+    if handler is None:
+        raise KeyError(f"No handler for node type {step.type}")
+    timer = asyncio.timeout(timeout_ms / 1000)
+    try:
+        async with timer:
+            return await handler(arg)
+    except asyncio.TimeoutError:
+        # A TimeoutError of the handler's own is a failure, not a step timeout.
+        if not timer.expired():
+            raise
+        raise StepTimeout(f"STEP_TIMED_OUT:{step.node_id}") from None
+
+
+async def _run_chunk(
+    plan: ExecutionPlan,
+    order: List[int],
+    chunk: _Chunk,
+    state: _RunState,
+    batch_handlers: Dict[str, BatchHandler],
+) -> List[Dict[str, Any]]:
+    steps = plan.steps
+    for i in order:
+        step = steps[i]
+        alive = [j for j, error in enumerate(chunk.errors) if error is None]
+        if not alive:
+            break
+        payloads = []
+        for j in alive:
+            preds = step.predecessors
+            if not preds:
+                payloads.append(chunk.items[j])
+            elif len(preds) == 1:
+                payloads.append(chunk.outputs[j][preds[0]])
+            else:
+                payloads.append({steps[p].node_id: chunk.outputs[j][p] for p in preds})
+        timeout_ms = step.timeout_ms if step.timeout_ms is not None else state.timeout_ms
+        ctxs = [
+            state.context(step, payload, timeout_ms, run_id=f"{state.run_id}-{chunk.first + j}")
+            for j, payload in zip(alive, payloads)
+        ]
+
+        batch = batch_handlers.get(step.type)
+        if batch is not None:
+            try:
+                results = list(await _call(step, batch, ctxs, timeout_ms))
+                if len(results) != len(ctxs):
+                    raise ValueError("BATCH_RESULT_COUNT_MISMATCH")
+            except Exception as exc:
+                results = [exc] * len(ctxs)
+        else:
+            results = await asyncio.gather(
+                *(_call(step, step.handler, ctx, timeout_ms) for ctx in ctxs),
+                return_exceptions=True,
+            )
+
+        for j, result in zip(alive, results):
+            if isinstance(result, Exception):
+                chunk.errors[j] = str(result) or type(result).__name__
+            else:
+                chunk.outputs[j][i] = result
+
+    records = []
+    for j, error in enumerate(chunk.errors):
+        record: Dict[str, Any] = {"index": chunk.first + j}
+        if error is not None:
+            record.update(status="failed", error=error)
+        elif len(plan.sinks) == 1:
+            record.update(status="succeeded", output=chunk.outputs[j][plan.sinks[0]])
+        else:
+            outputs = {steps[s].node_id: chunk.outputs[j][s] for s in plan.sinks}
+            record.update(status="succeeded", output=outputs)
+        records.append(record)
+    return records
+
+
+async def run_batch(
+    flow: Union[Dict[str, Any], ExecutionPlan],
+    inputs: Union[Iterable, AsyncIterable],
+    handlers: Dict[str, NodeHandler],
+    batch_handlers: Optional[Dict[str, BatchHandler]] = None,
+    *,
+    batch_size: int = 32,
+    concurrency: int = 4,
+    batch_id: Optional[str] = None,
+    user: Optional[Dict[str, Any]] = None,
+    secrets: Optional[Dict[str, str]] = None,
+    logger: Optional[Callable[[str], None]] = None,
+    timeout_ms: int = 30_000,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Execute ``flow`` once per input and yield one result per input, in order.
+
+    Parameters
+    ----------
+    flow: dict or ExecutionPlan
+        Compiled plan or flow specification, as for ``run_flow``.
+    inputs: iterable or async iterable
+        Initial payloads; consumed lazily.
+    handlers: dict
+        Mapping of node ``type`` to handler, used when ``flow`` is not a plan.
+    batch_handlers: dict, optional
+        Mapping of node ``type`` to a handler taking a list of contexts and
+        returning a list of outputs.  Preferred over the plain handler.
+    batch_size: int, optional
+        Number of inputs processed together by each node.
+    concurrency: int, optional
+        Number of chunks in flight.
+    batch_id: str, optional
+        Prefix of the per-item run ids (``<batch_id>-<index>``).
+    timeout_ms: int, optional
+        Timeout of each node call (for batch handlers, of the whole chunk).
+
+    Yields
+    ------
+    dict
+        ``{"index", "status": "succeeded", "output"}`` or
+        ``{"index", "status": "failed", "error"}``.
+    """
+
+    plan = flow if isinstance(flow, ExecutionPlan) else build_plan(flow, handlers)
+    order = _topological_order(plan)
+    state = _RunState(
+        batch_id or uuid.uuid4().hex,
+        lambda event: None,
+        user or {},
+        secrets or {},
+        logger or (lambda msg: None),
+        timeout_ms,
+        None,
+        False,
+    )
+    batch_handlers = batch_handlers or {}
+    pending: "deque[asyncio.Task]" = deque()
+    first = 0
+    try:
+        async for items in _chunks(inputs, max(1, batch_size)):
+            chunk = _Chunk(first, items, len(plan.steps))
+            first += len(items)
+            pending.append(
+                asyncio.ensure_future(_run_chunk(plan, order, chunk, state, batch_handlers))
+            )
+            if len(pending) >= max(1, concurrency):
+                for record in await pending.popleft():
+                    yield record
+        while pending:
+            for record in await pending.popleft():
+                yield record
+    finally:
+        for task in pending:
+            task.cancel()
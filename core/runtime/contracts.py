@@ -2,6 +2,8 @@ from __future__ import annotations
 
 from typing import Any, Awaitable, Callable, Dict
 
+from core import tracing
+
 
 class NodeContext:
     """Execution context passed to each node handler.
@@ -16,6 +18,10 @@ class NodeContext:
         logger: Callable used to log debug information.
         emit: Callable used to stream events back to the runtime.
         timeout_ms: Maximum time allowed for the node to run in milliseconds.
+        annotations: Extra fields the handler wants attached to its
+            ``step_succeeded`` event (e.g. ``cache_hit``).
+
+    Handlers time their stages with :meth:`span`; see :mod:`core.tracing`.
     """
 
     def __init__(
@@ -39,6 +45,12 @@ class NodeContext:
         self.logger = logger
         self.emit = emit
         self.timeout_ms = timeout_ms
+        self.annotations: Dict[str, Any] = {}
+
+    def span(self, name: str, **attributes: Any):
+        """Open a child span of this step (a no-op when the run is not traced)."""
+
+        return tracing.span(name, **attributes)
 
 
 NodeHandler = Callable[[NodeContext], Awaitable[Any]]
@@ -1,14 +1,319 @@
 from __future__ import annotations
 
+import asyncio
 import time
 import uuid
-from typing import Any, Callable, Dict, Optional
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple, Union
+
+from core import tracing
+from core.metrics import (
+    METRICS,
+    NODE_CACHE,
+    RUN_LATENCY,
+    RUNS,
+    RUNS_IN_FLIGHT,
+    STEP_LATENCY,
+    STEPS,
+    STEPS_IN_FLIGHT,
+    TOKENS,
+)
 
 from .contracts import NodeContext, NodeHandler
+from .plan import ExecutionPlan, PlanStep, build_plan
+
+
+# Node types whose handlers can safely run twice for the same input.
+HEDGEABLE_TYPES = {"llm.chat", "rag.retrieve"}
+
+
+class StepTimeout(asyncio.TimeoutError):
+    """Raised when a step exceeds its own timeout or the run deadline."""
+
+
+class LatencyTracker:
+    """Sliding window of recent step latencies per node type.
+
+    Parameters
+    ----------
+    window: int
+        Number of latest samples kept per node type.
+    min_samples: int
+        Samples required before :meth:`quantile` returns an estimate.
+    """
+
+    def __init__(self, window: int = 256, min_samples: int = 20) -> None:
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[str, Deque[float]] = {}
+
+    def observe(self, node_type: str, latency_ms: float) -> None:
+        samples = self._samples.get(node_type)
+        if samples is None:
+            samples = self._samples[node_type] = deque(maxlen=self.window)
+        samples.append(latency_ms)
+
+    def quantile(self, node_type: str, q: float) -> Optional[float]:
+        samples = self._samples.get(node_type)
+        if samples is None or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def clear(self) -> None:
+        self._samples.clear()
+
+
+# Latencies observed by every run, used to pick hedging delays.
+LATENCIES = LatencyTracker()
+
+
+class _RunState:
+    """Per-run settings shared by all steps of one ``run_flow`` call."""
+
+    def __init__(
+        self,
+        run_id: str,
+        emit: Callable[[Dict[str, Any]], None],
+        user: Dict[str, Any],
+        secrets: Dict[str, str],
+        logger: Callable[[str], None],
+        timeout_ms: int,
+        deadline: Optional[float],
+        hedge: bool,
+    ) -> None:
+        self.run_id = run_id
+        self.emit = emit
+        self.user = user
+        self.secrets = secrets
+        self.logger = logger
+        self.timeout_ms = timeout_ms
+        self.deadline = deadline
+        self.hedge = hedge
+
+    def context(
+        self, step: PlanStep, payload: Any, timeout_ms: int, run_id: Optional[str] = None
+    ) -> NodeContext:
+        prefix = f"[{step.node_id}] "
+        logger = self.logger
+        return NodeContext(
+            run_id=run_id or self.run_id,
+            node_id=step.node_id,
+            inputs=payload,
+            params=step.params,
+            secrets=self.secrets,
+            user=self.user,
+            logger=lambda m: logger(prefix + m),
+            emit=self.emit,
+            timeout_ms=timeout_ms,
+        )
+
+
+async def _hedged(
+    state: _RunState, step: PlanStep, payload: Any, budget_ms: int
+) -> Tuple[NodeContext, Any]:
+    """Run ``step`` and, if it is slower than the p95 of its type, a second copy.
+
+    Returns the context and result of the first attempt that succeeds; the
+    other attempt is cancelled.  Only the first attempt emits events so that
+    streamed output is not duplicated.
+    """
+
+    async def attempt(ctx: NodeContext) -> Tuple[NodeContext, Any]:
+        return ctx, await step.handler(ctx)
+
+    primary = state.context(step, payload, budget_ms)
+    delay = LATENCIES.quantile(step.type, 0.95)
+    if delay is None or delay >= budget_ms:
+        return await attempt(primary)
+
+    tasks = [asyncio.ensure_future(attempt(primary))]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay / 1000)
+        if not done:
+            backup = state.context(step, payload, budget_ms - int(delay))
+            backup.emit = lambda event: None
+            tasks.append(asyncio.ensure_future(attempt(backup)))
+        error: Optional[BaseException] = None
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    ctx, result = task.result()
+                    if len(tasks) > 1:
+                        ctx.annotations["hedged"] = True
+                    return ctx, result
+                error = error or task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def _execute_step(state: _RunState, step: PlanStep, payload: Any) -> Any:
+    """Run a single plan step, emitting its step events, and return its output.
+
+    The step gets its own timeout (``timeout_ms`` of the node, else of the
+    run) capped by what is left of the run deadline; that budget is what
+    the handler sees as ``ctx.timeout_ms``.  Hedgeable steps may be
+    duplicated by :func:`_hedged`.
+    """
+
+    node_id = step.node_id
+    handler = step.handler
+    if handler is None:
+        raise KeyError(f"No handler for node type {step.type}")
+
+    emit = state.emit
+    budget_ms = step.timeout_ms if step.timeout_ms is not None else state.timeout_ms
+    if state.deadline is not None:
+        remaining = int((state.deadline - time.monotonic()) * 1000)
+        budget_ms = min(budget_ms, remaining)
+    hedge = step.hedge
+    if hedge is None:
+        hedge = state.hedge and step.type in HEDGEABLE_TYPES
+    if hedge and step.params.get("stream", False):
+        # A backup attempt could not replay the tokens already streamed.
+        hedge = False
+
+    emit({"type": "step_started", "node_id": node_id})
+    record = METRICS.enabled
+    if record:
+        in_flight = STEPS_IN_FLIGHT.labels(step.type)
+        in_flight.inc()
+    status = "failed"
+    annotations: Dict[str, Any] = {}
+    start = time.perf_counter()
+    try:
+        # Only the step's own deadline counts as a timeout; a TimeoutError
+        # raised by the handler (an HTTP or sandbox timeout) fails the step.
+        timer: Optional[asyncio.Timeout] = None
+        try:
+            if budget_ms <= 0:
+                raise StepTimeout(f"STEP_TIMED_OUT:{node_id}")
+            async with asyncio.timeout(budget_ms / 1000) as timer:
+                if hedge:
+                    ctx, result = await _hedged(state, step, payload, budget_ms)
+                else:
+                    ctx = state.context(step, payload, budget_ms)
+                    result = await handler(ctx)
+        except Exception as exc:
+            latency = int((time.perf_counter() - start) * 1000)
+            if timer is None or timer.expired():
+                status = "timed_out"
+                emit(
+                    {
+                        "type": "step_timed_out",
+                        "node_id": node_id,
+                        "latency_ms": latency,
+                        "timeout_ms": max(budget_ms, 0),
+                    }
+                )
+                raise StepTimeout(f"STEP_TIMED_OUT:{node_id}")
+            emit(
+                {
+                    "type": "step_failed",
+                    "node_id": node_id,
+                    "latency_ms": latency,
+                    "error": str(exc),
+                }
+            )
+            raise
+        status = "succeeded"
+        annotations = ctx.annotations
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        LATENCIES.observe(step.type, elapsed_ms)
+        emit(
+            {
+                "type": "step_succeeded",
+                "node_id": node_id,
+                "latency_ms": int(elapsed_ms),
+                **annotations,
+            }
+        )
+        return result
+    finally:
+        if record:
+            in_flight.dec()
+            _record_step(step.type, status, (time.perf_counter() - start) * 1000, annotations)
+
+
+def _record_step(
+    node_type: str, status: str, latency_ms: float, annotations: Dict[str, Any]
+) -> None:
+    STEP_LATENCY.labels(node_type).observe(latency_ms)
+    STEPS.labels(node_type, status).inc()
+    usage = annotations.get("token_usage")
+    if usage:
+        TOKENS.labels(node_type, "prompt").inc(usage.get("prompt", 0))
+        TOKENS.labels(node_type, "completion").inc(usage.get("completion", 0))
+    if "cache_hit" in annotations:
+        NODE_CACHE.labels(node_type, "hit" if annotations["cache_hit"] else "miss").inc()
+
+
+async def _traced_step(state: _RunState, step: PlanStep, payload: Any) -> Any:
+    with tracing.span(f"step:{step.node_id}", node_id=step.node_id, node_type=step.type):
+        return await _execute_step(state, step, payload)
+
+
+async def _run_dag(
+    plan: ExecutionPlan,
+    inputs: Any,
+    run_step: Callable[[PlanStep, Any], Any],
+    max_concurrency: int,
+) -> Any:
+    """Execute ``plan`` as a DAG, running ready steps concurrently.
+
+    A step starts once all its predecessors finished.  Steps without
+    predecessors receive ``inputs``, steps with one predecessor receive its
+    output and fan-in steps receive a ``{predecessor_id: output}`` mapping.
+    At most ``max_concurrency`` steps run at once; ready steps are started in
+    FlowSpec order.  The output of the single sink node is returned (a
+    ``{sink_id: output}`` mapping if there are several).
+    """
+
+    steps = plan.steps
+    waiting = [len(s.predecessors) for s in steps]
+    ready = [i for i, n in enumerate(waiting) if n == 0]
+    outputs: List[Any] = [None] * len(steps)
+    running: Dict[asyncio.Task, int] = {}
+
+    def step_inputs(i: int) -> Any:
+        preds = steps[i].predecessors
+        if not preds:
+            return inputs
+        if len(preds) == 1:
+            return outputs[preds[0]]
+        return {steps[p].node_id: outputs[p] for p in preds}
+
+    try:
+        while ready or running:
+            while ready and len(running) < max_concurrency:
+                i = ready.pop(0)
+                running[asyncio.ensure_future(run_step(steps[i], step_inputs(i)))] = i
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in sorted(done, key=running.__getitem__):
+                i = running.pop(task)
+                outputs[i] = task.result()
+                for succ in steps[i].successors:
+                    waiting[succ] -= 1
+                    if waiting[succ] == 0:
+                        ready.append(succ)
+            ready.sort()
+    finally:
+        for task in running:
+            task.cancel()
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+
+    if len(plan.sinks) == 1:
+        return outputs[plan.sinks[0]]
+    return {steps[i].node_id: outputs[i] for i in plan.sinks}
 
 
 async def run_flow(
-    flow: Dict[str, Any],
+    flow: Union[Dict[str, Any], ExecutionPlan],
     inputs: Any,
     handlers: Dict[str, NodeHandler],
     emit: Optional[Callable[[Dict[str, Any]], None]] = None,
@@ -18,17 +323,29 @@ async def run_flow(
     secrets: Optional[Dict[str, str]] = None,
     logger: Optional[Callable[[str], None]] = None,
     timeout_ms: int = 30_000,
+    max_concurrency: int = 8,
+    deadline_ms: Optional[int] = None,
+    hedge: bool = False,
+    trace: Optional[bool] = None,
 ) -> Any:
-    """Execute a flow sequentially.
+    """Execute a flow.
+
+    Linear flows run node by node following the edges.  Flows in which a node
+    has several incoming or outgoing edges run as a DAG: independent branches
+    execute concurrently and fan-in nodes receive a mapping of their
+    predecessors' outputs.
 
     Parameters
     ----------
-    flow: dict
-        Flow specification containing ``nodes`` and ``edges`` arrays.
+    flow: dict or ExecutionPlan
+        Compiled plan (see :mod:`core.runtime.plan`) or a flow specification
+        containing ``nodes`` and ``edges`` arrays, which is planned on the fly
+        without validation.
     inputs: any
         Initial payload supplied to the first node.
     handlers: dict
-        Mapping of node ``type`` to async handler callable.
+        Mapping of node ``type`` to async handler callable.  Only used when
+        ``flow`` is not already a plan.
     emit: callable, optional
         Function used to emit step events. Defaults to no-op.
     run_id: str, optional
@@ -40,7 +357,21 @@ async def run_flow(
     logger: callable, optional
         Logger used for debugging.
     timeout_ms: int, optional
-        Maximum time allotted for each node.
+        Maximum time allotted for each node, unless the node sets its own
+        ``timeout_ms``.  A node exceeding it is cancelled, a
+        ``step_timed_out`` event is emitted and :class:`StepTimeout` raised.
+    max_concurrency: int, optional
+        Maximum number of nodes of a DAG flow running at the same time.
+    deadline_ms: int, optional
+        Budget of the whole run.  Each node gets at most what is left of it.
+    hedge: bool, optional
+        Hedge idempotent nodes (:data:`HEDGEABLE_TYPES`): when an attempt
+        runs longer than the p95 latency of its node type, a second attempt
+        is started and the first to succeed wins.  Nodes can opt in or out
+        individually with a ``hedge`` flag.
+    trace: bool, optional
+        Record a trace of this run (see :mod:`core.tracing`); by default the
+        run is sampled at ``tracing.SAMPLE_RATE``.
     """
 
     run_id = run_id or uuid.uuid4().hex
@@ -49,48 +380,58 @@ async def run_flow(
     user = user or {}
     secrets = secrets or {}
 
-    nodes = {n["id"]: n for n in flow.get("nodes", [])}
-    edges = {e["from"]: e["to"] for e in flow.get("edges", [])}
+    deadline = time.monotonic() + deadline_ms / 1000 if deadline_ms is not None else None
+    state = _RunState(run_id, emit, user, secrets, logger, timeout_ms, deadline, hedge)
+    run_trace = tracing.start_trace(run_id, trace)
+    if run_trace is None:
+        return await _run_plan(flow, inputs, handlers, state, max_concurrency, _execute_step)
+    try:
+        with run_trace.span("run", run_id=run_id):
+            return await _run_plan(flow, inputs, handlers, state, max_concurrency, _traced_step)
+    finally:
+        tracing.finish_trace(run_trace)
 
-    current_id = flow["nodes"][0]["id"] if flow.get("nodes") else None
-    payload = inputs
 
-    while current_id:
-        node = nodes[current_id]
-        handler = handlers.get(node["type"])
-        if handler is None:
-            raise KeyError(f"No handler for node type {node['type']}")
+async def _run_plan(
+    flow: Union[Dict[str, Any], ExecutionPlan],
+    inputs: Any,
+    handlers: Dict[str, NodeHandler],
+    state: _RunState,
+    max_concurrency: int,
+    execute_step: Callable[[_RunState, PlanStep, Any], Any],
+) -> Any:
+    if isinstance(flow, ExecutionPlan):
+        plan = flow
+    else:
+        with tracing.span("plan", nodes=len(flow.get("nodes", []))):
+            plan = build_plan(flow, handlers)
 
-        ctx = NodeContext(
-            run_id=run_id,
-            node_id=current_id,
-            inputs=payload,
-            params=node.get("params", {}),
-            secrets=secrets,
-            user=user,
-            logger=lambda m, nid=current_id: logger(f"[{nid}] {m}"),
-            emit=emit,
-            timeout_ms=timeout_ms,
-        )
+    def run_step(step: PlanStep, payload: Any) -> Any:
+        return execute_step(state, step, payload)
 
-        emit({"type": "step_started", "node_id": current_id})
-        start = time.perf_counter()
-        try:
-            payload = await handler(ctx)
-        except Exception as exc:  # pragma: no cover - failure path
-            latency = int((time.perf_counter() - start) * 1000)
-            emit(
-                {
-                    "type": "step_failed",
-                    "node_id": current_id,
-                    "latency_ms": latency,
-                    "error": str(exc),
-                }
-            )
-            raise
-        latency = int((time.perf_counter() - start) * 1000)
-        emit({"type": "step_succeeded", "node_id": current_id, "latency_ms": latency})
+    async def execute() -> Any:
+        if not plan.linear:
+            return await _run_dag(plan, inputs, run_step, max(1, max_concurrency))
+        payload = inputs
+        for i in plan.chain:
+            payload = await run_step(plan.steps[i], payload)
+        return payload
 
-        current_id = edges.get(current_id)
+    if not METRICS.enabled:
+        return await execute()
 
-    return payload
+    flow_label = str(plan.flow.get("id") or plan.flow.get("name") or "unnamed")
+    status = "failed"
+    start = time.perf_counter()
+    RUNS_IN_FLIGHT.labels().inc()
+    try:
+        result = await execute()
+        status = "succeeded"
+        return result
+    except asyncio.CancelledError:
+        status = "cancelled"
+        raise
+    finally:
+        RUNS_IN_FLIGHT.labels().dec()
+        RUN_LATENCY.labels(flow_label).observe((time.perf_counter() - start) * 1000)
+        RUNS.labels(flow_label, status).inc()
@@ -0,0 +1,108 @@
+"""Per-run event buffers for streaming step events to subscribers.
+
+The engine's ``emit`` callback appends to an :class:`EventLog`, a bounded
+ring buffer that numbers every event with an increasing offset.  Appending
+never blocks or awaits, so slow or absent subscribers cannot slow a run
+down.  Subscribers read frames (lists of events) from any offset still held
+by the ring, which lets late clients replay the run so far.
+
+Each frame gathers everything emitted during a short coalescing window, and
+consecutive ``step_token`` events of the same node are merged into one.  A
+subscriber that falls behind by more than the ring capacity gets a single
+``events_dropped`` summary in place of the events it missed.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+
+class EventLog:
+    """Bounded, replayable log of the events of one run.
+
+    Parameters
+    ----------
+    capacity: int
+        Number of most recent events kept for replay.
+    """
+
+    def __init__(self, capacity: int = 1024) -> None:
+        self.capacity = capacity
+        self._events: "deque[Tuple[int, Dict[str, Any]]]" = deque(maxlen=capacity)
+        self.next_offset = 0
+        self.closed = False
+        self._wakeup: Optional[asyncio.Future] = None
+
+    def _notify(self) -> None:
+        if self._wakeup is not None:
+            if not self._wakeup.done():
+                self._wakeup.set_result(None)
+            self._wakeup = None
+
+    def emit(self, event: Dict[str, Any]) -> None:
+        """Append ``event``; never blocks."""
+
+        self._events.append((self.next_offset, event))
+        self.next_offset += 1
+        self._notify()
+
+    def close(self) -> None:
+        """Mark the log complete; subscribers stop once they have read it all."""
+
+        self.closed = True
+        self._notify()
+
+    @property
+    def first_offset(self) -> int:
+        return self._events[0][0] if self._events else self.next_offset
+
+    def read(self, offset: int) -> Tuple[List[Dict[str, Any]], int]:
+        """Return the events from ``offset`` on, coalesced, and the next offset.
+
+        If ``offset`` has already been overwritten the frame starts with an
+        ``events_dropped`` summary.
+        """
+
+        frame: List[Dict[str, Any]] = []
+        first = self.first_offset
+        if offset < first:
+            frame.append({"type": "events_dropped", "seq": first - 1, "count": first - offset})
+            offset = first
+        for seq, event in list(self._events)[offset - first :]:
+            last = frame[-1] if frame else None
+            if (
+                event.get("type") == "step_token"
+                and last is not None
+                and last.get("type") == "step_token"
+                and last.get("node_id") == event.get("node_id")
+            ):
+                last["token"] += event["token"]
+                last["seq"] = seq
+                continue
+            frame.append({**event, "seq": seq})
+        return frame, self.next_offset
+
+    async def subscribe(self, offset: int = 0, coalesce_ms: float = 10.0) -> AsyncIterator[List]:
+        """Yield frames of events from ``offset`` until the log is closed.
+
+        ``offset`` may be negative to start that many events before the end.
+        After a new event arrives the subscriber waits ``coalesce_ms`` so that
+        bursts are delivered as one frame.
+        """
+
+        if offset < 0:
+            offset = max(0, self.next_offset + offset)
+        while True:
+            if offset >= self.next_offset:
+                if self.closed:
+                    return
+                if self._wakeup is None:
+                    self._wakeup = asyncio.get_running_loop().create_future()
+                await asyncio.shield(self._wakeup)
+                if coalesce_ms > 0 and not self.closed:
+                    await asyncio.sleep(coalesce_ms / 1000)
+            if offset < self.next_offset:
+                frame, offset = self.read(offset)
+                yield frame
@@ -0,0 +1,199 @@
+"""Compiled execution plans for flows.
+
+:func:`compile_flow` validates a FlowSpec once and freezes everything the
+runtime needs into an :class:`ExecutionPlan`: the resolved handler of every
+node, its defaulted parameters and the successor/predecessor indices of the
+graph.  :class:`PlanCache` keeps recently used plans keyed by a hash of the
+flow's content, so hot flows skip validation and setup entirely while any
+edit, even one that keeps the flow's id and version, compiles a new plan.
+"""
+
+from __future__ import annotations
+
+import copy
+import hashlib
+import json
+from collections import OrderedDict
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from core.validation import validate_and_repair
+
+from .contracts import NodeHandler
+
+
+@dataclass(frozen=True)
+class PlanStep:
+    """One node of an :class:`ExecutionPlan`."""
+
+    node_id: str
+    type: str
+    handler: Optional[NodeHandler]
+    params: Mapping[str, Any]
+    successors: Tuple[int, ...]
+    predecessors: Tuple[int, ...]
+    timeout_ms: Optional[int] = None
+    hedge: Optional[bool] = None
+
+
+@dataclass(frozen=True)
+class ExecutionPlan:
+    """Immutable, ready-to-run form of a flow.
+
+    Attributes:
+        key: Cache key of the flow the plan was built from.
+        steps: Nodes in FlowSpec order.
+        linear: Whether no node has more than one incoming or outgoing edge.
+        chain: Indices of the steps executed by a linear plan, in order.
+        sinks: Indices of the steps without successors.
+        flow: The (validated) flow specification.
+    """
+
+    key: Any
+    steps: Tuple[PlanStep, ...]
+    linear: bool
+    chain: Tuple[int, ...]
+    sinks: Tuple[int, ...]
+    flow: Dict[str, Any]
+
+
+def flow_key(flow: Dict[str, Any]) -> Any:
+    """Return the SHA-256 of ``flow``'s canonical JSON (id and version included)."""
+
+    data = json.dumps(flow, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def build_plan(
+    flow: Dict[str, Any], handlers: Dict[str, NodeHandler], key: Any = None
+) -> ExecutionPlan:
+    """Turn ``flow`` into an :class:`ExecutionPlan` without validating it.
+
+    Node types without a handler are kept with ``handler=None`` and fail when
+    the runtime reaches them.  Optional node-level ``timeout_ms`` and
+    ``hedge`` fields are carried over to the step.
+    """
+
+    nodes = flow.get("nodes", [])
+    index = {n["id"]: i for i, n in enumerate(nodes)}
+    succs: Tuple[list, ...] = tuple([] for _ in nodes)
+    preds: Tuple[list, ...] = tuple([] for _ in nodes)
+    for edge in flow.get("edges", []):
+        src, dst = index[edge["from"]], index[edge["to"]]
+        succs[src].append(dst)
+        preds[dst].append(src)
+
+    steps = tuple(
+        PlanStep(
+            node_id=node["id"],
+            type=node["type"],
+            handler=handlers.get(node["type"]),
+            params=MappingProxyType(copy.deepcopy(node.get("params", {}))),
+            successors=tuple(succs[i]),
+            predecessors=tuple(preds[i]),
+            timeout_ms=node.get("timeout_ms"),
+            hedge=node.get("hedge"),
+        )
+        for i, node in enumerate(nodes)
+    )
+    linear = all(len(s) <= 1 for s in succs) and all(len(p) <= 1 for p in preds)
+
+    chain = []
+    if linear and steps:
+        current: Optional[int] = 0
+        seen = set()
+        while current is not None and current not in seen:
+            seen.add(current)
+            chain.append(current)
+            current = steps[current].successors[0] if steps[current].successors else None
+
+    return ExecutionPlan(
+        key=key,
+        steps=steps,
+        linear=linear,
+        chain=tuple(chain),
+        sinks=tuple(i for i, s in enumerate(steps) if not s.successors),
+        flow=flow,
+    )
+
+
+def compile_flow(
+    flow: Dict[str, Any],
+    catalog: Dict[str, Any],
+    handlers: Dict[str, NodeHandler],
+    key: Any = None,
+) -> ExecutionPlan:
+    """Validate ``flow`` against ``catalog`` and build its plan.
+
+    ``flow`` itself is left untouched; the plan holds a repaired copy.
+    Raises ``ValueError`` for invalid flows and for node types that have no
+    entry in ``handlers``.
+    """
+
+    repaired = validate_and_repair(copy.deepcopy(flow), catalog)
+    for node in repaired["nodes"]:
+        if node["type"] not in handlers:
+            raise ValueError(f"NO_HANDLER:{node['type']}")
+    return build_plan(repaired, handlers, key=key if key is not None else flow_key(flow))
+
+
+class PlanCache:
+    """Bounded LRU of compiled plans.
+
+    Plans are keyed by :func:`flow_key` and the catalog ``version``; a plan
+    compiled against another handler mapping is recompiled.
+
+    Parameters
+    ----------
+    max_entries: int
+        Number of plans kept before the least recently used is evicted.
+    """
+
+    def __init__(self, max_entries: int = 256) -> None:
+        self.max_entries = max_entries
+        self._plans: "OrderedDict[Any, Tuple[Dict[str, NodeHandler], ExecutionPlan]]" = (
+            OrderedDict()
+        )
+        self.hits = self.misses = self.evictions = 0
+
+    def get(
+        self,
+        flow: Dict[str, Any],
+        catalog: Dict[str, Any],
+        handlers: Dict[str, NodeHandler],
+    ) -> ExecutionPlan:
+        """Return the plan of ``flow``, compiling and caching it on a miss."""
+
+        key = flow_key(flow)
+        cache_key = (key, catalog.get("version"))
+        entry = self._plans.get(cache_key)
+        if entry is not None and entry[0] is handlers:
+            self._plans.move_to_end(cache_key)
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        plan = compile_flow(flow, catalog, handlers, key=key)
+        self._plans[cache_key] = (handlers, plan)
+        self._plans.move_to_end(cache_key)
+        while len(self._plans) > self.max_entries:
+            self._plans.popitem(last=False)
+            self.evictions += 1
+        return plan
+
+    def clear(self) -> None:
+        self._plans.clear()
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._plans),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+PLAN_CACHE = PlanCache()
@@ -0,0 +1,269 @@
+"""Write-behind SQLite persistence of RunRecords.
+
+:class:`RunStore` keeps the run history shown on the dashboard: one row per
+run (status, timestamps, inputs/outputs) and one row per finished step
+(status, ``latency_ms``, ``token_usage``).  Writers only enqueue work; a
+:class:`~core.sqlite_writer.SQLiteWriter` thread drains the queue and writes
+each batch in a single transaction through prepared statements, so
+persisting never adds latency to a run.  The database runs in WAL mode,
+which lets API reads proceed while a batch is being written.
+"""
+
+from __future__ import annotations
+
+import itertools
+import json
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional
+
+from core.sqlite_writer import SQLiteWriter
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    flow_id TEXT,
+    user_id TEXT,
+    status TEXT NOT NULL,
+    priority TEXT,
+    queued_at TEXT NOT NULL,
+    started_at TEXT,
+    ended_at TEXT,
+    inputs TEXT,
+    outputs TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_by_flow ON runs (flow_id, queued_at);
+CREATE INDEX IF NOT EXISTS runs_by_user ON runs (user_id, queued_at);
+CREATE INDEX IF NOT EXISTS runs_by_time ON runs (queued_at);
+CREATE TABLE IF NOT EXISTS steps (
+    run_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    node_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    latency_ms INTEGER,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    error TEXT,
+    PRIMARY KEY (run_id, seq)
+);
+"""
+
+_UPSERT_RUN = (
+    "INSERT OR REPLACE INTO runs (run_id, flow_id, user_id, status, priority, queued_at,"
+    " started_at, ended_at, inputs, outputs, error) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+_INSERT_STEP = (
+    "INSERT OR REPLACE INTO steps (run_id, seq, node_id, status, latency_ms, prompt_tokens,"
+    " completion_tokens, error) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+# Step events that close a step, mapped to the stored step status.
+STEP_STATUSES = {
+    "step_succeeded": "succeeded",
+    "step_failed": "failed",
+    "step_timed_out": "timed_out",
+}
+
+_RUN_COLUMNS = (
+    "run_id",
+    "flow_id",
+    "user_id",
+    "status",
+    "priority",
+    "queued_at",
+    "started_at",
+    "ended_at",
+    "inputs",
+    "outputs",
+    "error",
+)
+
+
+def _dumps(value: Any) -> Optional[str]:
+    return None if value is None else json.dumps(value, ensure_ascii=False, default=str)
+
+
+class RunStore:
+    """SQLite run history with a write-behind queue.
+
+    Parameters
+    ----------
+    path: str
+        SQLite database file.
+    batch_size: int
+        Maximum number of queued writes committed in one transaction.
+    """
+
+    def __init__(self, path: str, batch_size: int = 1000) -> None:
+        self.path = path
+        self._steps: Dict[str, int] = {}
+        self._writer = SQLiteWriter(
+            path, self._write, schema=_SCHEMA, name="run-store", batch_size=batch_size
+        )
+        self._reader = sqlite3.connect(path, check_same_thread=False)
+        self._read_lock = threading.Lock()
+
+    @property
+    def batches_written(self) -> int:
+        return self._writer.batches_written
+
+    @property
+    def failed_batches(self) -> int:
+        return self._writer.failed_batches
+
+    # ------------------------------------------------------------------
+    # Writing (never blocks the caller)
+    # ------------------------------------------------------------------
+
+    def save_run(self, record: Dict[str, Any]) -> None:
+        """Queue an insert/update of the run row described by ``record``.
+
+        ``record`` is a run dict as returned by ``Run.to_dict`` plus an
+        optional ``user_id``.
+        """
+
+        self._writer.put(
+            (
+                "run",
+                (
+                    record["run_id"],
+                    record.get("flow_id"),
+                    record.get("user_id"),
+                    record["status"],
+                    record.get("priority"),
+                    record["queued_at"],
+                    record.get("started_at"),
+                    record.get("ended_at"),
+                    record.get("inputs"),
+                    record.get("outputs"),
+                    record.get("error"),
+                ),
+            )
+        )
+
+    def record_event(self, run_id: str, event: Dict[str, Any]) -> None:
+        """Queue a step row if ``event`` closes a step; other events are ignored."""
+
+        status = STEP_STATUSES.get(event.get("type"))
+        if status is None:
+            return
+        seq = self._steps.get(run_id, 0)
+        self._steps[run_id] = seq + 1
+        usage = event.get("token_usage") or {}
+        self._writer.put(
+            (
+                "step",
+                (
+                    run_id,
+                    seq,
+                    event.get("node_id"),
+                    status,
+                    event.get("latency_ms"),
+                    usage.get("prompt"),
+                    usage.get("completion"),
+                    event.get("error"),
+                ),
+            )
+        )
+
+    def end_run(self, run_id: str) -> None:
+        """Forget the per-run step counter once no more steps will arrive."""
+
+        self._steps.pop(run_id, None)
+
+    @staticmethod
+    def _write(connection: sqlite3.Connection, writes: List[Any]) -> None:
+        # Consecutive writes of a kind go through a single executemany so the
+        # prepared statement is reused.
+        for kind, group in itertools.groupby(writes, key=lambda w: w[0]):
+            if kind == "run":
+                rows = [p[:8] + (_dumps(p[8]), _dumps(p[9]), p[10]) for _, p in group]
+                connection.executemany(_UPSERT_RUN, rows)
+            else:
+                connection.executemany(_INSERT_STEP, [p for _, p in group])
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until every write queued so far is committed."""
+
+        return self._writer.flush(timeout)
+
+    def close(self) -> None:
+        self._writer.close()
+        self._reader.close()
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def _query(self, sql: str, params: tuple) -> List[tuple]:
+        with self._read_lock:
+            return self._reader.execute(sql, params).fetchall()
+
+    @staticmethod
+    def _run_dict(row: tuple) -> Dict[str, Any]:
+        record = dict(zip(_RUN_COLUMNS, row))
+        for name in ("inputs", "outputs"):
+            if record[name] is not None:
+                record[name] = json.loads(record[name])
+        return record
+
+    def get(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """Return the RunRecord of ``run_id`` with its steps, or ``None``."""
+
+        rows = self._query(
+            f"SELECT {', '.join(_RUN_COLUMNS)} FROM runs WHERE run_id = ?", (run_id,)
+        )
+        if not rows:
+            return None
+        record = self._run_dict(rows[0])
+        record["steps"] = []
+        steps = self._query(
+            "SELECT node_id, status, latency_ms, prompt_tokens, completion_tokens, error"
+            " FROM steps WHERE run_id = ? ORDER BY seq",
+            (run_id,),
+        )
+        for node_id, status, latency_ms, prompt, completion, error in steps:
+            step: Dict[str, Any] = {
+                "node_id": node_id,
+                "status": status,
+                "latency_ms": latency_ms,
+            }
+            if prompt is not None or completion is not None:
+                step["token_usage"] = {"prompt": prompt or 0, "completion": completion or 0}
+            if error is not None:
+                step["error"] = error
+            record["steps"].append(step)
+        return record
+
+    def list(
+        self,
+        *,
+        flow_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        limit: int = 50,
+    ) -> List[Dict[str, Any]]:
+        """Return runs (without steps), newest first, matching every given filter.
+
+        ``since``/``until`` bound ``queued_at`` and are ISO-8601 UTC strings.
+        """
+
+        clauses, params = [], []
+        for column, value in (("flow_id", flow_id), ("user_id", user_id)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            clauses.append("queued_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("queued_at < ?")
+            params.append(until)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._query(
+            f"SELECT {', '.join(_RUN_COLUMNS)} FROM runs{where} ORDER BY queued_at DESC LIMIT ?",
+            (*params, limit),
+        )
+        return [self._run_dict(row) for row in rows]
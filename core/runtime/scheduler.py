@@ -0,0 +1,257 @@
+"""In-process scheduler for asynchronous flow runs.
+
+Runs are submitted with a priority class and queued until one of a fixed
+number of workers picks them up, so bursts wait in line instead of piling up
+as unbounded tasks.  ``interactive`` runs (chat) always start before queued
+``batch`` runs (automation).  Each class has a queue-depth limit; submissions
+beyond it are shed with :class:`QueueFull` rather than queued.
+
+Cancelling a queued run drops it before it starts; cancelling a running run
+cancels its task, which raises ``asyncio.CancelledError`` inside whatever the
+current node handler is awaiting.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import uuid
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from .engine import run_flow
+from .events import EventLog
+from .plan import ExecutionPlan
+from .run_store import RunStore
+
+# Priority classes, lower value starts first.
+PRIORITIES: Dict[str, int] = {"interactive": 0, "batch": 1}
+
+FINISHED = {"succeeded", "failed", "cancelled"}
+
+
+class QueueFull(Exception):
+    """Raised when a priority class already has its maximum of queued runs."""
+
+    def __init__(self, priority: str) -> None:
+        super().__init__(f"QUEUE_FULL:{priority}")
+        self.priority = priority
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class Run:
+    """State of one submitted run."""
+
+    def __init__(
+        self,
+        run_id: str,
+        plan: ExecutionPlan,
+        inputs: Any,
+        priority: str,
+        options: Dict[str, Any],
+        store: Optional[RunStore] = None,
+    ) -> None:
+        self.run_id = run_id
+        self.plan = plan
+        self.inputs = inputs
+        self.priority = priority
+        self.options = options
+        self.status = "queued"
+        self.queued_at = _now()
+        self.started_at: Optional[str] = None
+        self.ended_at: Optional[str] = None
+        self.outputs: Any = None
+        self.error: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+        self.done = asyncio.Event()
+        self.events = EventLog(options.pop("event_capacity", 1024))
+        self._emit = options.pop("emit", None)
+        self.store = store
+        self.user_id = (options.get("user") or {}).get("id")
+
+    def emit(self, event: Dict[str, Any]) -> None:
+        """Record ``event`` in :attr:`events` (and the store), then forward it."""
+
+        self.events.emit(event)
+        if self.store is not None:
+            self.store.record_event(self.run_id, event)
+        if self._emit is not None:
+            self._emit(event)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "run_id": self.run_id,
+            "flow_id": self.plan.flow.get("id"),
+            "user_id": self.user_id,
+            "status": self.status,
+            "priority": self.priority,
+            "queued_at": self.queued_at,
+            "started_at": self.started_at,
+            "ended_at": self.ended_at,
+            "inputs": self.inputs,
+            "outputs": self.outputs,
+            "error": self.error,
+        }
+
+
+class RunScheduler:
+    """Bounded, prioritized executor of flow runs.
+
+    Parameters
+    ----------
+    workers: int
+        Number of runs executing at the same time.
+    max_queued: dict, optional
+        Queue-depth limit per priority class.
+    max_finished: int
+        Number of finished runs kept for :meth:`get`.
+    store: RunStore, optional
+        Run history every run and finished step is persisted to.
+    """
+
+    def __init__(
+        self,
+        workers: int = 8,
+        max_queued: Optional[Dict[str, int]] = None,
+        max_finished: int = 1000,
+        store: Optional[RunStore] = None,
+    ) -> None:
+        self.workers = workers
+        self.store = store
+        self.max_queued = {"interactive": 100, "batch": 1000, **(max_queued or {})}
+        self.max_finished = max_finished
+        self.runs: "OrderedDict[str, Run]" = OrderedDict()
+        self._finished: "deque[str]" = deque()
+        self.queued = dict.fromkeys(PRIORITIES, 0)
+        self.shed = dict.fromkeys(PRIORITIES, 0)
+        self._seq = itertools.count()
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._workers: List[asyncio.Task] = []
+
+    def _start(self) -> None:
+        if self._queue is not None:
+            return
+        self._queue = asyncio.PriorityQueue()
+        self._workers = [asyncio.ensure_future(self._work()) for _ in range(self.workers)]
+
+    def submit(
+        self,
+        plan: ExecutionPlan,
+        inputs: Any,
+        *,
+        priority: str = "interactive",
+        run_id: Optional[str] = None,
+        **options: Any,
+    ) -> Run:
+        """Queue ``plan`` for execution and return its :class:`Run`.
+
+        ``options`` (``user``, ``secrets``, ``emit``, ``timeout_ms`` ...) are
+        passed on to :func:`run_flow`; ``event_capacity`` sizes the run's
+        :class:`EventLog`.  Must be called from the event loop the
+        workers should run on.
+        """
+
+        if priority not in PRIORITIES:
+            raise ValueError(f"UNKNOWN_PRIORITY:{priority}")
+        if self.queued[priority] >= self.max_queued[priority]:
+            self.shed[priority] += 1
+            raise QueueFull(priority)
+        self._start()
+        run = Run(run_id or uuid.uuid4().hex, plan, inputs, priority, options, self.store)
+        self.runs[run.run_id] = run
+        self._save(run)
+        self.queued[priority] += 1
+        self._queue.put_nowait((PRIORITIES[priority], next(self._seq), run))
+        return run
+
+    def get(self, run_id: str) -> Optional[Run]:
+        return self.runs.get(run_id)
+
+    def cancel(self, run_id: str) -> Optional[Run]:
+        """Cancel a queued or running run; finished runs are left untouched."""
+
+        run = self.runs.get(run_id)
+        if run is None or run.status in FINISHED:
+            return run
+        if run.status == "queued":
+            # The worker that dequeues it skips it.
+            self.queued[run.priority] -= 1
+            self._finish(run, "cancelled")
+        elif run.task is not None:
+            run.task.cancel()
+        return run
+
+    async def wait(self, run_id: str) -> Run:
+        """Wait until ``run_id`` finished and return it."""
+
+        run = self.runs[run_id]
+        await run.done.wait()
+        return run
+
+    def _save(self, run: Run) -> None:
+        if self.store is not None:
+            self.store.save_run(run.to_dict())
+
+    def _finish(self, run: Run, status: str) -> None:
+        run.status = status
+        run.ended_at = _now()
+        event = {"type": f"run_{status}", "run_id": run.run_id}
+        if run.error is not None:
+            event["error"] = run.error
+        run.emit(event)
+        run.events.close()
+        self._save(run)
+        if self.store is not None:
+            self.store.end_run(run.run_id)
+        run.done.set()
+        self._finished.append(run.run_id)
+        while len(self._finished) > self.max_finished:
+            self.runs.pop(self._finished.popleft(), None)
+
+    async def _work(self) -> None:
+        while True:
+            _, _, run = await self._queue.get()
+            if run.status != "queued":
+                continue
+            self.queued[run.priority] -= 1
+            run.status = "running"
+            run.started_at = _now()
+            run.emit({"type": "run_started", "run_id": run.run_id})
+            self._save(run)
+            run.task = asyncio.ensure_future(
+                run_flow(run.plan, run.inputs, {}, run.emit, run_id=run.run_id, **run.options)
+            )
+            await asyncio.wait([run.task])
+            if run.task.cancelled():
+                self._finish(run, "cancelled")
+            elif run.task.exception() is not None:
+                run.error = str(run.task.exception())
+                self._finish(run, "failed")
+            else:
+                run.outputs = run.task.result()
+                self._finish(run, "succeeded")
+
+    async def aclose(self) -> None:
+        """Cancel every queued and running run and stop the workers."""
+
+        for run_id in list(self.runs):
+            self.cancel(run_id)
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        running = [r for r in self.runs.values() if r.status == "running"]
+        await asyncio.gather(*(r.task for r in running), return_exceptions=True)
+        for run in running:
+            self._finish(run, "cancelled")
+        self._workers = []
+        self._queue = None
+
+    def stats(self) -> Dict[str, Any]:
+        counts: Dict[str, int] = {}
+        for run in self.runs.values():
+            counts[run.status] = counts.get(run.status, 0) + 1
+        return {"queued": dict(self.queued), "shed": dict(self.shed), "runs": counts}
@@ -0,0 +1,372 @@
+"""Warm pool of sandboxed Python workers for the ``code.exec`` node.
+
+Starting an interpreter and importing numpy costs tens of milliseconds, far
+more than most snippets take to run.  :class:`WorkerPool` therefore keeps
+``size`` worker processes (:mod:`core.sandbox_worker`) started ahead of
+time with the allowed packages already imported; running code is a JSON
+round-trip over the worker's pipes.  Each job runs in a fresh child forked
+from the warm worker, so nothing one caller's snippet does to the
+interpreter or the pipes reaches another caller; replies are matched to
+their job by id.
+
+Each worker runs in isolated mode with an empty environment (no secrets
+leak through ``os.environ``) inside its own network namespace, which has no
+interface besides loopback, and mount namespace, where ``/proc`` is hidden
+so the server's environment cannot be read from there either.  A worker
+started by root drops to the unprivileged ``user``; otherwise the
+namespaces are entered through a user namespace.  Jobs run under an
+address-space limit of ``memory_mb`` above its warm size, a file-size limit
+and a process limit of zero, and with an audit hook that refuses sockets,
+subprocesses, signals, ``ctypes`` and changes to its limits.  The
+namespaces and limits are the boundary; the audit hook only turns attempts
+into clear errors.  Where namespaces are unavailable workers fail to start
+(``CODE_EXEC_WORKER_UNAVAILABLE``) unless the pool is created with
+``isolate=False``, which is only safe inside a container that already has
+no network and no secrets.
+
+A job that outlives its timeout is killed by its worker; a worker is
+replaced after ``max_tasks`` jobs, when it stops answering or when it dies.
+Replacements start in the background so the next call finds a warm worker.
+At most ``size`` jobs run at once and ``max_queue`` more may wait; further
+calls fail immediately with ``CODE_EXEC_QUEUE_FULL``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import os
+import pwd
+import queue
+import select
+import signal
+import struct
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence
+
+WORKER_PATH = str(Path(__file__).with_name("sandbox_worker.py"))
+
+# Packages imported by every worker before it accepts jobs.
+DEFAULT_PRELOAD = ("numpy", "pandas")
+
+# Time a worker gets past a job's timeout to report it before it is killed.
+_REPLY_GRACE_S = 1.0
+
+
+class SandboxError(RuntimeError):
+    """A ``code.exec`` job failed; ``code`` is e.g. ``CODE_EXEC_TIMEOUT``.
+
+    ``stdout``/``stderr`` hold whatever the code printed before failing.
+    """
+
+    def __init__(self, code: str, detail: str = "", stdout: str = "", stderr: str = ""):
+        super().__init__(f"{code}:{detail}" if detail else code)
+        self.code = code
+        self.stdout = stdout
+        self.stderr = stderr
+
+
+class _Worker:
+    """One worker process and its framed pipe protocol."""
+
+    def __init__(self, config: Dict[str, Any], start_timeout_s: float) -> None:
+        env = {"PATH": os.defpath, "OPENBLAS_NUM_THREADS": "1", "OMP_NUM_THREADS": "1"}
+        self.proc = subprocess.Popen(
+            [sys.executable, "-I", WORKER_PATH, json.dumps(config)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            env=env,
+            close_fds=True,
+            start_new_session=True,
+        )
+        self.tasks = 0
+        try:
+            hello = self.receive(time.monotonic() + start_timeout_s)
+            if not hello.get("ready"):
+                raise SandboxError(hello.get("error", "SANDBOX_NOT_READY"))
+        except BaseException:
+            self.kill()
+            raise
+        self.pid = hello["pid"]
+        self.preloaded = hello["preloaded"]
+
+    def send(self, message: Dict[str, Any]) -> None:
+        data = json.dumps(message, ensure_ascii=False, default=str).encode("utf-8")
+        self.proc.stdin.write(struct.pack(">I", len(data)) + data)
+        self.proc.stdin.flush()
+
+    def _read(self, size: int, deadline: float) -> bytes:
+        fd = self.proc.stdout.fileno()
+        data = b""
+        while len(data) < size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([fd], [], [], remaining)[0]:
+                raise TimeoutError
+            part = os.read(fd, size - len(data))
+            if not part:
+                raise EOFError
+            data += part
+        return data
+
+    def receive(self, deadline: float) -> Dict[str, Any]:
+        (size,) = struct.unpack(">I", self._read(4, deadline))
+        return json.loads(self._read(size, deadline))
+
+    def kill(self) -> None:
+        if self.proc.poll() is None:
+            # The worker leads its own session; take its job child with it.
+            try:
+                os.killpg(self.proc.pid, signal.SIGKILL)
+            except OSError:
+                self.proc.kill()
+        self.proc.wait()
+        for pipe in (self.proc.stdin, self.proc.stdout):
+            try:
+                pipe.close()
+            except OSError:
+                pass
+
+
+class WorkerPool:
+    """Pre-started sandbox workers shared by all ``code.exec`` steps.
+
+    Parameters
+    ----------
+    size: int
+        Number of worker processes, i.e. jobs running at the same time.
+    max_queue: int
+        Jobs allowed to wait for a worker before calls are rejected.
+    max_tasks: int
+        Jobs a worker runs before it is replaced.
+    memory_mb: int
+        Address space a job may allocate beyond the warm worker's own.
+    max_file_mb: int
+        Largest file a job may write.
+    max_output_chars: int
+        ``stdout``/``stderr`` beyond this many characters are truncated.
+    preload: sequence of str
+        Packages imported by every worker up front (missing ones are skipped).
+    start_timeout_s: float
+        Time a new worker has to import its preloads and report ready.
+    user: str
+        Account workers switch to when the server runs as root; the
+        interpreter and preloads must be readable by it.  ``"root"`` keeps
+        uid 0 inside a user namespace, without capabilities on the host but
+        with root's file access and exempt from the process limit.
+    isolate: bool
+        Run workers in their own network and mount namespaces.  Only turn
+        this off when the whole service is already sandboxed.
+    """
+
+    def __init__(
+        self,
+        size: int = 2,
+        *,
+        max_queue: int = 32,
+        max_tasks: int = 100,
+        memory_mb: int = 128,
+        max_file_mb: int = 16,
+        max_output_chars: int = 1_000_000,
+        preload: Sequence[str] = DEFAULT_PRELOAD,
+        start_timeout_s: float = 30.0,
+        user: str = "nobody",
+        isolate: bool = True,
+    ) -> None:
+        if size < 1 or max_queue < 0 or max_tasks < 1:
+            raise ValueError("INVALID_POOL_PARAMS")
+        self.size = size
+        self.max_queue = max_queue
+        self.max_tasks = max_tasks
+        self.start_timeout_s = start_timeout_s
+        try:
+            account = pwd.getpwnam(user)
+        except KeyError:
+            raise ValueError(f"UNKNOWN_SANDBOX_USER:{user}") from None
+        self._config = {
+            "memory_mb": memory_mb,
+            "max_file_mb": max_file_mb,
+            "max_output_chars": max_output_chars,
+            "preload": list(preload),
+            "isolate": isolate,
+            "uid": account.pw_uid,
+            "gid": account.pw_gid,
+        }
+        self._idle: "queue.SimpleQueue[Optional[_Worker]]" = queue.SimpleQueue()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._closed = False
+        self._start_error = ""
+        self._job_ids = itertools.count(1)
+        self.started = self.recycled = self.rejected = 0
+
+    def start(self) -> None:
+        """Start the workers now instead of on the first job."""
+
+        with self._lock:
+            if self._executor is not None:
+                return
+            if self._closed:
+                raise RuntimeError("POOL_CLOSED")
+            self._executor = ThreadPoolExecutor(self.size, thread_name_prefix="code-exec")
+        for _ in range(self.size):
+            self._spawn_async()
+
+    def _spawn(self) -> None:
+        try:
+            worker: Optional[_Worker] = _Worker(self._config, self.start_timeout_s)
+        except Exception as exc:
+            # Hand out an empty slot so a waiting job fails instead of hanging.
+            self._start_error = str(exc) or type(exc).__name__
+            worker = None
+        else:
+            with self._lock:
+                self.started += 1
+                if self._closed:
+                    worker.kill()
+                    return
+        self._idle.put(worker)
+
+    def _spawn_async(self) -> None:
+        threading.Thread(target=self._spawn, name="code-exec-spawn", daemon=True).start()
+
+    def _retire(self, worker: _Worker) -> None:
+        worker.kill()
+        with self._lock:
+            self.recycled += 1
+            closed = self._closed
+        if not closed:
+            self._spawn_async()
+
+    def _execute(self, job: Dict[str, Any], timeout_ms: int) -> Dict[str, Any]:
+        worker = self._idle.get()
+        if worker is None:
+            self._spawn_async()
+            raise SandboxError("CODE_EXEC_WORKER_UNAVAILABLE", self._start_error)
+        job = {**job, "id": next(self._job_ids), "timeout_ms": timeout_ms}
+        healthy = False
+        try:
+            worker.tasks += 1
+            worker.send(job)
+            reply = worker.receive(time.monotonic() + timeout_ms / 1000 + _REPLY_GRACE_S)
+            if reply.get("id") != job["id"]:
+                raise SandboxError("CODE_EXEC_PROTOCOL_ERROR", "reply for another job")
+            healthy = worker.tasks < self.max_tasks
+            if reply.get("failure"):
+                raise SandboxError(reply["failure"], reply.get("detail", ""))
+            return reply
+        except TimeoutError:
+            raise SandboxError("CODE_EXEC_TIMEOUT", f"{timeout_ms}ms") from None
+        except (EOFError, OSError, ValueError):
+            status = worker.proc.poll()
+            if status is not None and status < 0:
+                detail = signal.Signals(-status).name
+            else:
+                detail = f"exit status {status}"
+            raise SandboxError("CODE_EXEC_WORKER_DIED", detail) from None
+        finally:
+            if healthy and not self._closed:
+                self._idle.put(worker)
+            else:
+                self._retire(worker)
+
+    def _done(self, _future: Any) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    async def run(
+        self, code: str, inputs: Any = None, timeout_ms: int = 3000
+    ) -> Dict[str, Any]:
+        """Execute ``code`` with ``inputs`` bound as a global.
+
+        Returns ``{"stdout", "stderr", "artifacts"}`` where ``artifacts`` is
+        the ``artifacts`` dict the code filled in (``None`` if left empty).
+        Raises :class:`SandboxError` if the code raised (``CODE_EXEC_FAILED``),
+        ran past ``timeout_ms`` or the queue is full.
+        """
+
+        if self._executor is None:
+            self.start()
+        with self._lock:
+            if self._pending >= self.size + self.max_queue:
+                self.rejected += 1
+                raise SandboxError("CODE_EXEC_QUEUE_FULL")
+            self._pending += 1
+        future = self._executor.submit(
+            self._execute, {"code": code, "inputs": inputs}, timeout_ms
+        )
+        future.add_done_callback(self._done)
+        reply = await asyncio.wrap_future(future)
+        if reply.get("error"):
+            raise SandboxError(
+                "CODE_EXEC_FAILED",
+                reply["error"],
+                stdout=reply.get("stdout", ""),
+                stderr=reply.get("stderr", ""),
+            )
+        return {
+            "stdout": reply["stdout"],
+            "stderr": reply["stderr"],
+            "artifacts": reply["artifacts"],
+        }
+
+    def close(self) -> None:
+        """Stop every worker; jobs still queued fail."""
+
+        with self._lock:
+            self._closed = True
+            executor = self._executor
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if worker is not None:
+                worker.kill()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": self.size,
+            "pending": self._pending,
+            "started": self.started,
+            "recycled": self.recycled,
+            "rejected": self.rejected,
+        }
+
+
+_POOL: Optional[WorkerPool] = None
+
+
+def get_pool() -> WorkerPool:
+    """Return the process-wide pool, creating it with default settings."""
+
+    global _POOL
+    if _POOL is None:
+        _POOL = WorkerPool()
+    return _POOL
+
+
+def configure(**options: Any) -> WorkerPool:
+    """Replace the shared pool with one built from ``options``."""
+
+    global _POOL
+    if _POOL is not None:
+        _POOL.close()
+    _POOL = WorkerPool(**options)
+    return _POOL
+
+
+def shutdown() -> None:
+    global _POOL
+    if _POOL is not None:
+        _POOL.close()
+        _POOL = None
@@ -0,0 +1,290 @@
+"""Sandbox worker process for the ``code.exec`` node.
+
+Started by :mod:`core.sandbox` as ``python -I sandbox_worker.py <config>``;
+this file must not import anything from the project.  The worker imports
+the preloaded packages once, isolates itself (see :func:`isolate`) and then
+acts as a zygote for the jobs read from stdin until stdin closes: each job
+runs in a child forked from the warm interpreter, which closes the protocol
+pipes, applies the resource limits and installs an audit hook that refuses
+network access and process creation before it executes the snippet.  A
+snippet therefore cannot touch the protocol or anything a later job sees,
+and the zygote kills a child that outlives the job's ``timeout_ms``.
+
+Messages in both directions are JSON documents prefixed with their length
+as a 4-byte big-endian integer; replies carry the ``id`` of their job.  The
+original stdin/stdout descriptors are reserved for them; user code prints
+into buffers that are returned with the result.
+"""
+
+import contextlib
+import ctypes
+import io
+import json
+import os
+import select
+import signal
+import struct
+import sys
+import time
+import traceback
+
+# Audit events refused once user code may run.
+BLOCKED_EVENTS = (
+    "socket.",
+    "subprocess.",
+    "os.system",
+    "os.exec",
+    "os.fork",
+    "os.forkpty",
+    "os.posix_spawn",
+    "os.spawn",
+    "os.kill",
+    "os.killpg",
+    "pty.",
+    "ctypes.",
+    "resource.setrlimit",
+    "resource.prlimit",
+)
+
+# Modules whose import is refused; they expose process creation and raw
+# memory access without raising the events above.
+BLOCKED_IMPORTS = frozenset({"_posixsubprocess", "posix", "_ctypes", "pty"})
+
+CLONE_NEWNS = 0x00020000
+CLONE_NEWUSER = 0x10000000
+CLONE_NEWNET = 0x40000000
+MS_REC = 0x4000
+MS_PRIVATE = 1 << 18
+
+
+def read_frame(stream):
+    head = stream.read(4)
+    if len(head) < 4:
+        return None
+    (size,) = struct.unpack(">I", head)
+    data = b""
+    while len(data) < size:
+        part = stream.read(size - len(data))
+        if not part:
+            return None
+        data += part
+    return json.loads(data)
+
+
+def write_frame(stream, message):
+    data = json.dumps(message, ensure_ascii=False, default=str).encode("utf-8")
+    stream.write(struct.pack(">I", len(data)) + data)
+    stream.flush()
+
+
+def address_space_bytes():
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+def isolate(config):
+    """Move into private network and mount namespaces and drop privileges.
+
+    The new network namespace has only a loopback device, and ``/proc`` is
+    covered with an empty tmpfs so other processes (the server's
+    ``/proc/<pid>/environ`` in particular) cannot be read.  Started as root
+    the worker then switches to the ``uid``/``gid`` from ``config``;
+    otherwise the namespaces are entered through a user namespace.  A worker
+    left with uid 0 or running unprivileged enters one more user namespace,
+    which locks the ``/proc`` mount and leaves it without capabilities on
+    the host.
+    """
+
+    libc = ctypes.CDLL(None, use_errno=True)
+
+    def check(result, what):
+        if result != 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"{what}: {os.strerror(errno)}")
+
+    root = os.getuid() == 0
+    flags = CLONE_NEWNET | CLONE_NEWNS | (0 if root else CLONE_NEWUSER)
+    check(libc.unshare(flags), "unshare")
+    check(libc.mount(b"none", b"/", None, MS_REC | MS_PRIVATE, None), "mount /")
+    check(libc.mount(b"tmpfs", b"/proc", b"tmpfs", 0, b"size=4k,mode=555"), "mount /proc")
+    if root and config["uid"] != 0:
+        os.setgroups([])
+        os.setgid(config["gid"])
+        os.setuid(config["uid"])
+    else:
+        check(libc.unshare(CLONE_NEWUSER | CLONE_NEWNS), "unshare")
+    # Make a later ``import ctypes`` go through the import audit event again.
+    sys.modules.pop("ctypes", None)
+    sys.modules.pop("_ctypes", None)
+
+
+def apply_limits(config, baseline):
+    try:
+        import resource
+    except ImportError:  # pragma: no cover - non-POSIX platforms
+        return
+    mb = 1024 * 1024
+    # The budget is on top of what the interpreter and preloads already map.
+    memory = baseline + config["memory_mb"] * mb
+    limits = [
+        (resource.RLIMIT_AS, memory),
+        (resource.RLIMIT_FSIZE, config["max_file_mb"] * mb),
+        (resource.RLIMIT_CORE, 0),
+        # No new processes or threads.
+        (resource.RLIMIT_NPROC, 0),
+    ]
+    for limit, value in limits:
+        try:
+            resource.setrlimit(limit, (value, value))
+        except (ValueError, OSError):
+            pass
+
+
+def audit(event, args):
+    if event == "import" and args[0] in BLOCKED_IMPORTS:
+        raise PermissionError(f"SANDBOX_BLOCKED:import {args[0]}")
+    if event.startswith(BLOCKED_EVENTS):
+        raise PermissionError(f"SANDBOX_BLOCKED:{event}")
+
+
+def clip(text, limit):
+    return text if len(text) <= limit else text[:limit] + "\n[truncated]"
+
+
+def run_job(job, limit):
+    out, err = io.StringIO(), io.StringIO()
+    scope = {"__name__": "__sandbox__", "inputs": job.get("inputs"), "artifacts": {}}
+    error = None
+    with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+        try:
+            exec(compile(job["code"], "<code.exec>", "exec"), scope)
+        except BaseException as exc:  # noqa: B902 - user code may raise anything
+            # Skip this module's own frame so the traceback starts in the snippet.
+            traceback.print_exception(type(exc), exc, exc.__traceback__.tb_next)
+            error = f"{type(exc).__name__}: {exc}"
+    artifacts = scope.get("artifacts") or None
+    if artifacts is not None:
+        try:
+            json.dumps(artifacts, default=str)
+        except (TypeError, ValueError) as exc:
+            error = error or f"ArtifactsNotSerializable: {exc}"
+            artifacts = None
+    return {
+        "stdout": clip(out.getvalue(), limit),
+        "stderr": clip(err.getvalue(), limit),
+        "artifacts": artifacts,
+        "error": error,
+    }
+
+
+def _child(job, config, baseline, protocol, result_fd):
+    status = 1
+    try:
+        for stream in protocol:
+            stream.close()
+        apply_limits(config, baseline)
+        sys.addaudithook(audit)
+        reply = run_job(job, config["max_output_chars"])
+        data = json.dumps(reply, ensure_ascii=False, default=str).encode("utf-8")
+        while data:
+            data = data[os.write(result_fd, data) :]
+        status = 0
+    finally:
+        os._exit(status)
+
+
+def fork_job(job, config, baseline, protocol):
+    """Run ``job`` in a child forked from this process and return its reply.
+
+    The child never sees the ``protocol`` streams, and whatever the snippet
+    changes in the interpreter dies with it.  A child still running after
+    ``job["timeout_ms"]`` is killed and reported as a timeout.
+    """
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        _child(job, config, baseline, protocol, write_fd)
+    os.close(write_fd)
+
+    deadline = time.monotonic() + job["timeout_ms"] / 1000
+    chunks, timed_out = [], False
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([read_fd], [], [], remaining)[0]:
+                timed_out = True
+                break
+            part = os.read(read_fd, 1 << 16)
+            if not part:
+                break
+            chunks.append(part)
+    finally:
+        os.close(read_fd)
+    done, status = os.waitpid(pid, os.WNOHANG)
+    if not done:
+        # Timed out, or closed its result pipe and kept running.
+        os.kill(pid, signal.SIGKILL)
+        _, status = os.waitpid(pid, 0)
+
+    if timed_out:
+        return {"failure": "CODE_EXEC_TIMEOUT", "detail": f"{job['timeout_ms']}ms"}
+    try:
+        reply = json.loads(b"".join(chunks))
+    except ValueError:
+        reply = None
+    if not isinstance(reply, dict):
+        if os.WIFSIGNALED(status):
+            detail = signal.Signals(os.WTERMSIG(status)).name
+        elif os.waitstatus_to_exitcode(status) == 0:
+            detail = "malformed result"
+        else:
+            detail = f"exit status {os.waitstatus_to_exitcode(status)}"
+        return {"failure": "CODE_EXEC_WORKER_DIED", "detail": detail}
+    return {
+        "stdout": reply.get("stdout", ""),
+        "stderr": reply.get("stderr", ""),
+        "artifacts": reply.get("artifacts"),
+        "error": reply.get("error"),
+    }
+
+
+def main():
+    config = json.loads(sys.argv[1])
+    requests = os.fdopen(os.dup(0), "rb")
+    replies = os.fdopen(os.dup(1), "wb")
+    devnull = os.open(os.devnull, os.O_RDWR)
+    for fd in (0, 1):
+        os.dup2(devnull, fd)
+
+    preloaded = []
+    for name in config["preload"]:
+        try:
+            __import__(name)
+            preloaded.append(name)
+        except ImportError:
+            pass
+    baseline = address_space_bytes()
+    if config["isolate"]:
+        try:
+            isolate(config)
+        except OSError as exc:
+            write_frame(replies, {"ready": False, "error": f"SANDBOX_ISOLATION_FAILED:{exc}"})
+            return
+    write_frame(replies, {"ready": True, "pid": os.getpid(), "preloaded": preloaded})
+
+    while True:
+        job = read_frame(requests)
+        if job is None:
+            return
+        reply = fork_job(job, config, baseline, (requests, replies))
+        reply["id"] = job["id"]
+        write_frame(replies, reply)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Write-behind SQLite writer shared by the persistent stores.
+
+:class:`SQLiteWriter` owns the write connection of one SQLite file and a
+background thread.  Callers only enqueue writes; the thread drains the
+queue and hands each batch to the store's ``write`` callback inside a
+single transaction, so committing (and its fsync) never runs on the event
+loop.  The database runs in WAL mode, which lets readers on their own
+connections proceed while a batch is being written.
+
+Stores that must serve what they just wrote before it is committed register
+it as *pending* when they enqueue the write; :meth:`SQLiteWriter.pending`
+returns it until the batch holding it has been committed.
+"""
+
+from __future__ import annotations
+
+import queue
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, List, Mapping, Optional
+
+_STOP = object()
+
+
+class SQLiteWriter:
+    """Background writer of one SQLite file.
+
+    Parameters
+    ----------
+    path: str
+        SQLite database file.
+    write: callable
+        ``write(connection, writes)`` applies a batch of queued writes; it
+        runs inside one transaction on the writer thread.
+    schema: str
+        Script creating the tables, run once when the writer opens.
+    name: str
+        Name of the writer thread.
+    batch_size: int
+        Maximum number of queued writes committed in one transaction.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        write: Callable[[sqlite3.Connection, List[Any]], None],
+        *,
+        schema: str = "",
+        name: str = "sqlite-writer",
+        batch_size: int = 1000,
+    ) -> None:
+        self.path = path
+        self.batch_size = batch_size
+        self.batches_written = self.failed_batches = 0
+        self._write = write
+        self._queue: "queue.SimpleQueue[Any]" = queue.SimpleQueue()
+        self._pending: Dict[Any, Any] = {}
+        self._pending_lock = threading.Lock()
+
+        connection = sqlite3.connect(path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(schema)
+        connection.commit()
+        self._connection = connection
+        self._thread = threading.Thread(target=self._drain, name=name, daemon=True)
+        self._thread.start()
+
+    def put(self, write: Any, pending: Optional[Mapping[Any, Any]] = None) -> None:
+        """Queue ``write``; ``pending`` entries are served until it is committed."""
+
+        if pending:
+            with self._pending_lock:
+                self._pending.update(pending)
+        self._queue.put((write, pending))
+
+    def pending(self, key: Any) -> Any:
+        """Return the queued, not yet committed entry of ``key`` or ``None``."""
+
+        if not self._pending:
+            return None
+        with self._pending_lock:
+            return self._pending.get(key)
+
+    def discard_pending(self) -> None:
+        """Stop serving queued entries; their writes still happen."""
+
+        with self._pending_lock:
+            self._pending.clear()
+
+    def _drain(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            writes = [item for item in batch if isinstance(item, tuple)]
+            if writes:
+                try:
+                    with self._connection:
+                        self._write(self._connection, [write for write, _ in writes])
+                    self.batches_written += 1
+                except sqlite3.Error:
+                    # Keep draining: losing a batch beats stalling every writer.
+                    self.failed_batches += 1
+                self._settle(writes)
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+            if _STOP in batch:
+                return
+
+    def _settle(self, writes: List[Any]) -> None:
+        with self._pending_lock:
+            for _, pending in writes:
+                for key, value in (pending or {}).items():
+                    # A later write of the same key keeps its own entry.
+                    if self._pending.get(key) is value:
+                        del self._pending[key]
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until every write queued so far is committed."""
+
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self) -> None:
+        """Commit what is queued, stop the thread and close the connection."""
+
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+        self._connection.close()
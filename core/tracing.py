@@ -0,0 +1,350 @@
+"""Sampled per-run traces with nested spans.
+
+A sampled run gets a :class:`Trace`; the engine opens a span for the run and
+one per step, and code running inside a step (node handlers,
+:mod:`core.vector_store`, ...) opens child spans with :func:`span` or
+``ctx.span``.  The current span travels in a context variable, so spans nest
+correctly across ``await`` and concurrently running DAG branches without
+being passed around.
+
+When a run is not sampled there is no current span and :func:`span`
+returns a shared no-op object: the cost of instrumentation left in hot code
+is one context-variable lookup.
+
+Finished traces are kept in memory (see :func:`get_trace`) and, when a
+directory is configured, written there as Chrome trace-event JSON (open in
+``chrome://tracing`` or Perfetto) or OTLP-JSON.  Files are exported and
+written by a background thread, so finishing a run never blocks the event
+loop on disk; :func:`flush` waits for the queued ones.
+"""
+
+from __future__ import annotations
+
+import itertools
+import json
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+FORMATS = ("chrome", "otlp")
+
+# Fraction of runs traced when ``run_flow`` is not told explicitly.
+SAMPLE_RATE = 0.0
+
+# Directory finished traces are written to (``None`` keeps them in memory only).
+TRACE_DIR: Optional[str] = None
+
+TRACE_FORMAT = "chrome"
+
+# Number of finished traces kept for :func:`get_trace`.
+MAX_RECENT = 100
+
+_RECENT: "OrderedDict[str, Trace]" = OrderedDict()
+
+_CURRENT: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+# Trace files waiting for the writer thread, started on the first one.
+_WRITES: "queue.SimpleQueue[Any]" = queue.SimpleQueue()
+_WRITER: Optional[threading.Thread] = None
+_WRITER_LOCK = threading.Lock()
+
+
+class _NoopSpan:
+    """Stand-in returned by :func:`span` outside a sampled run."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc: Any) -> bool:
+        return False
+
+    def set(self, **attributes: Any) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """A timed operation; use as a context manager to make it current."""
+
+    __slots__ = (
+        "trace",
+        "name",
+        "span_id",
+        "parent_id",
+        "attributes",
+        "start_ns",
+        "end_ns",
+        "error",
+        "_token",
+    )
+
+    def __init__(
+        self, trace: "Trace", name: str, span_id: int, parent_id: Optional[int], attributes
+    ) -> None:
+        self.trace = trace
+        self.name = name
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.attributes: Dict[str, Any] = attributes
+        self.start_ns = self.end_ns = 0
+        self.error: Optional[str] = None
+
+    def __enter__(self) -> "Span":
+        self.start_ns = time.time_ns()
+        self._token = _CURRENT.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.end_ns = time.time_ns()
+        _CURRENT.reset(self._token)
+        if exc is not None:
+            self.error = str(exc) or exc_type.__name__
+        return False
+
+    def set(self, **attributes: Any) -> None:
+        """Add attributes, e.g. sizes only known once the work is done."""
+
+        self.attributes.update(attributes)
+
+
+class Trace:
+    """Spans recorded for one run."""
+
+    def __init__(self, run_id: str) -> None:
+        self.run_id = run_id
+        self.trace_id = uuid.uuid4().hex
+        self.spans: List[Span] = []
+        self._ids = itertools.count(1)
+
+    def span(self, name: str, parent: Optional[Span] = None, **attributes: Any) -> Span:
+        """Create a span (entered by the caller) below ``parent``."""
+
+        created = Span(
+            self, name, next(self._ids), parent.span_id if parent else None, attributes
+        )
+        self.spans.append(created)
+        return created
+
+    def finished(self) -> List[Span]:
+        return sorted((s for s in self.spans if s.end_ns), key=lambda s: s.start_ns)
+
+
+def span(name: str, **attributes: Any):
+    """Open a child of the current span, or a no-op outside a sampled run.
+
+    Use as ``with span("vector.search", top_k=5) as s: ...; s.set(hits=3)``.
+    """
+
+    parent = _CURRENT.get()
+    if parent is None:
+        return NOOP_SPAN
+    return parent.trace.span(name, parent, **attributes)
+
+
+def configure(
+    sample_rate: float = 0.0,
+    *,
+    directory: Optional[str] = None,
+    format: str = "chrome",
+    keep: int = 100,
+) -> None:
+    """Set the sampling rate, export directory/format and in-memory history."""
+
+    global SAMPLE_RATE, TRACE_DIR, TRACE_FORMAT, MAX_RECENT
+    if format not in FORMATS:
+        raise ValueError(f"UNKNOWN_TRACE_FORMAT:{format}")
+    # Traces finished under the old settings still land in the old directory.
+    flush()
+    SAMPLE_RATE = sample_rate
+    TRACE_DIR = directory
+    TRACE_FORMAT = format
+    MAX_RECENT = keep
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+
+def start_trace(run_id: str, sampled: Optional[bool] = None) -> Optional[Trace]:
+    """Return a new trace for ``run_id`` if the run is sampled, else ``None``.
+
+    ``sampled`` forces the decision; by default :data:`SAMPLE_RATE` applies.
+    """
+
+    if sampled is None:
+        sampled = SAMPLE_RATE > 0 and (SAMPLE_RATE >= 1 or random.random() < SAMPLE_RATE)
+    return Trace(run_id) if sampled else None
+
+
+def finish_trace(trace: Trace) -> None:
+    """Keep ``trace`` for :func:`get_trace` and write it to :data:`TRACE_DIR`."""
+
+    _RECENT[trace.run_id] = trace
+    _RECENT.move_to_end(trace.run_id)
+    while len(_RECENT) > MAX_RECENT:
+        _RECENT.popitem(last=False)
+    if TRACE_DIR:
+        path = os.path.join(TRACE_DIR, f"{trace.run_id}.{TRACE_FORMAT}.json")
+        _writer().put((path, trace, TRACE_FORMAT))
+
+
+def _writer() -> "queue.SimpleQueue[Any]":
+    global _WRITER
+    with _WRITER_LOCK:
+        if _WRITER is None:
+            _WRITER = threading.Thread(target=_write_traces, name="trace-writer", daemon=True)
+            _WRITER.start()
+    return _WRITES
+
+
+def _write_traces() -> None:
+    while True:
+        item = _WRITES.get()
+        if isinstance(item, threading.Event):
+            item.set()
+            continue
+        path, trace, format = item
+        try:
+            with open(path, "w", encoding="utf-8") as fh:
+                json.dump(export(trace, format), fh, ensure_ascii=False, default=str)
+        except OSError:
+            # A trace that cannot be written is dropped; later ones still are.
+            pass
+
+
+def flush(timeout: Optional[float] = None) -> bool:
+    """Block until every trace file queued so far is written."""
+
+    if _WRITER is None:
+        return True
+    done = threading.Event()
+    _WRITES.put(done)
+    return done.wait(timeout)
+
+
+def get_trace(run_id: str) -> Optional[Trace]:
+    return _RECENT.get(run_id)
+
+
+def clear() -> None:
+    _RECENT.clear()
+
+
+# ----------------------------------------------------------------------
+# Export
+# ----------------------------------------------------------------------
+
+
+def _lanes(spans: List[Span]) -> Dict[int, int]:
+    """Assign spans to rows so that spans sharing a row nest properly.
+
+    Chrome's viewer requires complete events of one thread to nest; spans of
+    concurrent DAG branches or hedged attempts overlap and get rows of their
+    own.
+    """
+
+    stacks: List[List[int]] = []
+    lanes: Dict[int, int] = {}
+    for s in sorted(spans, key=lambda s: (s.start_ns, -s.end_ns)):
+        for lane, stack in enumerate(stacks):
+            while stack and stack[-1] <= s.start_ns:
+                stack.pop()
+            if not stack or stack[-1] >= s.end_ns:
+                break
+        else:
+            stacks.append([])
+            lane = len(stacks) - 1
+        stacks[lane].append(s.end_ns)
+        lanes[s.span_id] = lane
+    return lanes
+
+
+def to_chrome(trace: Trace) -> Dict[str, Any]:
+    """Return ``trace`` as a Chrome trace-event document."""
+
+    spans = trace.finished()
+    lanes = _lanes(spans)
+    events = []
+    for s in spans:
+        args = dict(s.attributes)
+        if s.error is not None:
+            args["error"] = s.error
+        events.append(
+            {
+                "name": s.name,
+                "cat": "flow",
+                "ph": "X",
+                "ts": s.start_ns / 1000,
+                "dur": (s.end_ns - s.start_ns) / 1000,
+                "pid": 1,
+                "tid": lanes[s.span_id],
+                "args": args,
+            }
+        )
+    return {
+        "traceEvents": events,
+        "displayTimeUnit": "ms",
+        "otherData": {"run_id": trace.run_id, "trace_id": trace.trace_id},
+    }
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, str):
+        return {"stringValue": value}
+    return {"stringValue": json.dumps(value, ensure_ascii=False, default=str)}
+
+
+def to_otlp(trace: Trace) -> Dict[str, Any]:
+    """Return ``trace`` as an OTLP-JSON ``ExportTraceServiceRequest``."""
+
+    otlp_spans = []
+    for s in trace.finished():
+        item: Dict[str, Any] = {
+            "traceId": trace.trace_id,
+            "spanId": f"{s.span_id:016x}",
+            "name": s.name,
+            "kind": 1,
+            "startTimeUnixNano": str(s.start_ns),
+            "endTimeUnixNano": str(s.end_ns),
+            "attributes": [
+                {"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()
+            ],
+            "status": {"code": 1} if s.error is None else {"code": 2, "message": s.error},
+        }
+        if s.parent_id is not None:
+            item["parentSpanId"] = f"{s.parent_id:016x}"
+        otlp_spans.append(item)
+    resource = [
+        {"key": "service.name", "value": {"stringValue": "flow-runtime"}},
+        {"key": "run.id", "value": {"stringValue": trace.run_id}},
+    ]
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": resource},
+                "scopeSpans": [{"scope": {"name": "core.tracing"}, "spans": otlp_spans}],
+            }
+        ]
+    }
+
+
+def export(trace: Trace, format: str = "chrome") -> Dict[str, Any]:
+    if format == "chrome":
+        return to_chrome(trace)
+    if format == "otlp":
+        return to_otlp(trace)
+    raise ValueError(f"UNKNOWN_TRACE_FORMAT:{format}")
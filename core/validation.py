@@ -1,6 +1,7 @@
 from __future__ import annotations
 
-from typing import Any, Dict
+import copy
+from typing import Any, Callable, Dict, List, Tuple
 
 # JSON-like schema used for basic flow validation. This is not a full JSON
 # Schema implementation but mirrors the important constraints from the design
@@ -16,7 +17,8 @@ FLOW_SPEC_SCHEMA: Dict[str, Any] = {
         "http.request",
         "code.exec",
         "output",
-    }
+    },
+    "modes": {"linear", "dag"},
 }
 
 
@@ -47,6 +49,8 @@ def _apply_defaults_and_validate(params: Dict[str, Any], schema: Dict[str, Any])
             raise ValueError(f"INVALID_TYPE:{name}")
         if typ == "integer" and not isinstance(value, int):
             raise ValueError(f"INVALID_TYPE:{name}")
+        if typ == "boolean" and not isinstance(value, bool):
+            raise ValueError(f"INVALID_TYPE:{name}")
         if typ == "object" and not isinstance(value, dict):
             raise ValueError(f"INVALID_TYPE:{name}")
         if typ == "array" and not isinstance(value, list):
@@ -57,6 +61,10 @@ def _apply_defaults_and_validate(params: Dict[str, Any], schema: Dict[str, Any])
                 raise ValueError(f"MIN_EXCEEDED:{name}")
             if "maximum" in prop and value > prop["maximum"]:
                 raise ValueError(f"MAX_EXCEEDED:{name}")
+        if isinstance(value, str) and len(value) < prop.get("minLength", 0):
+            raise ValueError(f"MIN_LENGTH:{name}")
+        if "enum" in prop and value not in prop["enum"]:
+            raise ValueError(f"INVALID_ENUM:{name}")
 
         result[name] = value
 
@@ -68,80 +76,310 @@ def _apply_defaults_and_validate(params: Dict[str, Any], schema: Dict[str, Any])
     return result
 
 
-def validate_and_repair(flow: Dict[str, Any], catalog: Dict[str, Any]) -> Dict[str, Any]:
-    """Validate ``flow`` structure and apply defaults using ``catalog``.
+# ---------------------------------------------------------------------------
+# Compiled parameter validators
+# ---------------------------------------------------------------------------
 
-    The function performs a subset of the validation rules described in the
-    specification: node id uniqueness, edge references, required first/last
-    node types, and single in/out degree for each node. Parameters for each
-    node are validated against the provided catalog and missing values are
-    populated with defaults.
+ParamValidator = Callable[[Dict[str, Any]], Dict[str, Any]]
+
+_TYPE_CHECKS: Dict[str, Tuple[type, ...]] = {
+    "string": (str,),
+    "number": (int, float),
+    "integer": (int,),
+    "boolean": (bool,),
+    "object": (dict,),
+    "array": (list,),
+}
+
+_MISSING = object()
+
+# Property keywords the validators understand; schemas using any other one
+# are rejected when compiled instead of having the constraint ignored.
+SUPPORTED_KEYWORDS = frozenset(
+    {"type", "default", "minimum", "maximum", "minLength", "enum", "description"}
+)
+
+# Catalog version -> (catalog, validators by node type).
+_COMPILED: Dict[Any, Tuple[Dict[str, Any], Dict[str, ParamValidator]]] = {}
+
+
+def compile_schema(schema: Dict[str, Any]) -> ParamValidator:
+    """Return a closure equivalent to ``_apply_defaults_and_validate(params, schema)``.
+
+    Everything derived from ``schema`` (property order, defaults, type tuples,
+    bounds, the set of allowed names) is resolved once so that validating a
+    node only touches its own ``params``.  A property using a keyword outside
+    :data:`SUPPORTED_KEYWORDS` raises ``UNSUPPORTED_SCHEMA_KEYWORD``.
+    """
+
+    required = set(schema.get("required", []))
+    fields = []
+    for name, prop in schema.get("properties", {}).items():
+        unsupported = set(prop) - SUPPORTED_KEYWORDS
+        if unsupported:
+            raise ValueError(f"UNSUPPORTED_SCHEMA_KEYWORD:{name}.{min(unsupported)}")
+        default = prop.get("default", _MISSING)
+        fields.append(
+            (
+                name,
+                default,
+                isinstance(default, (dict, list)),
+                f"MISSING_PARAM:{name}" if name in required else None,
+                _TYPE_CHECKS.get(prop.get("type")),
+                f"INVALID_TYPE:{name}",
+                prop.get("minimum"),
+                f"MIN_EXCEEDED:{name}",
+                prop.get("maximum"),
+                f"MAX_EXCEEDED:{name}",
+                prop.get("minLength", 0),
+                f"MIN_LENGTH:{name}",
+                tuple(prop["enum"]) if "enum" in prop else None,
+                f"INVALID_ENUM:{name}",
+            )
+        )
+    allowed = frozenset(schema.get("properties", {}))
+    closed = not schema.get("additionalProperties", True)
+
+    def validate(params: Dict[str, Any]) -> Dict[str, Any]:
+        if not isinstance(params, dict):
+            raise ValueError("PARAMS_NOT_OBJECT")
+        result: Dict[str, Any] = {}
+        for (
+            name,
+            default,
+            mutable_default,
+            missing,
+            types,
+            invalid_type,
+            minimum,
+            min_code,
+            maximum,
+            max_code,
+            min_length,
+            min_length_code,
+            enum,
+            enum_code,
+        ) in fields:
+            value = params.get(name, _MISSING)
+            if value is _MISSING:
+                if default is _MISSING:
+                    if missing is not None:
+                        raise ValueError(missing)
+                    continue
+                value = copy.deepcopy(default) if mutable_default else default
+            if types is not None and not isinstance(value, types):
+                raise ValueError(invalid_type)
+            if isinstance(value, (int, float)):
+                if minimum is not None and value < minimum:
+                    raise ValueError(min_code)
+                if maximum is not None and value > maximum:
+                    raise ValueError(max_code)
+            elif isinstance(value, str) and len(value) < min_length:
+                raise ValueError(min_length_code)
+            if enum is not None and value not in enum:
+                raise ValueError(enum_code)
+            result[name] = value
+        if closed and not allowed.issuperset(params):
+            raise ValueError(f"UNKNOWN_PARAM:{next(k for k in params if k not in allowed)}")
+        return result
+
+    return validate
+
+
+def compile_catalog(catalog: Dict[str, Any]) -> Dict[str, ParamValidator]:
+    """Return the parameter validators of every node type in ``catalog``.
+
+    Compiled validators are cached by the catalog ``version``; bump it when
+    editing a catalog in place.
+    """
+
+    version = catalog.get("version")
+    entry = _COMPILED.get(version)
+    if entry is not None and entry[0] is catalog:
+        return entry[1]
+    validators = {
+        node_type: compile_schema(spec["schema"]) for node_type, spec in catalog["nodes"].items()
+    }
+    _COMPILED[version] = (catalog, validators)
+    return validators
+
+
+def _check_dag(nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]]) -> None:
+    """Reject cycles and nodes cut off from the input or the output node."""
+
+    succs: Dict[str, List[str]] = {n["id"]: [] for n in nodes}
+    preds: Dict[str, List[str]] = {n["id"]: [] for n in nodes}
+    for edge in edges:
+        succs[edge["from"]].append(edge["to"])
+        preds[edge["to"]].append(edge["from"])
+
+    # Kahn's algorithm: nodes left over sit on a cycle.
+    waiting = {nid: len(p) for nid, p in preds.items()}
+    ready = [nid for nid, n in waiting.items() if n == 0]
+    visited = 0
+    while ready:
+        nid = ready.pop()
+        visited += 1
+        for succ in succs[nid]:
+            waiting[succ] -= 1
+            if waiting[succ] == 0:
+                ready.append(succ)
+    if visited != len(nodes):
+        raise ValueError("CYCLE_DETECTED")
+
+    def reachable(start: str, links: Dict[str, List[str]]) -> set:
+        seen = {start}
+        stack = [start]
+        while stack:
+            for nxt in links[stack.pop()]:
+                if nxt not in seen:
+                    seen.add(nxt)
+                    stack.append(nxt)
+        return seen
+
+    if len(reachable(nodes[0]["id"], succs)) != len(nodes):
+        raise ValueError("UNREACHABLE_NODE")
+    if len(reachable(nodes[-1]["id"], preds)) != len(nodes):
+        raise ValueError("DEAD_END_NODE")
+
+
+def _error(code: str, **where: Any) -> Dict[str, Any]:
+    return {"code": code, **where}
+
+
+def _collect_errors(flow: Any, catalog: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Validate and repair ``flow`` in place, returning every error found.
+
+    Errors are listed in the order in which the checks run, so the first one
+    is what :func:`validate_and_repair` raises.  Structural errors that make
+    later checks meaningless (not an object, missing nodes/edges) end the
+    walk early; otherwise each node and edge is checked independently.
     """
 
     if not isinstance(flow, dict):
-        raise ValueError("FLOW_NOT_OBJECT")
+        return [_error("FLOW_NOT_OBJECT")]
 
     if not isinstance(flow.get("name"), str) or not flow["name"]:
-        raise ValueError("NAME_REQUIRED")
+        return [_error("NAME_REQUIRED")]
 
     nodes = flow.get("nodes")
     edges = flow.get("edges")
     if not isinstance(nodes, list) or len(nodes) < 2:
-        raise ValueError("NODES_MIN_TWO")
+        return [_error("NODES_MIN_TWO")]
     if not isinstance(edges, list) or len(edges) < 1:
-        raise ValueError("EDGES_MIN_ONE")
+        return [_error("EDGES_MIN_ONE")]
+    mode = flow.get("mode", "linear")
+    if mode not in FLOW_SPEC_SCHEMA["modes"]:
+        return [_error("UNKNOWN_MODE")]
+
+    errors: List[Dict[str, Any]] = []
+    validators = compile_catalog(catalog)
+    node_types = FLOW_SPEC_SCHEMA["node_types"]
 
     # Node id uniqueness and basic fields
-    ids = []
-    for node in nodes:
+    ids = set()
+    checked = []
+    for position, node in enumerate(nodes):
         if not isinstance(node, dict):
-            raise ValueError("NODE_NOT_OBJECT")
+            errors.append(_error("NODE_NOT_OBJECT", node=position))
+            continue
         node_id = node.get("id")
         node_type = node.get("type")
         if not isinstance(node_id, str) or not node_id.startswith("n") or not node_id[1:].isdigit():
-            raise ValueError("INVALID_NODE_ID")
+            errors.append(_error("INVALID_NODE_ID", node=position))
+            continue
         if node_id in ids:
-            raise ValueError("DUPLICATE_NODE_ID")
-        ids.append(node_id)
-        if node_type not in FLOW_SPEC_SCHEMA["node_types"]:
-            raise ValueError("UNKNOWN_NODE_TYPE")
+            errors.append(_error("DUPLICATE_NODE_ID", node_id=node_id))
+            continue
+        ids.add(node_id)
+        if node_type not in node_types or node_type not in validators:
+            errors.append(_error("UNKNOWN_NODE_TYPE", node_id=node_id))
+            continue
         if "params" not in node:
             node["params"] = {}
         elif not isinstance(node["params"], dict):
-            raise ValueError("PARAMS_NOT_OBJECT")
-
-    node_lookup = {n["id"]: n for n in nodes}
+            errors.append(_error("PARAMS_NOT_OBJECT", node_id=node_id))
+            continue
+        checked.append(node)
+    structural = not errors
 
     # Edge references
-    for edge in edges:
+    for position, edge in enumerate(edges):
         if not isinstance(edge, dict):
-            raise ValueError("EDGE_NOT_OBJECT")
-        src = edge.get("from")
-        dst = edge.get("to")
-        if src not in node_lookup or dst not in node_lookup:
-            raise ValueError("EDGE_REF_INVALID")
+            errors.append(_error("EDGE_NOT_OBJECT", edge=position))
+        elif edge.get("from") not in ids or edge.get("to") not in ids:
+            errors.append(_error("EDGE_REF_INVALID", edge=position))
+    structural = structural and not errors
 
     # First/last node types
-    if nodes[0]["type"] != "input":
-        raise ValueError("FIRST_NODE_MUST_BE_INPUT")
-    if nodes[-1]["type"] != "output":
-        raise ValueError("LAST_NODE_MUST_BE_OUTPUT")
+    if not isinstance(nodes[0], dict) or nodes[0].get("type") != "input":
+        errors.append(_error("FIRST_NODE_MUST_BE_INPUT"))
+    if not isinstance(nodes[-1], dict) or nodes[-1].get("type") != "output":
+        errors.append(_error("LAST_NODE_MUST_BE_OUTPUT"))
 
     # Validate params with catalog and apply defaults
-    for node in nodes:
-        node_type = node["type"]
-        schema = catalog["nodes"][node_type]["schema"]
-        node["params"] = _apply_defaults_and_validate(node["params"], schema)
+    for node in checked:
+        try:
+            node["params"] = validators[node["type"]](node["params"])
+        except ValueError as exc:
+            errors.append(_error(str(exc), node_id=node["id"]))
+
+    if not structural:
+        return errors
+
+    if mode == "dag":
+        try:
+            _check_dag(nodes, edges)
+        except ValueError as exc:
+            errors.append(_error(str(exc)))
+        return errors
 
     # Topology check: single in/out
-    deg_in = {nid: 0 for nid in node_lookup}
-    deg_out = {nid: 0 for nid in node_lookup}
+    deg_in = dict.fromkeys(ids, 0)
+    deg_out = dict.fromkeys(ids, 0)
     for edge in edges:
         deg_out[edge["from"]] += 1
         deg_in[edge["to"]] += 1
     if any(v > 1 for v in deg_in.values()):
-        raise ValueError("MULTI_IN_NOT_ALLOWED")
+        errors.append(_error("MULTI_IN_NOT_ALLOWED"))
     if any(v > 1 for v in deg_out.values()):
-        raise ValueError("MULTI_OUT_NOT_ALLOWED")
+        errors.append(_error("MULTI_OUT_NOT_ALLOWED"))
+    return errors
 
+
+def validate_and_repair(flow: Dict[str, Any], catalog: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate ``flow`` structure and apply defaults using ``catalog``.
+
+    The function performs a subset of the validation rules described in the
+    specification: node id uniqueness, edge references, required first/last
+    node types, and single in/out degree for each node. Parameters for each
+    node are validated against the provided catalog and missing values are
+    populated with defaults.
+
+    Flows declaring ``"mode": "dag"`` may fan out and fan in; instead of the
+    single in/out degree check they must be acyclic and every node must be
+    reachable from the input node and lead to the output node.
+    """
+
+    errors = _collect_errors(flow, catalog)
+    if errors:
+        raise ValueError(errors[0]["code"])
     return flow
+
+
+def validate_many(flows: List[Any], catalog: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Validate and repair several flows without stopping at the first failure.
+
+    Each flow is repaired in place like :func:`validate_and_repair`.  One
+    result is returned per flow: ``{"valid": True, "flow": flow, "errors": []}``
+    or ``{"valid": False, "flow": None, "errors": [...]}`` where every error is
+    a dict with a ``code`` (the ``ValueError`` message
+    :func:`validate_and_repair` would raise) and, when it concerns one
+    element, the ``node_id`` or the ``node``/``edge`` position.
+    """
+
+    results = []
+    for flow in flows:
+        errors = _collect_errors(flow, catalog)
+        results.append({"valid": not errors, "flow": None if errors else flow, "errors": errors})
+    return results
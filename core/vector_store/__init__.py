@@ -0,0 +1,527 @@
+"""Simple in-memory vector store used for tests.
+
+The real project integrates with Vertex AI Vector Search.  For the prototype and
+unit tests we provide an in-memory approximation with a compatible interface.
+It supports three asynchronous functions:
+
+``create_index_if_not_exists``
+    Register a named index, optionally with an approximate (IVF) search
+    structure.  The ``default`` index always exists.
+``upsert``
+    Store a list of chunks in memory.  Each chunk should contain ``text`` and
+    optional ``metadata``.  Embeddings are computed automatically using the
+    ``embed`` helper.
+``query``
+    Return the ``top_k`` chunks closest to the provided embedding using a
+    euclidean distance metric.  The result format matches the structure expected
+    by the runtime's ``rag.retrieve`` node.  Other modes rank by BM25 over the
+    chunk texts, fuse both rankings or score vectors only on a lexical
+    shortlist.
+
+Chunks are held by a :class:`~core.vector_store.columnar.ColumnarStore`, which
+keeps all embeddings in one contiguous ``float32`` matrix so a query is a
+single vectorized scan rather than a Python loop over chunk dicts.  Indexes
+created with ``ann="ivf"`` additionally maintain an
+:class:`~core.vector_store.ann.IVFIndex` so large corpora only scan a few
+k-means cells per query.  :func:`open_snapshot` backs an index by a
+memory-mapped on-disk snapshot (see :mod:`core.vector_store.segments`) so the
+corpus survives restarts and loads without re-embedding.  A
+:class:`~core.vector_store.lexical.LexicalIndex` over the texts serves exact
+terms such as policy numbers that embeddings retrieve poorly.  Indexes created
+with ``quantization="int8"`` or ``"pq"`` scan compressed codes (see
+:mod:`core.vector_store.quantization`) and re-rank the best rows exactly;
+:func:`index_stats` reports the memory per chunk of each representation.
+Indexes created with ``shards=N`` are partitioned over ``N`` worker processes
+(:class:`~core.vector_store.sharded.ShardedStore`) that search in parallel;
+:func:`shutdown` stops them.
+
+Embeddings come from a deterministic local function by default.
+:func:`configure_embeddings` points ``embed``/``embed_many`` at LiteLLM's
+``/v1/embeddings`` endpoint instead; concurrent ``embed`` calls are then
+coalesced into batched requests by a
+:class:`~core.vector_store.embeddings.MicroBatcher`.
+:func:`configure_embedding_cache` puts an
+:class:`~core.vector_store.embedding_cache.EmbeddingCache` in front of both
+paths so text that was embedded before is never sent again.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from core import tracing
+
+from .ann import IVFIndex
+from .columnar import ColumnarStore
+from .embedding_cache import EmbeddingCache
+from .embeddings import EMBEDDING_MODEL, EMBEDDINGS_URL, EmbeddingClient, MicroBatcher
+from .lexical import LexicalIndex, reciprocal_rank_fusion
+from .quantization import QUANTIZERS
+from .segments import Snapshot
+from .sharded import ShardedStore
+
+# ---------------------------------------------------------------------------
+# In-memory database
+# ---------------------------------------------------------------------------
+
+DEFAULT_INDEX = "default"
+
+VECTOR_DB = ColumnarStore()
+
+INDEXES: Dict[str, Union[ColumnarStore, ShardedStore]] = {DEFAULT_INDEX: VECTOR_DB}
+
+EMBEDDING_CLIENT: Optional[EmbeddingClient] = None
+
+_BATCHER: Optional[MicroBatcher] = None
+
+EMBEDDING_CACHE: Optional[EmbeddingCache] = None
+
+LOCAL_MODEL = "local"
+
+QUERY_MODES = ("vector", "lexical", "hybrid", "shortlist")
+
+# Rows taken from each ranking by the hybrid and shortlist modes.
+DEFAULT_CANDIDATES = 100
+
+
+def get_index(index_name: str = DEFAULT_INDEX) -> Union[ColumnarStore, ShardedStore]:
+    """Return the store registered as ``index_name``."""
+
+    try:
+        return INDEXES[index_name]
+    except KeyError:
+        raise ValueError(f"UNKNOWN_INDEX:{index_name}") from None
+
+
+async def create_index_if_not_exists(
+    index_name: str,
+    *,
+    metric: str = "euclidean",
+    ann: Optional[str] = None,
+    nlist: int = 256,
+    nprobe: int = 8,
+    train_size: Optional[int] = None,
+    lexical: bool = False,
+    quantization: Optional[str] = None,
+    pq_m: int = 8,
+    rerank: int = 4,
+    shards: Optional[int] = None,
+    path: Optional[str] = None,
+) -> None:
+    """Create ``index_name`` unless it already exists.
+
+    ``ann="ivf"`` attaches an inverted-file index with ``nlist`` k-means cells
+    that scans ``nprobe`` cells per query by default and trains itself once
+    ``train_size`` chunks are stored.  ``lexical`` attaches the BM25 index up
+    front; otherwise it is built on the first text query.
+    ``quantization`` (``"int8"`` or ``"pq"`` with ``pq_m`` bytes per chunk)
+    stores compressed codes, trained once ``train_size`` chunks are stored,
+    and rescores the best ``rerank * top_k`` rows of each scan exactly
+    (``rerank=0`` returns the approximate scores).  ``pq_m`` must divide the
+    embedding dimension; this is checked here when the dimension is known and
+    otherwise on the first insert, before any row is stored.  An existing
+    index keeps its metric but gains the requested structures if it has none
+    yet.
+
+    ``shards`` partitions a new index over that many worker processes (see
+    :class:`~core.vector_store.sharded.ShardedStore`), each holding its part
+    with the options above; ``path`` keeps one snapshot per shard there.
+    """
+
+    store = INDEXES.get(index_name)
+    options = {
+        "ann": ann,
+        "nlist": nlist,
+        "nprobe": nprobe,
+        "train_size": train_size,
+        "lexical": lexical,
+        "quantization": quantization,
+        "pq_m": pq_m,
+        "rerank": rerank,
+    }
+    if store is None and shards is not None:
+        # Starting the workers takes seconds; keep the event loop serving.
+        sharded = await asyncio.get_running_loop().run_in_executor(
+            None,
+            functools.partial(ShardedStore, shards, metric=metric, path=path, options=options),
+        )
+        if index_name in INDEXES:
+            sharded.close()
+        else:
+            INDEXES[index_name] = sharded
+        return None
+    if isinstance(store, ShardedStore):
+        return None
+    if store is None:
+        store = INDEXES[index_name] = ColumnarStore(metric=metric)
+    _configure_store(store, **options)
+    return None
+
+
+def _configure_store(
+    store: ColumnarStore,
+    *,
+    ann: Optional[str],
+    nlist: int,
+    nprobe: int,
+    train_size: Optional[int],
+    lexical: bool,
+    quantization: Optional[str],
+    pq_m: int,
+    rerank: int,
+) -> None:
+    if lexical:
+        _lexical(store)
+    if quantization is not None and store.quantizer is None:
+        if quantization not in QUANTIZERS:
+            raise ValueError(f"UNKNOWN_QUANTIZATION:{quantization}")
+        options = {"m": pq_m} if quantization == "pq" else {}
+        quantizer = QUANTIZERS[quantization](
+            store, train_size=train_size, rerank=rerank, **options
+        )
+        if store.dim is not None:
+            quantizer.check_dim(store.dim)
+        store.quantizer = quantizer
+        quantizer.add(store.live_rows())
+    if ann is None or store.ann is not None:
+        return None
+    if ann != "ivf":
+        raise ValueError(f"UNKNOWN_ANN:{ann}")
+    store.ann = IVFIndex(store, nlist=nlist, nprobe=nprobe, train_size=train_size)
+    store.ann.add(store.live_rows())
+    return None
+
+
+def index_stats(index_name: str = DEFAULT_INDEX) -> Dict[str, Any]:
+    """Return the size of ``index_name`` and of its optional structures.
+
+    ``vector_bytes_per_chunk`` is what the scan reads per chunk: the code
+    size once a quantizer is trained, the float32 vector otherwise.  Use
+    ``get_index(name).quantizer.recall(queries)`` to measure what the codes
+    cost in recall.
+    """
+
+    store = get_index(index_name)
+    if isinstance(store, ShardedStore):
+        return store.stats()
+    return _store_stats(store)
+
+
+def _store_stats(store: ColumnarStore) -> Dict[str, Any]:
+    quantizer = store.quantizer.stats() if store.quantizer is not None else None
+    dim = store.dim or 0
+    return {
+        "rows": len(store),
+        "dim": dim,
+        "metric": store.metric,
+        "vector_bytes_per_chunk": (
+            quantizer["code_bytes_per_chunk"] if quantizer and quantizer["trained"] else 4 * dim
+        ),
+        "snapshot": store.snapshot is not None,
+        "ann": store.ann is not None and store.ann.trained,
+        "quantizer": quantizer,
+        "lexical": store.lexical.stats() if store.lexical is not None else None,
+    }
+
+
+async def open_snapshot(
+    path: str, *, index_name: str = DEFAULT_INDEX, durable: bool = False
+) -> ColumnarStore:
+    """Back ``index_name`` by the snapshot directory at ``path``.
+
+    An existing snapshot is memory-mapped and replaces the index contents;
+    otherwise the snapshot is created from the rows currently in the index.
+    Subsequent ``upsert`` calls append new segments to the snapshot.
+    """
+
+    await create_index_if_not_exists(index_name)
+    store = INDEXES[index_name]
+    if isinstance(store, ShardedStore):
+        raise ValueError("SHARDED_INDEX_HAS_PATH")
+    store.attach(Snapshot(path, durable=durable))
+    return store
+
+
+def configure_embeddings(
+    url: Optional[str] = EMBEDDINGS_URL,
+    *,
+    model: str = EMBEDDING_MODEL,
+    max_batch: int = 64,
+    max_wait_ms: float = 2.0,
+    timeout_s: float = 30.0,
+) -> None:
+    """Route embeddings through the gateway at ``url``, or locally for ``None``.
+
+    ``max_batch`` and ``max_wait_ms`` bound the micro-batching window used to
+    coalesce concurrent :func:`embed` calls.
+    """
+
+    global EMBEDDING_CLIENT, _BATCHER
+    if url is None:
+        EMBEDDING_CLIENT = _BATCHER = None
+    else:
+        EMBEDDING_CLIENT = EmbeddingClient(url, model=model, timeout_s=timeout_s)
+        _BATCHER = MicroBatcher(
+            EMBEDDING_CLIENT.embed_many, max_batch=max_batch, max_wait_ms=max_wait_ms
+        )
+    if EMBEDDING_CACHE is not None:
+        EMBEDDING_CACHE.set_model(_embedding_model())
+
+
+def _embedding_model() -> str:
+    return EMBEDDING_CLIENT.model if EMBEDDING_CLIENT is not None else LOCAL_MODEL
+
+
+def configure_embedding_cache(
+    max_entries: Optional[int] = 4096, *, path: Optional[str] = None
+) -> Optional[EmbeddingCache]:
+    """Cache up to ``max_entries`` embeddings in memory, ``None`` disables.
+
+    ``path`` adds a persistent SQLite tier that survives restarts.  Entries
+    are keyed by the active embedding model, so switching models through
+    :func:`configure_embeddings` invalidates them.
+    """
+
+    global EMBEDDING_CACHE
+    if EMBEDDING_CACHE is not None:
+        EMBEDDING_CACHE.close()
+        EMBEDDING_CACHE = None
+    if max_entries is not None:
+        EMBEDDING_CACHE = EmbeddingCache(_embedding_model(), max_entries, path=path)
+    return EMBEDDING_CACHE
+
+
+def _local_embedding(text: str) -> List[float]:
+    if not text:
+        return [0.0]
+    return [sum(ord(ch) for ch in text) / len(text)]
+
+
+async def embed(text: str) -> List[float]:
+    """Return an embedding for ``text``.
+
+    Without a configured gateway the function maps the text to a single
+    floating point number derived from the ordinal values of its characters.
+    While obviously not semantically meaningful, it is deterministic which
+    suffices for unit tests.
+    """
+
+    cache = EMBEDDING_CACHE
+    if cache is not None:
+        cached = cache.get_many([text])[0]
+        if cached is not None:
+            return cached
+    if _BATCHER is None:
+        embedding = _local_embedding(text)
+    else:
+        with tracing.span("vector_store.embed", chars=len(text)):
+            embedding = await _BATCHER.submit(text)
+    if cache is not None:
+        cache.put_many([text], [embedding])
+    return embedding
+
+
+async def embed_many(texts: List[str]) -> List[List[float]]:
+    """Return embeddings for all ``texts`` using as few requests as possible."""
+
+    cache = EMBEDDING_CACHE
+    results = cache.get_many(texts) if cache is not None else [None] * len(texts)
+    missing = [i for i, emb in enumerate(results) if emb is None]
+    if not missing:
+        return results
+    pending = [texts[i] for i in missing]
+    if EMBEDDING_CLIENT is None:
+        computed = [_local_embedding(text) for text in pending]
+    else:
+        computed = await EMBEDDING_CLIENT.embed_many(pending)
+    if cache is not None:
+        cache.put_many(pending, computed)
+    for i, emb in zip(missing, computed):
+        results[i] = emb
+    return results
+
+
+async def upsert(
+    chunks: List[Dict[str, Any]], *, index_name: str = DEFAULT_INDEX
+) -> str:
+    """Insert ``chunks`` into the in-memory database.
+
+    Each chunk is expected to contain ``text`` and optional ``metadata``.
+    Missing embeddings are computed with a single :func:`embed_many` call.
+    Chunks whose ``id`` is already stored replace the previous row.  The
+    function returns a dummy task identifier similar to the asynchronous
+    behaviour of the real Vertex service.
+    """
+
+    store = get_index(index_name)
+    if not chunks:
+        return f"task_{len(store)}"
+    missing = [i for i, c in enumerate(chunks) if "embedding" not in c]
+    computed = await embed_many([chunks[i].get("text", "") for i in missing])
+    embeddings = [c.get("embedding") for c in chunks]
+    for i, emb in zip(missing, computed):
+        embeddings[i] = emb
+    columns = (
+        [c.get("id") for c in chunks],
+        [c.get("text", "") for c in chunks],
+        [c.get("metadata", {}) for c in chunks],
+        embeddings,
+    )
+    if isinstance(store, ShardedStore):
+        await store.add(*columns)
+    else:
+        store.add(*columns)
+    return f"task_{len(store)}"
+
+
+def _lexical(store: ColumnarStore) -> LexicalIndex:
+    if store.lexical is None:
+        store.lexical = LexicalIndex(store)
+        store.lexical.add(store.live_rows())
+    return store.lexical
+
+
+def _search(
+    store: ColumnarStore,
+    embedding: Optional[List[float]],
+    top_k: int,
+    filters: Optional[Dict[str, Any]],
+    nprobe: Optional[int],
+    text: Optional[str],
+    mode: str,
+    candidates: Optional[int],
+    rerank: Optional[int],
+):
+    if mode not in QUERY_MODES:
+        raise ValueError(f"UNKNOWN_QUERY_MODE:{mode}")
+    if mode == "vector":
+        return store.search(embedding, top_k, filters=filters, nprobe=nprobe, rerank=rerank)
+    if text is None:
+        raise ValueError("QUERY_TEXT_REQUIRED")
+    _lexical(store)
+    if mode == "lexical":
+        return store.search_text(text, top_k, filters=filters)
+    depth = max(candidates or DEFAULT_CANDIDATES, top_k)
+    if mode == "hybrid":
+        vector, lexical = _candidates(store, embedding, depth, filters, nprobe, text, rerank)
+        return reciprocal_rank_fusion(
+            [[row for row, _ in vector], [row for row, _ in lexical]]
+        )[:top_k]
+    shortlist = [row for row, _ in store.search_text(text, depth, filters=filters)]
+    if not shortlist:
+        # No query term occurs anywhere: rank by vector alone.
+        return store.search(embedding, top_k, filters=filters, nprobe=nprobe, rerank=rerank)
+    return store.search(embedding, top_k, filters=filters, rows=shortlist)
+
+
+def _candidates(
+    store: ColumnarStore,
+    embedding: Optional[List[float]],
+    depth: int,
+    filters: Optional[Dict[str, Any]],
+    nprobe: Optional[int],
+    text: str,
+    rerank: Optional[int],
+) -> Tuple[List[Tuple[int, float]], List[Tuple[int, float]]]:
+    """Return the best ``depth`` ``(row, score)`` pairs by vector and by BM25."""
+
+    _lexical(store)
+    return (
+        store.search(embedding, depth, filters=filters, nprobe=nprobe, rerank=rerank),
+        store.search_text(text, depth, filters=filters),
+    )
+
+
+async def query(
+    embedding: Optional[List[float]],
+    top_k: int,
+    filters: Dict[str, Any] | None = None,
+    *,
+    index_name: str = DEFAULT_INDEX,
+    nprobe: Optional[int] = None,
+    text: Optional[str] = None,
+    mode: str = "vector",
+    candidates: Optional[int] = None,
+    rerank: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Return the ``top_k`` most similar chunks to ``embedding``.
+
+    ``filters`` restrict the search to chunks whose metadata matches, see
+    :mod:`core.vector_store.filters` for the syntax (equality, ``$in``,
+    numeric ranges and membership in list fields such as ``acl``).  ``nprobe``
+    overrides the number of IVF cells scanned when
+    the index has an ANN structure and ``rerank`` the re-ranking depth of a
+    quantized index.  Results are returned in a format suitable
+    for the ``rag.retrieve`` node: a list of dicts containing ``text``, ``meta``
+    and ``score`` fields.
+
+    ``mode`` selects how chunks are ranked, every mode but ``"vector"``
+    needs the query ``text``:
+
+    ``"vector"``
+        Similarity to ``embedding`` (the default).
+    ``"lexical"``
+        BM25 over the chunk texts; ``embedding`` may be ``None``.
+    ``"hybrid"``
+        Reciprocal rank fusion of the best ``candidates`` rows of both
+        rankings; ``score`` is the fused score.
+    ``"shortlist"``
+        Vector similarity computed only for the best ``candidates`` BM25
+        rows, which is much cheaper than a full scan on large corpora.
+    """
+
+    store = get_index(index_name)
+    with tracing.span(
+        "vector_store.query", index=index_name, rows=len(store), top_k=top_k, mode=mode
+    ):
+        if isinstance(store, ShardedStore):
+            return await store.search(
+                embedding, top_k, filters, nprobe, text, mode, candidates, rerank
+            )
+        hits = _search(
+            store, embedding, top_k, filters, nprobe, text, mode, candidates, rerank
+        )
+    return _chunks(store, hits)
+
+
+def _chunks(store: ColumnarStore, hits: List[Any]) -> List[Dict[str, Any]]:
+    return [
+        {"text": store.texts[row], "meta": store.metadata[row], "score": score}
+        for row, score in hits
+    ]
+
+
+async def query_many(
+    embeddings: List[List[float]],
+    top_k: int,
+    filters: Dict[str, Any] | None = None,
+    *,
+    index_name: str = DEFAULT_INDEX,
+    nprobe: Optional[int] = None,
+    rerank: Optional[int] = None,
+) -> List[List[Dict[str, Any]]]:
+    """Batched :func:`query`: one result list per embedding, in order.
+
+    Exact scans score all queries against the store with one matrix product.
+    """
+
+    store = get_index(index_name)
+    if isinstance(store, ShardedStore):
+        return await store.search_many(embeddings, top_k, filters, nprobe, rerank)
+    return [
+        _chunks(store, hits)
+        for hits in store.search_many(
+            embeddings, top_k, filters=filters, nprobe=nprobe, rerank=rerank
+        )
+    ]
+
+
+def shutdown() -> None:
+    """Stop the worker processes of every sharded index."""
+
+    for name, store in list(INDEXES.items()):
+        if isinstance(store, ShardedStore):
+            store.close()
+            del INDEXES[name]
@@ -0,0 +1,183 @@
+"""Inverted-file (IVF) approximate nearest-neighbour index.
+
+A k-means coarse quantizer partitions the rows of a
+:class:`~core.vector_store.columnar.ColumnarStore` into ``nlist`` inverted
+lists.  A query only scores the rows stored in the ``nprobe`` lists whose
+centroids are closest to it, so the scan touches roughly
+``nprobe / nlist`` of the corpus.  ``nprobe`` is the recall/latency knob:
+``nprobe == nlist`` degenerates to exact search.
+
+The index trains itself once the store holds ``train_size`` rows; until then
+searches fall back to the exact scan.  After training every upserted row is
+assigned to its nearest centroid incrementally, centroids are not retrained.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, Iterable, List, Optional
+
+import numpy as np
+
+if TYPE_CHECKING:  # pragma: no cover - import cycle only needed for typing
+    from .columnar import ColumnarStore
+
+_ASSIGN_BATCH = 65_536
+
+
+def _nearest(x: np.ndarray, centroids: np.ndarray, c_sqnorms: np.ndarray) -> np.ndarray:
+    """Return the index of the nearest centroid for every row of ``x``."""
+
+    out = np.empty(x.shape[0], dtype=np.int32)
+    for start in range(0, x.shape[0], _ASSIGN_BATCH):
+        block = x[start : start + _ASSIGN_BATCH]
+        keys = c_sqnorms[None, :] - 2.0 * (block @ centroids.T)
+        out[start : start + _ASSIGN_BATCH] = np.argmin(keys, axis=1)
+    return out
+
+
+def kmeans(x: np.ndarray, k: int, n_iter: int = 10, seed: int = 0) -> np.ndarray:
+    """Lloyd's k-means on the rows of ``x`` returning ``k`` centroids."""
+
+    rng = np.random.default_rng(seed)
+    centroids = x[rng.choice(x.shape[0], size=k, replace=False)].copy()
+    for _ in range(n_iter):
+        assign = _nearest(x, centroids, np.einsum("ij,ij->i", centroids, centroids))
+        counts = np.bincount(assign, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, x)
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        # Re-seed empty clusters from random points so ``k`` lists stay usable.
+        if empty.any():
+            centroids[empty] = x[rng.choice(x.shape[0], size=int(empty.sum()))]
+    return centroids
+
+
+class IVFIndex:
+    """IVF coarse quantizer over the rows of a columnar store.
+
+    Parameters
+    ----------
+    store: ColumnarStore
+        Store whose rows are indexed.
+    nlist: int
+        Number of k-means cells.
+    nprobe: int
+        Default number of cells scanned per query.
+    train_size: int, optional
+        Row count that triggers training, defaults to ``39 * nlist``.
+    """
+
+    def __init__(
+        self,
+        store: "ColumnarStore",
+        nlist: int = 256,
+        nprobe: int = 8,
+        train_size: Optional[int] = None,
+    ) -> None:
+        if nlist < 1 or nprobe < 1:
+            raise ValueError("INVALID_IVF_PARAMS")
+        self.store = store
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_size = max(train_size or 39 * nlist, nlist)
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget the trained centroids and all list memberships."""
+
+        self.centroids: Optional[np.ndarray] = None
+        self._c_sqnorms: Optional[np.ndarray] = None
+        self._members: List[List[int]] = []
+        self._arrays: List[Optional[np.ndarray]] = []
+        self._assign = np.empty(0, dtype=np.int32)
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    def _vectors(self, rows: Any) -> np.ndarray:
+        vecs = self.store._emb[rows]
+        if self.store.metric == "cosine":
+            norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+            vecs = np.divide(vecs, norms, out=np.zeros_like(vecs), where=norms > 0)
+        return vecs
+
+    def train(self) -> None:
+        """Fit the coarse quantizer on a sample and assign every stored row."""
+
+        live = np.fromiter(self.store.live_rows(), dtype=np.int64)
+        if live.size < self.nlist:
+            raise ValueError("NOT_ENOUGH_ROWS_TO_TRAIN")
+        rng = np.random.default_rng(0)
+        sample = rng.choice(live, size=min(live.size, self.train_size), replace=False)
+        self.centroids = kmeans(self._vectors(np.sort(sample)), self.nlist)
+        self._c_sqnorms = np.einsum("ij,ij->i", self.centroids, self.centroids)
+        self._members = [[] for _ in range(self.nlist)]
+        self._arrays = [None] * self.nlist
+        self._assign = np.full(self.store.slots, -1, dtype=np.int32)
+        self.add(live)
+
+    def add(self, rows: Iterable[int]) -> None:
+        """Assign ``rows`` to their nearest list, training first if due."""
+
+        if not self.trained:
+            if len(self.store) >= self.train_size:
+                self.train()
+            return
+        rows = np.fromiter(rows, dtype=np.int64)
+        if rows.size == 0:
+            return
+        if rows.max() >= self._assign.shape[0]:
+            size = max(int(rows.max()) + 1, 2 * self._assign.shape[0])
+            grown = np.full(size, -1, dtype=np.int32)
+            grown[: self._assign.shape[0]] = self._assign
+            self._assign = grown
+        lists = _nearest(self._vectors(rows), self.centroids, self._c_sqnorms)
+        for row, lst in zip(rows.tolist(), lists.tolist()):
+            previous = int(self._assign[row])
+            if previous == lst:
+                continue
+            if previous >= 0:
+                self._members[previous].remove(row)
+                self._arrays[previous] = None
+            self._members[lst].append(row)
+            self._arrays[lst] = None
+            self._assign[row] = lst
+
+    def _list_rows(self, lst: int) -> np.ndarray:
+        arr = self._arrays[lst]
+        if arr is None:
+            arr = self._arrays[lst] = np.asarray(self._members[lst], dtype=np.int64)
+        return arr
+
+    def candidates(self, q: np.ndarray, nprobe: Optional[int] = None) -> np.ndarray:
+        """Return the rows stored in the ``nprobe`` lists closest to ``q``."""
+
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        qv = q
+        if self.store.metric == "cosine":
+            norm = np.linalg.norm(q)
+            qv = q / norm if norm > 0 else q
+        keys = self._c_sqnorms - 2.0 * (self.centroids @ qv)
+        if nprobe < self.nlist:
+            probe = np.argpartition(keys, nprobe - 1)[:nprobe]
+        else:
+            probe = np.arange(self.nlist)
+        return np.concatenate([self._list_rows(int(lst)) for lst in probe])
+
+    def recall(
+        self,
+        queries: Any,
+        top_k: int = 10,
+        nprobe: Optional[int] = None,
+    ) -> float:
+        """Return mean recall@``top_k`` of this index against exact search."""
+
+        hits = total = 0
+        for q in np.asarray(queries, dtype=np.float32):
+            exact = {row for row, _ in self.store.search(q, top_k, exact=True)}
+            approx = {row for row, _ in self.store.search(q, top_k, nprobe=nprobe)}
+            hits += len(exact & approx)
+            total += len(exact)
+        return hits / total if total else 1.0
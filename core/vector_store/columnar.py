@@ -0,0 +1,572 @@
+"""Columnar storage engine backing :mod:`core.vector_store`.
+
+Embeddings live in one contiguous ``float32`` matrix while ids, texts and
+metadata are kept in parallel Python lists indexed by row number.  Queries are
+answered with a single matrix-vector product followed by a partial selection
+(``argpartition``) of the best ``top_k`` rows, so the interpreted work per
+query is independent of the corpus size.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .filters import MetadataIndex
+from .segments import RecordField, Snapshot
+
+if TYPE_CHECKING:  # pragma: no cover - import cycle only needed for typing
+    from .ann import IVFIndex
+    from .lexical import LexicalIndex
+    from .quantization import Quantizer
+
+METRICS = ("euclidean", "cosine")
+
+_INITIAL_CAPACITY = 1024
+
+# Upper bound on the ranking keys materialized per query block of search_many.
+_KEYS_PER_BLOCK = 1 << 22
+
+
+class ColumnarStore:
+    """Append-mostly table of chunks with a dense embedding column.
+
+    Rows are addressed by their insertion position.  Upserting a chunk whose
+    ``id`` is already stored overwrites that row in place, chunks without an
+    ``id`` are always appended.  An optional :attr:`ann` index is kept in sync
+    with every write and used by :meth:`search` once it is trained, and a
+    :class:`~core.vector_store.filters.MetadataIndex` turns metadata filters
+    into row masks before any vector is scored.  An optional :attr:`lexical`
+    BM25 index over the texts and an optional :attr:`quantizer` holding
+    compressed codes of the embeddings are maintained the same way as
+    :attr:`ann`.
+
+    A store attached to a :class:`~core.vector_store.segments.Snapshot` keeps
+    its columns in memory-mapped files instead: writes are appended to the
+    snapshot as new segments and the mapped matrix is scanned directly.  As
+    committed rows are immutable there, an overwritten chunk moves to a new
+    row and its old row is tombstoned: it keeps its number but is excluded
+    from :func:`len`, iteration and every search.
+    """
+
+    def __init__(self, metric: str = "euclidean") -> None:
+        if metric not in METRICS:
+            raise ValueError(f"UNKNOWN_METRIC:{metric}")
+        self.metric = metric
+        self.ann: Optional["IVFIndex"] = None
+        self.lexical: Optional["LexicalIndex"] = None
+        self.quantizer: Optional["Quantizer"] = None
+        self.filters = MetadataIndex()
+        self.snapshot: Optional[Snapshot] = None
+        self.clear()
+
+    # ------------------------------------------------------------------
+    # Container protocol
+    # ------------------------------------------------------------------
+
+    def clear(self) -> None:
+        """Drop every row, forget the embedding dimension and detach any snapshot.
+
+        The files of a detached snapshot are left untouched.
+        """
+
+        self.dim: Optional[int] = None
+        self.ids: Sequence[Optional[str]] = []
+        self.texts: Sequence[str] = []
+        self.metadata: Sequence[Dict[str, Any]] = []
+        self._rows: Optional[Dict[str, int]] = {}
+        self._emb = np.empty((0, 0), dtype=np.float32)
+        self._sqnorms = np.empty(0, dtype=np.float32)
+        self._size = 0
+        self._live: Optional[np.ndarray] = None
+        self._dead = 0
+        self.snapshot = None
+        self.filters.clear()
+        self._filters_ready = True
+        if self.ann is not None:
+            self.ann.reset()
+        if self.lexical is not None:
+            self.lexical.reset()
+        if self.quantizer is not None:
+            self.quantizer.reset()
+
+    def __len__(self) -> int:
+        return self._size - self._dead
+
+    @property
+    def slots(self) -> int:
+        """Row numbers in use, tombstoned rows included."""
+
+        return self._size
+
+    def live_rows(self) -> Iterable[int]:
+        """Row numbers of the chunks currently stored."""
+
+        if self._live is None:
+            return range(self._size)
+        return np.flatnonzero(self._live).tolist()
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for row in self.live_rows():
+            yield self.row(row)
+
+    def row(self, row: int) -> Dict[str, Any]:
+        """Return row ``row`` reassembled as a chunk dict."""
+
+        chunk: Dict[str, Any] = {
+            "text": self.texts[row],
+            "metadata": self.metadata[row],
+            "embedding": self._emb[row].tolist(),
+        }
+        if self.ids[row] is not None:
+            chunk["id"] = self.ids[row]
+        return chunk
+
+    @property
+    def embeddings(self) -> np.ndarray:
+        """Read-only view of the populated part of the embedding matrix."""
+
+        view = self._emb[: self._size]
+        view.flags.writeable = False
+        return view
+
+    # ------------------------------------------------------------------
+    # Snapshots
+    # ------------------------------------------------------------------
+
+    def attach(self, snapshot: Snapshot) -> None:
+        """Back this store by ``snapshot``.
+
+        An existing snapshot replaces the in-memory contents (and metric) of
+        the store; the mapping is lazy, so only the pages touched by queries
+        are ever read.  A new snapshot is seeded with the current rows.
+        """
+
+        if snapshot.exists and self.quantizer is not None:
+            self.quantizer.check_dim(snapshot.dim)
+        if not snapshot.exists and self._size:
+            snapshot.write(
+                [self.ids[r] for r in range(self._size)],
+                [self.texts[r] for r in range(self._size)],
+                [self.metadata[r] for r in range(self._size)],
+                self._emb[: self._size],
+                self._sqnorms[: self._size],
+                metric=self.metric,
+            )
+        self.clear()
+        self.snapshot = snapshot
+        if snapshot.exists:
+            self.metric = snapshot.metric
+            # The id map and metadata postings are rebuilt on first use so
+            # read-only workers never decode every record.
+            self._rows = None
+            self._filters_ready = False
+            self._map_snapshot()
+        if self.ann is not None:
+            self.ann.add(self.live_rows())
+        if self.lexical is not None:
+            self.lexical.add(self.live_rows())
+        if self.quantizer is not None:
+            self.quantizer.add(self.live_rows())
+
+    def _map_snapshot(self) -> None:
+        snapshot = self.snapshot
+        self.dim = snapshot.dim
+        self._emb = snapshot.embeddings
+        self._sqnorms = snapshot.sqnorms
+        self._size = snapshot.rows
+        self.ids = RecordField(snapshot, 0)
+        self.texts = RecordField(snapshot, 1)
+        self.metadata = RecordField(snapshot, 2)
+        self._dead = snapshot.dead
+        if self._dead:
+            self._live = np.ones(self._size, dtype=bool)
+            self._live[snapshot.tombstones.astype(np.int64)] = False
+        else:
+            self._live = None
+
+    def refresh(self) -> None:
+        """Pick up segments committed to the snapshot by another process."""
+
+        if self.snapshot is not None and self.snapshot.refresh():
+            previous, dead = self._size, self._dead
+            self._rows = None
+            self._filters_ready = False
+            self._map_snapshot()
+            if self.ann is not None:
+                self.ann.add(range(previous, self._size))
+            if self.lexical is not None:
+                self.lexical.add(range(previous, self._size))
+                # Rows replaced since the last refresh leave the BM25 stats;
+                # the ANN lists and codes keep them, masked out by _live.
+                for row in self.snapshot.tombstones[dead:].tolist():
+                    self.lexical.remove(row, self.texts[row])
+            if self.quantizer is not None:
+                self.quantizer.add(range(previous, self._size))
+
+    def _row_of(self, chunk_id: Optional[str]) -> Optional[int]:
+        if chunk_id is None:
+            return None
+        if self._rows is None:
+            self._rows = {}
+            for row in self.live_rows():
+                if self.ids[row] is not None:
+                    self._rows[self.ids[row]] = row
+        return self._rows.get(chunk_id)
+
+    def _filter_mask(self, filters: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        if filters and not self._filters_ready:
+            self.filters.clear()
+            for row in self.live_rows():
+                self.filters.add(row, self.metadata[row])
+            self._filters_ready = True
+        mask = self.filters.mask(filters, self._size)
+        if self._live is None:
+            return mask
+        return self._live if mask is None else mask & self._live
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def _reserve(self, extra: int) -> None:
+        needed = self._size + extra
+        capacity = self._emb.shape[0]
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2, _INITIAL_CAPACITY)
+        emb = np.empty((capacity, self.dim), dtype=np.float32)
+        emb[: self._size] = self._emb[: self._size]
+        sqnorms = np.empty(capacity, dtype=np.float32)
+        sqnorms[: self._size] = self._sqnorms[: self._size]
+        self._emb, self._sqnorms = emb, sqnorms
+
+    def add(
+        self,
+        ids: Sequence[Optional[str]],
+        texts: Sequence[str],
+        metadata: Sequence[Dict[str, Any]],
+        embeddings: Any,
+    ) -> List[int]:
+        """Insert or overwrite a batch of rows and return their row numbers."""
+
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if matrix.ndim != 2 or matrix.shape[0] != len(ids):
+            raise ValueError("EMBEDDING_SHAPE_INVALID")
+        if self.dim is None:
+            if self.quantizer is not None:
+                self.quantizer.check_dim(matrix.shape[1])
+            self.dim = int(matrix.shape[1])
+            self._emb = np.empty((0, self.dim), dtype=np.float32)
+        elif matrix.shape[1] != self.dim:
+            raise ValueError("EMBEDDING_DIM_MISMATCH")
+
+        sqnorms = np.einsum("ij,ij->i", matrix, matrix)
+        replaced: Dict[int, str] = {}
+        if self.lexical is not None:
+            for chunk_id in ids:
+                row = self._row_of(chunk_id)
+                if row is not None:
+                    replaced.setdefault(row, self.texts[row])
+        if self.snapshot is not None:
+            rows = self._add_persistent(ids, texts, metadata, matrix, sqnorms)
+        else:
+            rows = self._add_in_memory(ids, texts, metadata, matrix, sqnorms)
+        if self.ann is not None:
+            self.ann.add(rows)
+        if self.lexical is not None:
+            for row, text in replaced.items():
+                self.lexical.remove(row, text)
+            self.lexical.add(rows)
+        if self.quantizer is not None:
+            self.quantizer.add(rows)
+        return rows
+
+    def _add_in_memory(
+        self,
+        ids: Sequence[Optional[str]],
+        texts: Sequence[str],
+        metadata: Sequence[Dict[str, Any]],
+        matrix: np.ndarray,
+        sqnorms: np.ndarray,
+    ) -> List[int]:
+        self._reserve(len(ids))
+        rows: List[int] = []
+        for i, chunk_id in enumerate(ids):
+            row = self._row_of(chunk_id)
+            if row is None:
+                row = self._size
+                self._size += 1
+                self.ids.append(chunk_id)
+                self.texts.append(texts[i])
+                self.metadata.append(metadata[i])
+                if chunk_id is not None:
+                    self._rows[chunk_id] = row
+            else:
+                self.filters.remove(row, self.metadata[row])
+                self.texts[row] = texts[i]
+                self.metadata[row] = metadata[i]
+            self.filters.add(row, metadata[i])
+            self._emb[row] = matrix[i]
+            self._sqnorms[row] = sqnorms[i]
+            rows.append(row)
+        return rows
+
+    def _add_persistent(
+        self,
+        ids: Sequence[Optional[str]],
+        texts: Sequence[str],
+        metadata: Sequence[Dict[str, Any]],
+        matrix: np.ndarray,
+        sqnorms: np.ndarray,
+    ) -> List[int]:
+        # Every entry is appended, the last occurrence of an id within the
+        # batch wins, and the rows holding replaced ids are tombstoned.
+        appended: List[int] = []
+        replaces: List[int] = []
+        pending: Dict[str, int] = {}
+        rows: List[int] = []
+        for i, chunk_id in enumerate(ids):
+            row = None if chunk_id is None else pending.get(chunk_id)
+            if row is not None:
+                appended[row - self._size] = i
+            else:
+                old = self._row_of(chunk_id)
+                if old is not None:
+                    replaces.append(old)
+                row = self._size + len(appended)
+                appended.append(i)
+                if chunk_id is not None:
+                    pending[chunk_id] = row
+            rows.append(row)
+
+        replaced = {row: self.metadata[row] for row in replaces} if self._filters_ready else {}
+        self.snapshot.write(
+            [ids[i] for i in appended],
+            [texts[i] for i in appended],
+            [metadata[i] for i in appended],
+            matrix[appended],
+            sqnorms[appended],
+            replaces,
+            metric=self.metric,
+        )
+        start = self._size
+        if pending:
+            self._rows.update(pending)
+        self._map_snapshot()
+        if self._filters_ready:
+            for row, old in replaced.items():
+                self.filters.remove(row, old)
+            for offset, i in enumerate(appended):
+                self.filters.add(start + offset, metadata[i])
+        return rows
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def _query_vector(self, embedding: Any) -> np.ndarray:
+        q = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        if self.dim is not None and q.shape[0] != self.dim:
+            raise ValueError("EMBEDDING_DIM_MISMATCH")
+        return q
+
+    def scores(self, embedding: Any, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Return the exact similarity of ``embedding`` to ``rows`` (or all rows).
+
+        Scores are ``1 / (1 + euclidean distance)`` or the cosine similarity
+        depending on :attr:`metric`; higher is always better.
+        """
+
+        q = self._query_vector(embedding)
+        emb = self._emb[: self._size] if rows is None else self._emb[rows]
+        if self.metric == "cosine":
+            norms = np.sqrt(
+                self._sqnorms[: self._size] if rows is None else self._sqnorms[rows]
+            ) * np.linalg.norm(q)
+            dots = emb @ q
+            return np.divide(dots, norms, out=np.zeros_like(dots), where=norms > 0)
+        diff = emb - q
+        dist = np.sqrt(np.einsum("ij,ij->i", diff, diff))
+        return 1.0 / (1.0 + dist)
+
+    def _ranking_keys(self, q: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        # Monotone stand-ins for the final scores, lower is better.  Expanding
+        # ||x - q||^2 = ||x||^2 - 2 x.q + ||q||^2 turns the scan into one GEMV
+        # (one GEMM for a ``(queries, dim)`` block, giving one row of keys per
+        # query); the constant ||q||^2 term does not change the ordering.
+        emb = self._emb[: self._size] if rows is None else self._emb[rows]
+        sqnorms = self._sqnorms[: self._size] if rows is None else self._sqnorms[rows]
+        dots = (emb @ q.T).T
+        if self.metric == "cosine":
+            norms = np.sqrt(sqnorms)
+            sims = np.divide(dots, norms, out=np.zeros_like(dots), where=norms > 0)
+            return -sims
+        return sqnorms - 2.0 * dots
+
+    def _top(self, q: np.ndarray, rows: np.ndarray, top_k: int) -> List[Tuple[int, float]]:
+        # Exact scoring of an already small candidate set.
+        exact = self.scores(q, rows)
+        if top_k < rows.size:
+            keep = np.argpartition(-exact, top_k - 1)[:top_k]
+            rows, exact = rows[keep], exact[keep]
+        order = np.lexsort((rows, -exact))
+        return [(int(rows[i]), float(exact[i])) for i in order]
+
+    def _quantized_top(
+        self, q: np.ndarray, rows: Optional[np.ndarray], top_k: int, rerank: Optional[int]
+    ) -> List[Tuple[int, float]]:
+        # ADC scan over the codes, then an exact rescore of the best rows.
+        quantizer = self.quantizer
+        rerank = quantizer.rerank if rerank is None else rerank
+        keys = quantizer.keys(q, rows)
+        depth = min(keys.size, top_k * max(rerank, 1))
+        if depth < keys.size:
+            best = np.argpartition(keys, depth - 1)[:depth]
+        else:
+            best = np.arange(keys.size)
+        candidates = best if rows is None else rows[best]
+        if rerank:
+            return self._top(q, candidates, top_k)
+        approx = quantizer.score(keys[best], q)
+        order = np.lexsort((candidates, -approx))
+        return [(int(candidates[i]), float(approx[i])) for i in order]
+
+    def search(
+        self,
+        embedding: Any,
+        top_k: int,
+        *,
+        filters: Optional[Dict[str, Any]] = None,
+        nprobe: Optional[int] = None,
+        exact: bool = False,
+        rows: Optional[Any] = None,
+        rerank: Optional[int] = None,
+    ) -> List[Tuple[int, float]]:
+        """Return ``(row, score)`` pairs for the ``top_k`` best rows.
+
+        ``filters`` restrict the search to matching rows before scoring, and
+        ``rows`` to a shortlist (e.g. from :meth:`search_text`) that is
+        scored exactly instead of scanning the whole store.  When
+        a trained :attr:`ann` index is attached only the rows of its ``nprobe``
+        closest lists are scored unless ``exact`` is set or too few of them
+        pass the filters.  With a trained :attr:`quantizer` rows are ranked
+        from their codes and the best ``rerank * top_k`` (``rerank``
+        overrides the quantizer's default) rescored exactly.  The exact path
+        selects candidates with the vectorized expansion above and then
+        rescores them, which keeps the
+        returned scores free of the cancellation error the expansion
+        introduces for near-identical vectors.
+        """
+
+        if top_k <= 0 or self._size == 0:
+            return []
+        q = self._query_vector(embedding)
+        mask = self._filter_mask(filters)
+        if rows is not None:
+            rows = np.unique(np.asarray(rows, dtype=np.int64))
+            if mask is not None:
+                rows = rows[mask[rows]]
+            return self._top(q, rows, top_k) if rows.size else []
+        allowed = None if mask is None else np.flatnonzero(mask)
+        if allowed is not None and allowed.size <= top_k:
+            return self._top(q, allowed, top_k)
+
+        quantized = not exact and self.quantizer is not None and self.quantizer.trained
+        if not exact and self.ann is not None and self.ann.trained:
+            candidates = self.ann.candidates(q, nprobe)
+            if mask is not None:
+                candidates = candidates[mask[candidates]]
+            if mask is None or candidates.size >= top_k:
+                if quantized:
+                    return self._quantized_top(q, candidates, top_k, rerank)
+                return self._top(q, candidates, top_k)
+        if quantized:
+            return self._quantized_top(q, allowed, top_k, rerank)
+
+        if allowed is None:
+            keys = self._ranking_keys(q)
+        elif allowed.size * 2 > self._size:
+            # Mostly unfiltered: a full scan beats gathering the survivors.
+            keys = self._ranking_keys(q)
+            keys[~mask] = np.inf
+        else:
+            keys = self._ranking_keys(q, allowed)
+        if top_k < keys.size:
+            candidates = np.argpartition(keys, top_k - 1)[:top_k]
+        else:
+            candidates = np.arange(keys.size)
+        if keys.size != self._size:
+            candidates = allowed[candidates]
+        return self._top(q, candidates, top_k)
+
+    def search_text(
+        self, text: str, top_k: int, *, filters: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[int, float]]:
+        """Return ``(row, bm25)`` pairs for the ``top_k`` best rows for ``text``.
+
+        Requires an attached :attr:`lexical` index.
+        """
+
+        if self.lexical is None:
+            raise ValueError("LEXICAL_INDEX_MISSING")
+        if top_k <= 0 or self._size == 0:
+            return []
+        return self.lexical.search(text, top_k, mask=self._filter_mask(filters))
+
+    def search_many(
+        self,
+        embeddings: Any,
+        top_k: int,
+        *,
+        filters: Optional[Dict[str, Any]] = None,
+        nprobe: Optional[int] = None,
+        exact: bool = False,
+        rerank: Optional[int] = None,
+    ) -> List[List[Tuple[int, float]]]:
+        """Run :meth:`search` for every row of ``embeddings``.
+
+        Exact scans are done for blocks of queries at once, so the store is
+        read with one matrix product per block instead of one per query.
+        Queries routed through a trained ANN index or quantizer are searched
+        one by one.
+        """
+
+        queries = np.asarray(embeddings, dtype=np.float32)
+        queries = queries.reshape(len(queries), -1)
+        if top_k <= 0 or self._size == 0 or len(queries) == 0:
+            return [[] for _ in range(len(queries))]
+        if self.dim is not None and queries.shape[1] != self.dim:
+            raise ValueError("EMBEDDING_DIM_MISMATCH")
+        if not exact and any(
+            s is not None and s.trained for s in (self.ann, self.quantizer)
+        ):
+            return [
+                self.search(q, top_k, filters=filters, nprobe=nprobe, rerank=rerank)
+                for q in queries
+            ]
+
+        mask = self._filter_mask(filters)
+        allowed = None if mask is None else np.flatnonzero(mask)
+        if allowed is not None and allowed.size <= top_k:
+            return [self._top(q, allowed, top_k) for q in queries]
+        # Same full-scan/gather choice as :meth:`search`, made once for all.
+        rows = None if allowed is None or allowed.size * 2 > self._size else allowed
+        scanned = self._size if rows is None else rows.size
+        block = max(1, _KEYS_PER_BLOCK // scanned)
+
+        results = []
+        for start in range(0, len(queries), block):
+            q = queries[start : start + block]
+            keys = self._ranking_keys(q, rows)
+            if rows is None and mask is not None:
+                keys[:, ~mask] = np.inf
+            if top_k < scanned:
+                candidates = np.argpartition(keys, top_k - 1, axis=1)[:, :top_k]
+            else:
+                candidates = np.broadcast_to(np.arange(scanned), keys.shape)
+            if rows is not None:
+                candidates = rows[candidates]
+            results.extend(self._top(qi, ci, top_k) for qi, ci in zip(q, candidates))
+        return results
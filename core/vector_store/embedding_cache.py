@@ -0,0 +1,175 @@
+"""Content-addressed cache for text embeddings.
+
+Entries are keyed by ``sha256(model + normalized text)`` so repeated questions
+and re-ingested chunks with unchanged text never hit the embedding backend
+twice.  The hot set lives in a bounded in-memory LRU; an optional SQLite file
+keeps every entry across restarts and serves lookups that fell out of memory.
+Changing the model drops all entries computed by the previous one.
+
+Disk writes go through a :class:`~core.sqlite_writer.SQLiteWriter`, so
+caching never blocks the event loop on an fsync; entries still waiting to be
+committed are served from the writer's pending map.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+import sqlite3
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from core.sqlite_writer import SQLiteWriter
+
+_WHITESPACE = re.compile(r"\s+")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings
+    (key TEXT PRIMARY KEY, model TEXT NOT NULL, vector BLOB NOT NULL);
+"""
+
+
+def normalize_text(text: str) -> str:
+    """Return ``text`` in NFC form with whitespace runs collapsed."""
+
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+class EmbeddingCache:
+    """Two-tier LRU cache of embeddings.
+
+    Parameters
+    ----------
+    model: str
+        Model whose embeddings are cached.
+    max_entries: int
+        Capacity of the in-memory tier.
+    path: str, optional
+        SQLite file used as persistent tier.
+    """
+
+    def __init__(self, model: str, max_entries: int = 4096, path: Optional[str] = None) -> None:
+        self.model = model
+        self.max_entries = max_entries
+        self.path = path
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.hits = self.disk_hits = self.misses = self.evictions = 0
+        self._db: Optional[sqlite3.Connection] = None
+        self._writer: Optional[SQLiteWriter] = None
+        if path is not None:
+            self._writer = SQLiteWriter(
+                path, self._write, schema=_SCHEMA, name="embedding-cache"
+            )
+            self._writer.put(("model", model))
+            self._db = sqlite3.connect(path, check_same_thread=False)
+
+    def key(self, text: str) -> str:
+        data = f"{self.model}\0{normalize_text(text)}".encode("utf-8")
+        return hashlib.sha256(data).hexdigest()
+
+    def set_model(self, model: str) -> None:
+        """Switch to ``model`` and invalidate every entry of the previous one."""
+
+        if model == self.model:
+            return
+        self.model = model
+        self._memory.clear()
+        if self._writer is not None:
+            self._writer.discard_pending()
+            self._writer.put(("model", model))
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """Return cached embeddings for ``texts`` (``None`` for misses)."""
+
+        keys = [self.key(t) for t in texts]
+        found: Dict[str, np.ndarray] = {}
+        for k in keys:
+            vector = self._memory.get(k)
+            if vector is not None:
+                self._memory.move_to_end(k)
+                found[k] = vector
+        missing = [k for k in set(keys) if k not in found]
+        if missing and self._writer is not None:
+            for k in missing:
+                vector = self._writer.pending(k)
+                if vector is not None:
+                    found[k] = vector
+                    self._remember(k, vector)
+                    self.disk_hits += 1
+            missing = [k for k in missing if k not in found]
+        if missing and self._db is not None:
+            marks = ",".join("?" * len(missing))
+            rows = self._db.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({marks})", missing
+            ).fetchall()
+            for k, blob in rows:
+                vector = np.frombuffer(blob, dtype=np.float32)
+                found[k] = vector
+                self._remember(k, vector)
+                self.disk_hits += 1
+
+        result: List[Optional[List[float]]] = []
+        for k in keys:
+            vector = found.get(k)
+            if vector is None:
+                self.misses += 1
+                result.append(None)
+            else:
+                self.hits += 1
+                result.append(vector.tolist())
+        return result
+
+    def put_many(self, texts: Sequence[str], embeddings: Sequence[Sequence[float]]) -> None:
+        """Store ``embeddings`` of ``texts`` in memory and queue them for disk."""
+
+        rows = []
+        for text, embedding in zip(texts, embeddings):
+            k = self.key(text)
+            vector = np.asarray(embedding, dtype=np.float32)
+            self._remember(k, vector)
+            rows.append((k, self.model, vector))
+        if rows and self._writer is not None:
+            self._writer.put(("put", rows), {k: vector for k, _, vector in rows})
+
+    @staticmethod
+    def _write(connection: sqlite3.Connection, writes: List[Any]) -> None:
+        for kind, arg in writes:
+            if kind == "put":
+                connection.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, model, vector) VALUES (?, ?, ?)",
+                    [(k, model, vector.tobytes()) for k, model, vector in arg],
+                )
+            else:
+                connection.execute("DELETE FROM embeddings WHERE model != ?", (arg,))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until every write queued so far is committed."""
+
+        return self._writer is None or self._writer.flush(timeout)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._memory),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._db.close()
+            self._writer = self._db = None
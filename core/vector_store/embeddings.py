@@ -0,0 +1,125 @@
+"""Batched embedding client for the LiteLLM ``/v1/embeddings`` endpoint.
+
+:class:`EmbeddingClient` sends whole lists of texts in one request (the
+endpoint accepts an ``input`` array) and :class:`MicroBatcher` coalesces the
+single-text ``embed`` calls issued concurrently by many in-flight runs into
+one such request per small time/size window.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from core.http_client import get_client
+
+EMBEDDINGS_URL = "http://localhost:4000/v1/embeddings"
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+EmbedManyFn = Callable[[List[str]], Awaitable[List[List[float]]]]
+
+
+class EmbeddingClient:
+    """Call an OpenAI-compatible embeddings endpoint in batches.
+
+    Parameters
+    ----------
+    url: str
+        Full URL of the ``/v1/embeddings`` endpoint.
+    model: str
+        Embedding model requested from the gateway.
+    max_batch: int
+        Maximum number of texts sent in a single request.
+    timeout_s: float
+        Timeout of each request, retries included.
+    """
+
+    def __init__(
+        self,
+        url: str = EMBEDDINGS_URL,
+        model: str = EMBEDDING_MODEL,
+        max_batch: int = 256,
+        timeout_s: float = 30.0,
+    ) -> None:
+        self.url = url
+        self.model = model
+        self.max_batch = max_batch
+        self.timeout_s = timeout_s
+
+    async def _post(self, texts: List[str]) -> List[List[float]]:
+        resp = await get_client().request(
+            "POST",
+            self.url,
+            json={"model": self.model, "input": texts},
+            timeout=self.timeout_s,
+        )
+        resp.raise_for_status()
+        items = sorted(resp.json()["data"], key=lambda d: d.get("index", 0))
+        if len(items) != len(texts):
+            raise ValueError("EMBEDDING_COUNT_MISMATCH")
+        return [item["embedding"] for item in items]
+
+    async def embed_many(self, texts: Sequence[str]) -> List[List[float]]:
+        """Return one embedding per text, issuing ``ceil(n / max_batch)`` requests."""
+
+        texts = list(texts)
+        batches = [
+            texts[i : i + self.max_batch] for i in range(0, len(texts), self.max_batch)
+        ]
+        results = await asyncio.gather(*(self._post(b) for b in batches))
+        return [emb for batch in results for emb in batch]
+
+
+class MicroBatcher:
+    """Coalesce concurrent single-text requests into batched calls.
+
+    The first pending text starts a ``max_wait_ms`` timer; the batch is sent
+    when the timer fires or as soon as ``max_batch`` distinct texts are queued,
+    whichever comes first.  Identical texts in one window share a slot.
+    """
+
+    def __init__(self, fn: EmbedManyFn, max_batch: int = 64, max_wait_ms: float = 2.0) -> None:
+        self.fn = fn
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+        self._pending: Dict[str, List[asyncio.Future]] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.batches_sent = 0
+
+    async def submit(self, text: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.setdefault(text, []).append(future)
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_ms / 1000, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        self.batches_sent += 1
+        task = asyncio.ensure_future(self._run(list(batch.items())))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[str, List[asyncio.Future]]]) -> None:
+        try:
+            embeddings = await self.fn([text for text, _ in batch])
+        except Exception as exc:
+            for _, futures in batch:
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(exc)
+            return
+        for (_, futures), embedding in zip(batch, embeddings):
+            for future in futures:
+                if not future.done():
+                    future.set_result(embedding)
+
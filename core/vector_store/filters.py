@@ -0,0 +1,118 @@
+"""Inverted metadata index used to evaluate ``query`` filters.
+
+Every hashable metadata value (and every element of list values such as
+``acl``) maps to the set of rows carrying it.  A filter is evaluated into a
+boolean row mask by OR-ing the postings of the values each clause accepts and
+AND-ing the clauses together, so the vector scan only has to score the rows
+that survive.
+
+Filter syntax, all clauses must match::
+
+    {"source": "doc1"}                          # equality
+    {"source": ["doc1", "doc2"]}                # any of
+    {"acl": {"$in": ["group:sales"]}}           # any of, list metadata
+    {"page": {"$gte": 2, "$lt": 10}}            # numeric range
+"""
+
+from __future__ import annotations
+
+import operator
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Set
+
+import numpy as np
+
+_RANGE_OPS: Dict[str, Callable[[Any, Any], bool]] = {
+    "$gt": operator.gt,
+    "$gte": operator.ge,
+    "$lt": operator.lt,
+    "$lte": operator.le,
+}
+
+
+def _values(value: Any) -> Iterable[Hashable]:
+    items = value if isinstance(value, (list, tuple, set)) else (value,)
+    for item in items:
+        if isinstance(item, Hashable):
+            yield item
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class MetadataIndex:
+    """Per-field postings ``value -> rows`` maintained on every upsert."""
+
+    def __init__(self) -> None:
+        self.clear()
+
+    def clear(self) -> None:
+        self._postings: Dict[str, Dict[Hashable, Set[int]]] = {}
+        self._arrays: Dict[tuple, np.ndarray] = {}
+
+    def add(self, row: int, metadata: Dict[str, Any]) -> None:
+        for field, value in metadata.items():
+            postings = self._postings.setdefault(field, {})
+            for item in _values(value):
+                postings.setdefault(item, set()).add(row)
+                self._arrays.pop((field, item), None)
+
+    def remove(self, row: int, metadata: Dict[str, Any]) -> None:
+        for field, value in metadata.items():
+            postings = self._postings.get(field, {})
+            for item in _values(value):
+                rows = postings.get(item)
+                if rows is not None:
+                    rows.discard(row)
+                    self._arrays.pop((field, item), None)
+
+    def _rows(self, field: str, value: Hashable) -> np.ndarray:
+        key = (field, value)
+        arr = self._arrays.get(key)
+        if arr is None:
+            rows = self._postings.get(field, {}).get(value, ())
+            arr = self._arrays[key] = np.fromiter(rows, dtype=np.int64, count=len(rows))
+        return arr
+
+    def _accepted(self, field: str, cond: Any) -> List[Hashable]:
+        """Return the indexed values of ``field`` that satisfy ``cond``."""
+
+        if not isinstance(cond, dict):
+            return list(_values(cond))
+        accepted: Optional[Set[Hashable]] = None
+        ranges = []
+        for op, arg in cond.items():
+            if op in ("$eq", "$in"):
+                values = set(_values(arg))
+            elif op in _RANGE_OPS:
+                ranges.append((_RANGE_OPS[op], arg))
+                continue
+            else:
+                raise ValueError(f"UNKNOWN_FILTER_OP:{op}")
+            accepted = values if accepted is None else accepted & values
+        if ranges:
+            matching = {
+                v
+                for v in self._postings.get(field, {})
+                if _is_number(v) and all(fn(v, arg) for fn, arg in ranges)
+            }
+            accepted = matching if accepted is None else accepted & matching
+        return list(accepted or ())
+
+    def mask(self, filters: Optional[Dict[str, Any]], size: int) -> Optional[np.ndarray]:
+        """Return a boolean mask of the rows matching ``filters``.
+
+        ``None`` means no filtering is required.
+        """
+
+        if not filters:
+            return None
+        result: Optional[np.ndarray] = None
+        for field, cond in filters.items():
+            clause = np.zeros(size, dtype=bool)
+            for value in self._accepted(field, cond):
+                clause[self._rows(field, value)] = True
+            result = clause if result is None else np.logical_and(result, clause, out=result)
+            if not result.any():
+                break
+        return result
@@ -0,0 +1,376 @@
+"""BM25 inverted index for exact-term retrieval next to the vector scan.
+
+Embeddings rank paraphrases well but retrieve exact identifiers (policy
+numbers, form codes) poorly.  :class:`LexicalIndex` keeps an inverted index
+``term -> rows`` over the chunk texts of a
+:class:`~core.vector_store.columnar.ColumnarStore`, maintained on every
+upsert, and ranks rows with Okapi BM25.
+
+Tokenization (:func:`tokenize`) case-folds NFKC-normalized text and splits it
+into letter/digit runs; identifiers such as ``POL-2023-0017`` additionally
+yield the joined form so an exact code outranks documents sharing only its
+parts.  Thai is written without spaces between words, so Thai runs are
+indexed as overlapping character bigrams, which match any segmentation of
+the query without needing a dictionary.
+
+Postings are stored compressed: rows are delta-encoded in blocks of
+:data:`BLOCK_SIZE` with the narrowest unsigned integer type that fits the
+block (usually one byte per posting) and term frequencies likewise, so a
+posting costs one to three bytes instead of two Python ints.  Each block
+remembers its last row, so looking up a few rows only decodes the blocks
+that can contain them.
+
+Queries are evaluated term-at-a-time with MaxScore pruning: terms are
+processed in decreasing order of their score upper bound, and once the
+bounds of the remaining terms cannot lift a new row above the current
+``top_k``-th score those terms only update existing candidates (decoding
+just the blocks holding them) and candidates that cannot reach the top are
+dropped.
+"""
+
+from __future__ import annotations
+
+import math
+import re
+import unicodedata
+from array import array
+from collections import Counter
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:  # pragma: no cover - import cycle only needed for typing
+    from .columnar import ColumnarStore
+
+BLOCK_SIZE = 128
+
+_TOKEN = re.compile(r"[\u0e00-\u0e7f]+|[^\W_\u0e00-\u0e7f]+(?:[-/.][^\W_\u0e00-\u0e7f]+)*")
+_THAI = re.compile(r"[\u0e00-\u0e7f]")
+_PARTS = re.compile(r"[-/.]")
+
+
+def tokenize(text: str) -> List[str]:
+    """Split ``text`` into index terms, see the module docstring."""
+
+    terms: List[str] = []
+    for match in _TOKEN.finditer(unicodedata.normalize("NFKC", text).casefold()):
+        token = match.group()
+        if _THAI.match(token):
+            if len(token) == 1:
+                terms.append(token)
+            else:
+                terms.extend(token[i : i + 2] for i in range(len(token) - 1))
+            continue
+        parts = _PARTS.split(token)
+        if len(parts) > 1:
+            terms.append(token)
+        terms.extend(parts)
+    return terms
+
+
+def _narrow(values: np.ndarray) -> np.ndarray:
+    top = int(values.max()) if values.size else 0
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if top <= np.iinfo(dtype).max:
+            return values.astype(dtype)
+    return values.astype(np.uint64)
+
+
+def _kth(scores: np.ndarray, k: int) -> float:
+    """Return the ``k``-th largest score, ``-inf`` if there are fewer."""
+
+    if scores.size < k:
+        return -math.inf
+    return float(np.partition(scores, scores.size - k)[scores.size - k])
+
+
+class _Block:
+    """A compressed run of up to :data:`BLOCK_SIZE` postings."""
+
+    __slots__ = ("first", "last", "deltas", "tfs")
+
+    def __init__(self, rows: np.ndarray, tfs: np.ndarray) -> None:
+        self.first = int(rows[0])
+        self.last = int(rows[-1])
+        self.deltas = _narrow(np.diff(rows))
+        self.tfs = _narrow(tfs)
+
+    def decode(self) -> Tuple[np.ndarray, np.ndarray]:
+        rows = np.empty(self.deltas.size + 1, dtype=np.int64)
+        rows[0] = self.first
+        np.cumsum(self.deltas, dtype=np.int64, out=rows[1:])
+        rows[1:] += self.first
+        return rows, self.tfs.astype(np.float32)
+
+    @property
+    def nbytes(self) -> int:
+        return self.deltas.nbytes + self.tfs.nbytes + 16
+
+
+class _Postings:
+    """Rows containing one term, sorted, as sealed blocks plus an open tail.
+
+    The tail collects appended rows in plain arrays until it fills a block.
+    """
+
+    __slots__ = ("blocks", "rows", "tfs", "df", "max_tf", "min_length", "_lasts")
+
+    def __init__(self) -> None:
+        self.blocks: List[_Block] = []
+        self.rows = array("q")
+        self.tfs = array("I")
+        self.df = 0
+        self.max_tf = 0
+        self.min_length = math.inf
+        self._lasts: Optional[np.ndarray] = None
+
+    def _last(self) -> int:
+        if self.rows:
+            return self.rows[-1]
+        return self.blocks[-1].last if self.blocks else -1
+
+    def add(self, row: int, tf: int, length: int) -> None:
+        # The bounds only ever grow, removals leave them loose but valid.
+        self.max_tf = max(self.max_tf, tf)
+        self.min_length = min(self.min_length, length)
+        if row > self._last():
+            self.rows.append(row)
+            self.tfs.append(tf)
+            self.df += 1
+            if len(self.rows) == BLOCK_SIZE:
+                self.blocks.append(_Block(*self._tail()))
+                self.rows, self.tfs = array("q"), array("I")
+                self._lasts = None
+            return
+        rows, tfs = self.decode()
+        at = int(np.searchsorted(rows, row))
+        self._rebuild(np.insert(rows, at, row), np.insert(tfs, at, tf))
+
+    def remove(self, row: int) -> None:
+        rows, tfs = self.decode()
+        keep = rows != row
+        if not keep.all():
+            self._rebuild(rows[keep], tfs[keep])
+
+    def _rebuild(self, rows: np.ndarray, tfs: np.ndarray) -> None:
+        sealed = rows.size - rows.size % BLOCK_SIZE
+        self.blocks = [
+            _Block(rows[i : i + BLOCK_SIZE], tfs[i : i + BLOCK_SIZE])
+            for i in range(0, sealed, BLOCK_SIZE)
+        ]
+        self.rows = array("q", rows[sealed:].tolist())
+        self.tfs = array("I", tfs[sealed:].astype(np.uint32).tolist())
+        self.df = int(rows.size)
+        self._lasts = None
+
+    def _tail(self) -> Tuple[np.ndarray, np.ndarray]:
+        return np.frombuffer(self.rows, dtype=np.int64), np.frombuffer(self.tfs, np.uint32)
+
+    def _concat(self, blocks: Iterable[_Block]) -> Tuple[np.ndarray, np.ndarray]:
+        parts = [block.decode() for block in blocks]
+        rows, tfs = self._tail()
+        parts.append((rows, tfs.astype(np.float32)))
+        return np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts])
+
+    def decode(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Return all ``(rows, tfs)``."""
+
+        return self._concat(self.blocks)
+
+    def lookup(self, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the postings of the sorted ``rows`` that contain the term."""
+
+        if self._lasts is None:
+            self._lasts = np.fromiter((b.last for b in self.blocks), np.int64, len(self.blocks))
+        wanted = np.unique(np.searchsorted(self._lasts, rows))
+        found, tfs = self._concat(self.blocks[i] for i in wanted if i < len(self.blocks))
+        hit = np.isin(found, rows, assume_unique=True)
+        return found[hit], tfs[hit]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(b.nbytes for b in self.blocks) + 12 * len(self.rows)
+
+
+class LexicalIndex:
+    """BM25 index over the texts of a columnar store.
+
+    Parameters
+    ----------
+    store: ColumnarStore
+        Store whose ``texts`` are indexed.
+    k1, b: float
+        BM25 term-frequency saturation and length normalization.
+    tokenizer: callable, optional
+        Replaces :func:`tokenize`, e.g. with a dictionary-based Thai word
+        segmenter; queries go through the same function.
+    """
+
+    def __init__(
+        self,
+        store: "ColumnarStore",
+        k1: float = 1.2,
+        b: float = 0.75,
+        tokenizer: Callable[[str], List[str]] = tokenize,
+    ) -> None:
+        self.store = store
+        self.k1 = k1
+        self.b = b
+        self.tokenizer = tokenizer
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget every indexed row."""
+
+        self._postings: Dict[str, _Postings] = {}
+        self._lengths = np.full(0, -1, dtype=np.int32)
+        self._docs = 0
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return self._docs
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def add(self, rows: Iterable[int]) -> None:
+        """Index the current text of ``rows`` (which must not be indexed yet)."""
+
+        texts = self.store.texts
+        for row in dict.fromkeys(rows):
+            self._add(row, texts[row])
+
+    def _add(self, row: int, text: str) -> None:
+        if row >= self._lengths.shape[0]:
+            grown = np.full(max(row + 1, 2 * self._lengths.shape[0], 1024), -1, np.int32)
+            grown[: self._lengths.shape[0]] = self._lengths
+            self._lengths = grown
+        terms = self.tokenizer(text)
+        length = len(terms)
+        self._lengths[row] = length
+        self._docs += 1
+        self._total_length += length
+        for term, tf in Counter(terms).items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = _Postings()
+            postings.add(row, tf, length)
+
+    def remove(self, row: int, text: str) -> None:
+        """Drop ``row``, whose indexed text was ``text``."""
+
+        if row >= self._lengths.shape[0] or self._lengths[row] < 0:
+            return
+        for term in set(self.tokenizer(text)):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.remove(row)
+                if postings.df == 0:
+                    del self._postings[term]
+        self._docs -= 1
+        self._total_length -= int(self._lengths[row])
+        self._lengths[row] = -1
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def _idf(self, df: int) -> float:
+        return math.log(1.0 + (self._docs - df + 0.5) / (df + 0.5))
+
+    def _weight(self, tfs: np.ndarray, lengths: np.ndarray, avg: float) -> np.ndarray:
+        norm = self.k1 * (1.0 - self.b + self.b * lengths / avg)
+        return tfs * (self.k1 + 1.0) / (tfs + norm)
+
+    def search(
+        self, text: str, top_k: int, mask: Optional[np.ndarray] = None
+    ) -> List[Tuple[int, float]]:
+        """Return ``(row, bm25)`` pairs for the ``top_k`` best rows.
+
+        Only rows containing at least one query term are returned, and only
+        those set in the boolean ``mask`` when one is given.
+        """
+
+        if top_k <= 0 or not self._docs:
+            return []
+        avg = max(self._total_length / self._docs, 1e-9)
+        terms = []
+        for term in dict.fromkeys(self.tokenizer(text)):
+            postings = self._postings.get(term)
+            if postings is not None:
+                idf = self._idf(postings.df)
+                bound = idf * float(
+                    self._weight(
+                        np.float32(postings.max_tf), np.float32(postings.min_length), avg
+                    )
+                )
+                terms.append((bound, idf, postings))
+        if not terms:
+            return []
+        terms.sort(key=lambda t: -t[0])
+        # remaining[i]: best score a row can still gain from terms i onwards.
+        remaining = np.cumsum([t[0] for t in terms][::-1])[::-1].tolist()
+
+        # Terms that can still add new rows are accumulated densely; once
+        # none can, the surviving candidates are carried as sparse arrays.
+        dense = np.zeros(self._lengths.shape[0], dtype=np.float32)
+        rows: Optional[np.ndarray] = None
+        for i, (_, idf, postings) in enumerate(terms):
+            if rows is None:
+                threshold = _kth(dense[dense > 0], top_k) if i else -math.inf
+                if remaining[i] >= threshold:
+                    found, tfs = postings.decode()
+                    if mask is not None:
+                        hit = mask[found]
+                        found, tfs = found[hit], tfs[hit]
+                    dense[found] += idf * self._weight(tfs, self._lengths[found], avg)
+                    continue
+                rows = np.flatnonzero(dense > 0)
+                scores = dense[rows]
+            # No row outside the candidates can reach the top any more.
+            threshold = _kth(scores, top_k)
+            keep = scores + remaining[i] >= threshold
+            rows, scores = rows[keep], scores[keep]
+            found, tfs = postings.lookup(rows)
+            scores[np.searchsorted(rows, found)] += idf * self._weight(
+                tfs, self._lengths[found], avg
+            )
+        if rows is None:
+            rows = np.flatnonzero(dense > 0)
+            scores = dense[rows]
+
+        if top_k < rows.size:
+            # Keep every row tied with the k-th so ties go to the lowest row.
+            keep = scores >= _kth(scores, top_k)
+            rows, scores = rows[keep], scores[keep]
+        order = np.lexsort((rows, -scores))[:top_k]
+        return [(int(rows[i]), float(scores[i])) for i in order]
+
+    def stats(self) -> Dict[str, float]:
+        postings = sum(p.df for p in self._postings.values())
+        size = sum(p.nbytes for p in self._postings.values())
+        return {
+            "docs": self._docs,
+            "terms": len(self._postings),
+            "postings": postings,
+            "postings_bytes": size,
+            "bytes_per_posting": size / postings if postings else 0.0,
+        }
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[int]], k: float = 60.0
+) -> List[Tuple[int, float]]:
+    """Fuse ranked row lists into ``(row, score)`` pairs, best first.
+
+    Each row scores ``sum(1 / (k + rank))`` over the lists containing it
+    (ranks start at 1), so rows ranked well by several retrievers win
+    without having to calibrate their raw scores against each other.
+    """
+
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking, start=1):
+            fused[row] = fused.get(row, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: (-item[1], item[0]))
@@ -0,0 +1,352 @@
+"""Compressed embedding codes scanned with asymmetric distances.
+
+A float32 embedding costs ``4 * dim`` bytes per chunk; at 1536 dimensions and
+millions of chunks the matrix no longer fits in RAM.  A quantizer attached to
+a :class:`~core.vector_store.columnar.ColumnarStore` keeps a compact code per
+row and answers the scan from the codes alone:
+
+:class:`ScalarQuantizer` (``"int8"``)
+    One byte per dimension, each mapped linearly onto the range it spans in
+    the training sample, plus the decoded norm (about 4x smaller).
+:class:`ProductQuantizer` (``"pq"``)
+    The vector is split into ``m`` sub-vectors, each replaced by the index of
+    its nearest centroid in a 256-entry k-means codebook trained for that
+    subspace: ``m`` bytes per row (``4 * dim / m`` times smaller).
+
+Distances are asymmetric (ADC): the query stays in full precision and is
+compared with the decoded codes, through one matrix product for ``int8`` and
+through per-query ``(m, 256)`` lookup tables for PQ, so only the database side
+carries quantization error.  The best ``rerank * top_k`` rows of the scan are
+then rescored exactly from the float32 matrix.  Backing the index with a
+snapshot (:func:`core.vector_store.open_snapshot`) keeps that matrix on disk:
+only the pages of re-ranked rows are ever read, and resident memory per chunk
+is the code plus the metadata.
+
+Like :class:`~core.vector_store.ann.IVFIndex`, a quantizer trains itself once
+``train_size`` rows are stored and encodes later rows incrementally; until
+then searches use the exact scan.  For the cosine metric vectors are
+normalized before they are encoded.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Optional
+
+import numpy as np
+
+from .ann import _nearest, kmeans
+
+if TYPE_CHECKING:  # pragma: no cover - import cycle only needed for typing
+    from .columnar import ColumnarStore
+
+# Rows decoded at once by a scan; small enough for the float temporaries
+# to stay in cache.
+_SCAN_BLOCK = 8192
+
+
+class Quantizer:
+    """Codes for the rows of a columnar store, see the module docstring.
+
+    Parameters
+    ----------
+    store: ColumnarStore
+        Store whose rows are encoded.
+    train_size: int, optional
+        Row count that triggers training, defaults to ``10_000``.
+    rerank: int
+        Multiple of ``top_k`` rows rescored with the float32 vectors, ``0``
+        returns the approximate scores of the scan.
+    """
+
+    kind = ""
+
+    def __init__(
+        self, store: "ColumnarStore", train_size: Optional[int] = None, rerank: int = 4
+    ) -> None:
+        if rerank < 0:
+            raise ValueError("INVALID_QUANTIZATION_PARAMS")
+        self.store = store
+        self.train_size = max(train_size or 10_000, 1)
+        self.rerank = rerank
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget the trained parameters and all codes."""
+
+        self._codes: Optional[np.ndarray] = None
+
+    @property
+    def trained(self) -> bool:
+        return self._codes is not None
+
+    @property
+    def code_size(self) -> int:
+        """Bytes of one row's code."""
+
+        raise NotImplementedError
+
+    def check_dim(self, dim: int) -> None:
+        """Raise ``ValueError`` if vectors of ``dim`` cannot be encoded.
+
+        Called before rows are written, so a bad configuration fails the
+        first insert instead of every insert after training is due.
+        """
+
+    def _vectors(self, rows: Any) -> np.ndarray:
+        vecs = np.asarray(self.store._emb[rows], dtype=np.float32)
+        if self.store.metric == "cosine":
+            norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+            vecs = np.divide(vecs, norms, out=np.zeros_like(vecs), where=norms > 0)
+        return vecs
+
+    def _query(self, q: np.ndarray) -> np.ndarray:
+        if self.store.metric == "cosine":
+            norm = np.linalg.norm(q)
+            return q / norm if norm > 0 else q
+        return q
+
+    def _fit(self, x: np.ndarray) -> None:
+        raise NotImplementedError
+
+    def _encode(self, x: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def _prepare(self, q: np.ndarray) -> Any:
+        """Return the per-query state :meth:`_keys` scans the codes with."""
+
+        raise NotImplementedError
+
+    def _keys(self, state: Any, codes: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def train(self) -> None:
+        """Fit the codebooks on a sample and encode every stored row."""
+
+        live = np.fromiter(self.store.live_rows(), dtype=np.int64)
+        if live.size == 0:
+            raise ValueError("NOT_ENOUGH_ROWS_TO_TRAIN")
+        rng = np.random.default_rng(0)
+        sample = rng.choice(live, size=min(live.size, self.train_size), replace=False)
+        self._fit(self._vectors(np.sort(sample)))
+        self._codes = np.zeros((0, self.code_size), dtype=np.uint8)
+        self._resize(self.store.slots)
+        self.add(live)
+
+    def add(self, rows: Iterable[int]) -> None:
+        """Encode ``rows``, training first if due."""
+
+        if not self.trained:
+            if len(self.store) >= self.train_size:
+                self.train()
+            return
+        rows = np.fromiter(rows, dtype=np.int64)
+        if rows.size == 0:
+            return
+        if rows.max() >= self._codes.shape[0]:
+            self._resize(max(int(rows.max()) + 1, 2 * self._codes.shape[0]))
+        for start in range(0, rows.size, _SCAN_BLOCK):
+            block = rows[start : start + _SCAN_BLOCK]
+            self._write(block, self._encode(self._vectors(block)))
+
+    def _resize(self, size: int) -> None:
+        grown = np.zeros((size, self.code_size), dtype=np.uint8)
+        grown[: self._codes.shape[0]] = self._codes
+        self._codes = grown
+
+    def _write(self, rows: np.ndarray, codes: np.ndarray) -> None:
+        self._codes[rows] = codes
+
+    def keys(self, q: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Return approximate ranking keys of ``rows`` (or all rows), lower is better.
+
+        Keys estimate the squared euclidean distance up to the constant
+        ``||q||^2``, or the negated cosine similarity.
+        """
+
+        state = self._prepare(self._query(np.asarray(q, dtype=np.float32)))
+        count = self.store.slots if rows is None else rows.size
+        out = np.empty(count, dtype=np.float32)
+        for start in range(0, count, _SCAN_BLOCK):
+            block = (
+                np.arange(start, min(start + _SCAN_BLOCK, count))
+                if rows is None
+                else rows[start : start + _SCAN_BLOCK]
+            )
+            out[start : start + block.size] = self._keys(state, self._codes[block], block)
+        return out
+
+    def score(self, keys: np.ndarray, q: np.ndarray) -> np.ndarray:
+        """Turn :meth:`keys` into the store's similarity scores."""
+
+        if self.store.metric == "cosine":
+            return -keys
+        dist = np.sqrt(np.maximum(keys + float(q @ q), 0.0))
+        return 1.0 / (1.0 + dist)
+
+    def recall(
+        self, queries: Any, top_k: int = 10, rerank: Optional[int] = None
+    ) -> float:
+        """Return mean recall@``top_k`` of the quantized search against exact search."""
+
+        hits = total = 0
+        for q in np.asarray(queries, dtype=np.float32):
+            exact = {row for row, _ in self.store.search(q, top_k, exact=True)}
+            approx = {row for row, _ in self.store.search(q, top_k, rerank=rerank)}
+            hits += len(exact & approx)
+            total += len(exact)
+        return hits / total if total else 1.0
+
+    def codebook_bytes(self) -> int:
+        return 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Memory per chunk of the codes next to the float32 vectors."""
+
+        dim = self.store.dim or 0
+        rows = len(self.store)
+        code = self.code_size if self.trained else 0
+        return {
+            "kind": self.kind,
+            "trained": self.trained,
+            "rows": rows,
+            "code_bytes_per_chunk": code,
+            "float_bytes_per_chunk": 4 * dim,
+            "compression": 4 * dim / code if code else 1.0,
+            "codebook_bytes": self.codebook_bytes() if self.trained else 0,
+            "rerank": self.rerank,
+        }
+
+
+class ScalarQuantizer(Quantizer):
+    """``int8`` codes: one byte per dimension over its trained range.
+
+    The squared norm of each decoded vector is kept next to its code (four
+    more bytes per row) so the scan estimates the distance to the decoded
+    vector, whose error is far smaller than mixing exact norms with
+    approximate dot products.
+    """
+
+    kind = "int8"
+
+    def reset(self) -> None:
+        super().reset()
+        self._low: Optional[np.ndarray] = None
+        self._step: Optional[np.ndarray] = None
+        self._norms = np.zeros(0, dtype=np.float32)
+
+    @property
+    def code_size(self) -> int:
+        return int(self.store.dim)
+
+    def _resize(self, size: int) -> None:
+        super()._resize(size)
+        norms = np.zeros(size, dtype=np.float32)
+        norms[: self._norms.shape[0]] = self._norms
+        self._norms = norms
+
+    def _write(self, rows: np.ndarray, codes: np.ndarray) -> None:
+        super()._write(rows, codes)
+        decoded = self._low + codes.astype(np.float32) * self._step
+        self._norms[rows] = np.einsum("ij,ij->i", decoded, decoded)
+
+    def _fit(self, x: np.ndarray) -> None:
+        self._low = x.min(axis=0)
+        span = x.max(axis=0) - self._low
+        self._step = np.where(span > 0, span / 255.0, 1.0).astype(np.float32)
+
+    def _encode(self, x: np.ndarray) -> np.ndarray:
+        return np.clip(np.rint((x - self._low) / self._step), 0, 255).astype(np.uint8)
+
+    def _prepare(self, q: np.ndarray) -> Any:
+        # x ~ low + step * code, so q.x ~ q.low + (q * step).code.
+        return q * self._step, float(q @ self._low)
+
+    def _keys(self, state: Any, codes: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        scaled, offset = state
+        dots = codes.astype(np.float32) @ scaled + offset
+        norms = self._norms[rows]
+        if self.store.metric == "cosine":
+            norms = np.sqrt(norms)
+            return -np.divide(dots, norms, out=np.zeros_like(dots), where=norms > 0)
+        return norms - 2.0 * dots
+
+    def codebook_bytes(self) -> int:
+        return self._low.nbytes + self._step.nbytes
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        if self.trained:
+            stats["code_bytes_per_chunk"] += self._norms.itemsize
+            stats["compression"] = stats["float_bytes_per_chunk"] / stats["code_bytes_per_chunk"]
+        return stats
+
+
+class ProductQuantizer(Quantizer):
+    """PQ codes: ``m`` sub-vectors, each the index of one of 256 centroids.
+
+    ``m`` must divide the embedding dimension; more sub-vectors mean larger
+    codes and higher recall.
+    """
+
+    kind = "pq"
+
+    def __init__(
+        self,
+        store: "ColumnarStore",
+        m: int = 8,
+        train_size: Optional[int] = None,
+        rerank: int = 4,
+    ) -> None:
+        if m < 1:
+            raise ValueError("INVALID_QUANTIZATION_PARAMS")
+        self.m = m
+        super().__init__(store, train_size=train_size, rerank=rerank)
+
+    def reset(self) -> None:
+        super().reset()
+        self.codebooks: Optional[np.ndarray] = None
+
+    @property
+    def code_size(self) -> int:
+        return self.m
+
+    def check_dim(self, dim: int) -> None:
+        if dim % self.m:
+            raise ValueError(f"PQ_DIM_NOT_DIVISIBLE:{dim}")
+
+    def _split(self, x: np.ndarray) -> np.ndarray:
+        # (rows, dim) -> (m, rows, dim / m)
+        return x.reshape(x.shape[0], self.m, -1).transpose(1, 0, 2)
+
+    def _fit(self, x: np.ndarray) -> None:
+        self.check_dim(x.shape[1])
+        ksub = min(256, x.shape[0])
+        self.codebooks = np.stack([kmeans(sub, ksub) for sub in self._split(x)])
+        self._sqnorms = np.einsum("mkd,mkd->mk", self.codebooks, self.codebooks)
+
+    def _encode(self, x: np.ndarray) -> np.ndarray:
+        codes = np.empty((x.shape[0], self.m), dtype=np.uint8)
+        for j, sub in enumerate(self._split(x)):
+            book = self.codebooks[j]
+            codes[:, j] = _nearest(sub, book, np.einsum("ij,ij->i", book, book))
+        return codes
+
+    def _prepare(self, q: np.ndarray) -> Any:
+        # One lookup table per query: the distance from each query sub-vector
+        # to every centroid of its subspace.
+        dots = np.einsum("mkd,md->mk", self.codebooks, q.reshape(self.m, -1))
+        if self.store.metric == "cosine":
+            return -dots
+        return self._sqnorms - 2.0 * dots
+
+    def _keys(self, state: Any, codes: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        keys = np.zeros(codes.shape[0], dtype=np.float32)
+        for j in range(self.m):
+            keys += state[j].take(codes[:, j])
+        return keys
+
+    def codebook_bytes(self) -> int:
+        return self.codebooks.nbytes
+
+
+QUANTIZERS = {"int8": ScalarQuantizer, "pq": ProductQuantizer}
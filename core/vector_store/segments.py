@@ -0,0 +1,249 @@
+"""Memory-mapped on-disk snapshot format for the vector store.
+
+A snapshot is a directory holding append-only column files::
+
+    manifest.json    format version, dim, metric, committed rows and segments
+    embeddings.f32   raw row-major float32 matrix, ``rows x dim``
+    sqnorms.f32      raw float32 squared norm per row
+    records.bin      concatenated JSON ``[id, text, metadata]`` records
+    records.idx      raw uint64 ``(offset, length)`` pair per row
+    tombstones.u64   raw uint64 number of every row replaced by a later one
+
+Every ``upsert`` batch is appended to the end of the column files as a new
+segment and becomes visible once ``manifest.json`` is atomically replaced, so
+readers never observe a partially written batch and nothing is rewritten.
+Loading maps the files with ``mmap``: the embedding matrix is handed to the
+query engine without copying and several processes opening the same snapshot
+share the same page-cache pages.  A chunk that overwrites an existing id is
+appended like any other row, and the row it replaces is listed in
+``tombstones.u64`` by the same commit; readers skip tombstoned rows.
+
+Only one process should write to a snapshot at a time; readers pick up new
+segments and tombstones with :meth:`Snapshot.refresh`.
+"""
+
+from __future__ import annotations
+
+import functools
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+FORMAT_VERSION = 2
+
+# Version 1 snapshots have no tombstones and are read as such.
+READABLE_FORMATS = (1, 2)
+
+MANIFEST = "manifest.json"
+EMBEDDINGS = "embeddings.f32"
+SQNORMS = "sqnorms.f32"
+RECORDS = "records.bin"
+RECORDS_INDEX = "records.idx"
+TOMBSTONES = "tombstones.u64"
+
+_RECORD_CACHE_SIZE = 4096
+
+
+def _map(path: Path, dtype: Any, shape: Tuple[int, ...]) -> np.ndarray:
+    if 0 in shape:
+        return np.empty(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=shape)
+
+
+class RecordField:
+    """Read-only sequence view over one field of the snapshot records."""
+
+    def __init__(self, snapshot: "Snapshot", position: int) -> None:
+        self.snapshot = snapshot
+        self.position = position
+
+    def __len__(self) -> int:
+        return self.snapshot.rows
+
+    def __getitem__(self, row: int) -> Any:
+        return self.snapshot.record(row)[self.position]
+
+
+class Snapshot:
+    """Handle on a snapshot directory.
+
+    Parameters
+    ----------
+    path: str or Path
+        Directory of the snapshot.  It is created on the first write.
+    durable: bool, optional
+        ``fsync`` column files before committing each segment.
+    """
+
+    def __init__(self, path: Any, durable: bool = False) -> None:
+        self.path = Path(path)
+        self.durable = durable
+        self.manifest: Optional[Dict[str, Any]] = None
+        self.refresh()
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    @property
+    def exists(self) -> bool:
+        return self.manifest is not None
+
+    @property
+    def rows(self) -> int:
+        return self.manifest["rows"] if self.manifest else 0
+
+    @property
+    def dim(self) -> Optional[int]:
+        return self.manifest["dim"] if self.manifest else None
+
+    @property
+    def metric(self) -> Optional[str]:
+        return self.manifest["metric"] if self.manifest else None
+
+    @property
+    def dead(self) -> int:
+        """Number of tombstoned rows."""
+
+        return self.manifest.get("tombstones", 0) if self.manifest else 0
+
+    def refresh(self) -> bool:
+        """Re-read the manifest and remap the columns, return whether it changed."""
+
+        try:
+            manifest = json.loads((self.path / MANIFEST).read_text())
+        except FileNotFoundError:
+            return False
+        if manifest.get("format") not in READABLE_FORMATS:
+            raise ValueError(f"UNSUPPORTED_SNAPSHOT_FORMAT:{manifest.get('format')}")
+        if manifest == self.manifest:
+            return False
+        self.manifest = manifest
+        rows, dim = manifest["rows"], manifest["dim"]
+        self.embeddings = _map(self.path / EMBEDDINGS, np.float32, (rows, dim))
+        self.sqnorms = _map(self.path / SQNORMS, np.float32, (rows,))
+        self._index = _map(self.path / RECORDS_INDEX, np.uint64, (rows, 2))
+        self._data = _map(self.path / RECORDS, np.uint8, (manifest["records_bytes"],))
+        self.tombstones = _map(self.path / TOMBSTONES, np.uint64, (self.dead,))
+        self._cached = functools.lru_cache(maxsize=_RECORD_CACHE_SIZE)(self._decode)
+        return True
+
+    def _decode(self, row: int) -> Tuple[Optional[str], str, Dict[str, Any]]:
+        offset, length = (int(v) for v in self._index[row])
+        chunk_id, text, metadata = json.loads(bytes(self._data[offset : offset + length]))
+        return chunk_id, text, metadata
+
+    def record(self, row: int) -> Tuple[Optional[str], str, Dict[str, Any]]:
+        """Return ``(id, text, metadata)`` of ``row``."""
+
+        return self._cached(row)
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    def _commit(self, manifest: Dict[str, Any], files: List[Any]) -> None:
+        for f in files:
+            f.flush()
+            if self.durable:
+                os.fsync(f.fileno())
+        tmp = self.path / (MANIFEST + ".tmp")
+        tmp.write_text(json.dumps(manifest))
+        os.replace(tmp, self.path / MANIFEST)
+        self.refresh()
+
+    def _open(self, name: str, committed: int) -> Any:
+        f = open(self.path / name, "r+b" if (self.path / name).exists() else "w+b")
+        # Drop bytes of a batch that crashed before its manifest was written.
+        f.truncate(committed)
+        f.seek(committed)
+        return f
+
+    @staticmethod
+    def _encode(
+        ids: Sequence[Optional[str]],
+        texts: Sequence[str],
+        metadata: Sequence[Dict[str, Any]],
+        start: int,
+    ) -> Tuple[bytes, np.ndarray]:
+        blobs = [
+            json.dumps([i, t, m], ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            for i, t, m in zip(ids, texts, metadata)
+        ]
+        lengths = np.fromiter((len(b) for b in blobs), dtype=np.uint64, count=len(blobs))
+        offsets = np.cumsum(lengths) - lengths + np.uint64(start)
+        return b"".join(blobs), np.stack([offsets, lengths], axis=1)
+
+    def write(
+        self,
+        ids: Sequence[Optional[str]],
+        texts: Sequence[str],
+        metadata: Sequence[Dict[str, Any]],
+        matrix: np.ndarray,
+        sqnorms: np.ndarray,
+        replaces: Sequence[int] = (),
+        *,
+        metric: str = "euclidean",
+    ) -> None:
+        """Append one batch and commit it as a new segment.
+
+        The rows listed in ``replaces`` are tombstoned by the same commit;
+        committed bytes are never modified.
+        """
+
+        base = self.manifest
+        if base is None:
+            self.path.mkdir(parents=True, exist_ok=True)
+            base = {
+                "format": FORMAT_VERSION,
+                "dim": int(matrix.shape[1]),
+                "metric": metric,
+                "rows": 0,
+                "records_bytes": 0,
+                "tombstones": 0,
+                "segments": [],
+            }
+        elif matrix.shape[1] != base["dim"]:
+            raise ValueError("EMBEDDING_DIM_MISMATCH")
+
+        rows, dim, used = base["rows"], base["dim"], base["records_bytes"]
+        dead = base.get("tombstones", 0)
+        blob, index = self._encode(ids, texts, metadata, used)
+        matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        sqnorms = np.ascontiguousarray(sqnorms, dtype=np.float32)
+
+        files = [
+            self._open(EMBEDDINGS, rows * dim * 4),
+            self._open(SQNORMS, rows * 4),
+            self._open(RECORDS, used),
+            self._open(RECORDS_INDEX, rows * 16),
+            self._open(TOMBSTONES, dead * 8),
+        ]
+        emb_f, norm_f, rec_f, idx_f, dead_f = files
+        try:
+            rec_f.write(blob)
+            emb_f.write(matrix.tobytes())
+            norm_f.write(sqnorms.tobytes())
+            idx_f.write(index.tobytes())
+            dead_f.write(np.asarray(replaces, dtype=np.uint64).tobytes())
+
+            segment = {
+                "start": rows,
+                "rows": len(ids),
+                "tombstones": len(replaces),
+                "created_at": time.time(),
+            }
+            manifest = dict(base)
+            manifest["format"] = FORMAT_VERSION
+            manifest["rows"] = rows + len(ids)
+            manifest["records_bytes"] = used + len(blob)
+            manifest["tombstones"] = dead + len(replaces)
+            manifest["segments"] = base["segments"] + [segment]
+            self._commit(manifest, files)
+        finally:
+            for f in files:
+                f.close()
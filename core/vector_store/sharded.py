@@ -0,0 +1,459 @@
+"""Vector index partitioned across local worker processes.
+
+A :class:`~core.vector_store.columnar.ColumnarStore` lives inside the
+serving process, so every query of every concurrent run competes for the
+same GIL.  :class:`ShardedStore` instead starts ``shards`` worker processes,
+each owning one partition of the corpus in its own columnar store (with the
+same ANN, quantization and lexical options).  Chunks are assigned to a shard
+by a stable hash of their id (round-robin for chunks without one), so an
+upsert of an existing id always lands on the shard holding it.
+
+A query is sent to every shard at once; each shard answers with its local
+``top_k`` and the coordinator merges them into the global ``top_k``.  The
+coordinator waits on the shards' pipes with the GIL released, so the shards
+search in parallel on separate cores.  Hybrid queries cannot be fused per
+shard, since a shard's local ranks say nothing about global relevance:
+shards return their vector and BM25 candidates with raw scores and the
+coordinator ranks both lists globally before fusing them.  Lexical
+statistics (BM25 document frequencies) are per shard, which with hash
+partitioning differs from global statistics only marginally.
+
+A shard that dies or misses its deadline is skipped: the query returns the
+merged results of the remaining shards (counted in ``stats()["partial"]``)
+and a replacement process is started in the background.  Shards backed by a
+snapshot directory (``path``) reload their partition on restart; an
+in-memory shard comes back empty, which is reported as ``lost_rows``.
+Writes to an unavailable shard fail with ``SHARD_UNAVAILABLE``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+_CONTEXT = multiprocessing.get_context("spawn")
+
+
+def _serve(conn: Any, metric: str, path: Optional[str], options: Dict[str, Any]) -> None:
+    """Worker process loop: apply ``(op, args)`` requests to a local store."""
+
+    from core import vector_store
+
+    from .columnar import ColumnarStore
+    from .segments import Snapshot
+
+    store = ColumnarStore(metric=metric)
+    vector_store._configure_store(store, **options)
+    if path is not None:
+        store.attach(Snapshot(path))
+
+    def rows(hits: List[Tuple[int, float]]) -> List[Tuple[float, int, str, Dict[str, Any]]]:
+        return [(score, row, store.texts[row], store.metadata[row]) for row, score in hits]
+
+    def search_many(queries: np.ndarray, top_k: int, filters: Any, nprobe: Any, rerank: Any):
+        found = store.search_many(queries, top_k, filters=filters, nprobe=nprobe, rerank=rerank)
+        return [rows(hits) for hits in found]
+
+    def candidates(*args: Any):
+        vector, lexical = vector_store._candidates(store, *args)
+        return rows(vector), rows(lexical)
+
+    handlers = {
+        "add": lambda *args: (store.add(*args), len(store))[1],
+        "search": lambda *args: rows(vector_store._search(store, *args)),
+        "search_many": search_many,
+        "candidates": candidates,
+        "len": lambda: len(store),
+        "clear": lambda: store.clear(),
+        "stats": lambda: vector_store._store_stats(store),
+    }
+    conn.send(("ready", len(store)))
+    while True:
+        try:
+            op, args = conn.recv()
+        except (EOFError, OSError):
+            return
+        try:
+            conn.send(("ok", handlers[op](*args)))
+        except Exception as exc:  # noqa: BLE001 - reported to the coordinator
+            conn.send(("error", exc))
+
+
+class _Shard:
+    """One worker process and the pipe to it; calls are serialized."""
+
+    def __init__(self, index: int, metric: str, path: Optional[str], options: Dict[str, Any]):
+        self.index = index
+        self.rows = 0
+        self.broken = False
+        self._lock = threading.Lock()
+        self._conn, child = _CONTEXT.Pipe()
+        self.proc = _CONTEXT.Process(
+            target=_serve,
+            args=(child, metric, path, options),
+            name=f"vector-shard-{index}",
+            daemon=True,
+        )
+        self.proc.start()
+        child.close()
+
+    def wait_ready(self, timeout_s: float) -> None:
+        _, self.rows = self._receive(timeout_s)
+
+    def _receive(self, timeout_s: float) -> Any:
+        if not self._conn.poll(timeout_s):
+            raise TimeoutError
+        return self._conn.recv()
+
+    def call(self, op: str, args: Sequence[Any], timeout_s: float) -> Any:
+        with self._lock:
+            if self.broken:
+                raise EOFError
+            try:
+                self._conn.send((op, tuple(args)))
+                status, result = self._receive(timeout_s)
+            except (EOFError, OSError, TimeoutError):
+                # A late reply would be read as the answer to the next
+                # request, so the pipe is never used again.
+                self.broken = True
+                raise
+        if status == "error":
+            raise result
+        return result
+
+    def kill(self) -> None:
+        if self.proc.is_alive():
+            self.proc.kill()
+        self.proc.join()
+        self._conn.close()
+
+
+def shard_of(chunk_id: Optional[str], shards: int, fallback: int) -> int:
+    """Return the shard owning ``chunk_id``; ``fallback`` places chunks without id."""
+
+    if chunk_id is None:
+        return fallback % shards
+    return zlib.crc32(str(chunk_id).encode("utf-8")) % shards
+
+
+class ShardedStore:
+    """Corpus partitioned over ``shards`` worker processes.
+
+    Parameters
+    ----------
+    shards: int
+        Number of worker processes.
+    metric: str
+        Similarity metric of every shard.
+    path: str, optional
+        Directory holding one snapshot per shard (``shard-<i>``), so shards
+        survive restarts and crashes.
+    timeout_s: float
+        Deadline for a shard to answer one request.
+    start_timeout_s: float
+        Time a worker has to start and load its snapshot.
+    options: dict, optional
+        Index options applied to every shard, as accepted by
+        :func:`core.vector_store.create_index_if_not_exists` (``ann``,
+        ``quantization``, ``lexical``...).
+    """
+
+    def __init__(
+        self,
+        shards: int = 4,
+        *,
+        metric: str = "euclidean",
+        path: Optional[str] = None,
+        timeout_s: float = 30.0,
+        start_timeout_s: float = 60.0,
+        options: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        if shards < 1:
+            raise ValueError("INVALID_SHARD_COUNT")
+        self.metric = metric
+        self.path = path
+        self.timeout_s = timeout_s
+        self.start_timeout_s = start_timeout_s
+        self.options = dict(options or {})
+        self._executor = ThreadPoolExecutor(shards * 4, thread_name_prefix="vector-shard")
+        self._next = 0
+        self._closed = False
+        self.partial = self.restarts = self.lost_rows = 0
+        self._shards: List[Optional[_Shard]] = [self._start(i) for i in range(shards)]
+        try:
+            for shard in self._shards:
+                shard.wait_ready(start_timeout_s)
+        except (EOFError, OSError, TimeoutError):
+            self.close()
+            raise RuntimeError("SHARD_START_FAILED") from None
+
+    def _start(self, index: int) -> _Shard:
+        path = None if self.path is None else str(Path(self.path) / f"shard-{index}")
+        return _Shard(index, self.metric, path, self.options)
+
+    @property
+    def shards(self) -> int:
+        return len(self._shards)
+
+    def __len__(self) -> int:
+        return sum(shard.rows for shard in self._shards if shard is not None)
+
+    # ------------------------------------------------------------------
+    # Failure handling
+    # ------------------------------------------------------------------
+
+    def _restart(self, index: int, failed: _Shard) -> None:
+        if self._shards[index] is not failed:
+            return
+        self._shards[index] = None
+        if self.path is None:
+            self.lost_rows += failed.rows
+        failed.kill()
+        delay = 0.5
+        while not self._closed:
+            shard = self._start(index)
+            try:
+                shard.wait_ready(self.start_timeout_s)
+            except (EOFError, OSError, TimeoutError):
+                shard.kill()
+                time.sleep(delay)
+                delay = min(delay * 2, 30.0)
+                continue
+            if self._closed:
+                shard.kill()
+                return
+            self._shards[index] = shard
+            self.restarts += 1
+            return
+
+    def _call(self, index: int, op: str, args: Sequence[Any]) -> Any:
+        shard = self._shards[index]
+        if shard is None:
+            raise RuntimeError(f"SHARD_UNAVAILABLE:{index}")
+        try:
+            return shard.call(op, args, self.timeout_s)
+        except (EOFError, OSError, TimeoutError):
+            threading.Thread(
+                target=self._restart,
+                args=(index, shard),
+                name="vector-shard-restart",
+                daemon=True,
+            ).start()
+            raise RuntimeError(f"SHARD_UNAVAILABLE:{index}") from None
+
+    async def _fan_out(
+        self, calls: Dict[int, Tuple[str, Sequence[Any]]]
+    ) -> Dict[int, Any]:
+        loop = asyncio.get_running_loop()
+        futures = {
+            index: loop.run_in_executor(self._executor, self._call, index, op, args)
+            for index, (op, args) in calls.items()
+        }
+        results = await asyncio.gather(*futures.values(), return_exceptions=True)
+        return dict(zip(futures, results))
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    async def add(
+        self,
+        ids: Sequence[Optional[str]],
+        texts: Sequence[str],
+        metadata: Sequence[Dict[str, Any]],
+        embeddings: Any,
+    ) -> None:
+        """Route every chunk to its shard and insert the batches in parallel."""
+
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        groups: Dict[int, List[int]] = {}
+        for i, chunk_id in enumerate(ids):
+            if chunk_id is None:
+                self._next += 1
+            groups.setdefault(shard_of(chunk_id, self.shards, self._next), []).append(i)
+        calls = {
+            index: (
+                "add",
+                (
+                    [ids[i] for i in rows],
+                    [texts[i] for i in rows],
+                    [metadata[i] for i in rows],
+                    matrix[rows],
+                ),
+            )
+            for index, rows in groups.items()
+        }
+        results = await self._fan_out(calls)
+        for index, result in results.items():
+            if isinstance(result, BaseException):
+                raise result
+            self._shards[index].rows = result
+
+    async def clear(self) -> None:
+        results = await self._fan_out({i: ("clear", ()) for i in range(self.shards)})
+        for result in results.values():
+            if isinstance(result, BaseException):
+                raise result
+        for shard in self._shards:
+            if shard is not None:
+                shard.rows = 0
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def _live(self) -> List[int]:
+        return [i for i, shard in enumerate(self._shards) if shard is not None]
+
+    def _gather(self, results: Dict[int, Any]) -> List[Tuple[int, Any]]:
+        answered = []
+        for index, result in results.items():
+            if isinstance(result, RuntimeError) and str(result).startswith("SHARD_UNAVAILABLE"):
+                continue
+            if isinstance(result, BaseException):
+                raise result
+            answered.append((index, result))
+        if len(answered) < self.shards:
+            self.partial += 1
+        return answered
+
+    @staticmethod
+    def _ranked(
+        answers: List[Tuple[int, List[Tuple[float, int, str, Dict[str, Any]]]]], top_k: int
+    ) -> List[Tuple[float, int, int, str, Dict[str, Any]]]:
+        """Best ``top_k`` of the shards' hits as ``(-score, shard, row, text, meta)``."""
+
+        hits = [
+            (-score, index, row, text, meta)
+            for index, shard_hits in answers
+            for score, row, text, meta in shard_hits
+        ]
+        hits.sort(key=lambda hit: hit[:3])
+        return hits[:top_k]
+
+    @classmethod
+    def _merge(
+        cls, answers: List[Tuple[int, List[Tuple[float, int, str, Dict[str, Any]]]]], top_k: int
+    ) -> List[Dict[str, Any]]:
+        return [
+            {"text": text, "meta": meta, "score": -neg}
+            for neg, _, _, text, meta in cls._ranked(answers, top_k)
+        ]
+
+    async def search(
+        self,
+        embedding: Any,
+        top_k: int,
+        filters: Optional[Dict[str, Any]] = None,
+        nprobe: Optional[int] = None,
+        text: Optional[str] = None,
+        mode: str = "vector",
+        candidates: Optional[int] = None,
+        rerank: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Return the merged ``top_k`` chunks over all reachable shards.
+
+        Arguments are those of :func:`core.vector_store.query`.
+        """
+
+        q = None if embedding is None else np.asarray(embedding, dtype=np.float32)
+        if mode == "hybrid":
+            return await self._hybrid(q, top_k, filters, nprobe, text, candidates, rerank)
+        args = (filters, nprobe, text, mode, candidates, rerank)
+        results = await self._fan_out({i: ("search", (q, top_k) + args) for i in self._live()})
+        return self._merge(self._gather(results), top_k)
+
+    async def _hybrid(
+        self,
+        q: Optional[np.ndarray],
+        top_k: int,
+        filters: Optional[Dict[str, Any]],
+        nprobe: Optional[int],
+        text: Optional[str],
+        candidates: Optional[int],
+        rerank: Optional[int],
+    ) -> List[Dict[str, Any]]:
+        from core import vector_store
+
+        if text is None:
+            raise ValueError("QUERY_TEXT_REQUIRED")
+        depth = max(candidates or vector_store.DEFAULT_CANDIDATES, top_k)
+        args = (q, depth, filters, nprobe, text, rerank)
+        results = await self._fan_out({i: ("candidates", args) for i in self._live()})
+        answers = self._gather(results)
+        rankings = [
+            self._ranked([(index, lists[which]) for index, lists in answers], depth)
+            for which in (0, 1)
+        ]
+        # Fuse over positions in one table of the distinct (shard, row) hits.
+        hits: Dict[Tuple[int, int], Tuple[float, int, int, str, Dict[str, Any]]] = {}
+        for ranking in rankings:
+            for hit in ranking:
+                hits.setdefault(hit[1:3], hit)
+        position = {key: i for i, key in enumerate(hits)}
+        table = list(hits.values())
+        fused = vector_store.reciprocal_rank_fusion(
+            [[position[hit[1:3]] for hit in ranking] for ranking in rankings]
+        )
+        return [
+            {"text": table[i][3], "meta": table[i][4], "score": score}
+            for i, score in fused[:top_k]
+        ]
+
+    async def search_many(
+        self, embeddings: Any, top_k: int, *args: Any
+    ) -> List[List[Dict[str, Any]]]:
+        """Batched :meth:`search` of vectors: every shard receives all queries in
+        one message; ``args`` are filters, ``nprobe`` and ``rerank``.
+        """
+
+        queries = np.asarray(embeddings, dtype=np.float32)
+        queries = queries.reshape(len(queries), -1)
+        results = await self._fan_out(
+            {i: ("search_many", (queries, top_k) + args) for i in self._live()}
+        )
+        answers = self._gather(results)
+        return [
+            self._merge([(index, hits[qi]) for index, hits in answers], top_k)
+            for qi in range(len(queries))
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        """Coordinator counters: rows, live shards and failures so far."""
+
+        return {
+            "rows": len(self),
+            "metric": self.metric,
+            "shards": self.shards,
+            "live_shards": len(self._live()),
+            "partial": self.partial,
+            "restarts": self.restarts,
+            "lost_rows": self.lost_rows,
+        }
+
+    async def shard_stats(self) -> Dict[int, Any]:
+        """Return :func:`core.vector_store.index_stats` of every live shard."""
+
+        results = await self._fan_out({i: ("stats", ()) for i in self._live()})
+        return {
+            index: None if isinstance(result, BaseException) else result
+            for index, result in sorted(results.items())
+        }
+
+    def close(self) -> None:
+        """Stop every worker process."""
+
+        self._closed = True
+        for shard in self._shards:
+            if shard is not None:
+                shard.kill()
+        self._shards = [None] * len(self._shards)
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,61 @@
+"""Benchmark ``code.exec`` per-call overhead.
+
+Run from the repository root::
+
+    python tests/benchmarks/bench_code_exec.py
+
+Compares a round-trip through the warm sandbox pool with starting a fresh
+interpreter that imports numpy for every call, which is what the node would
+cost without the pool.  Not collected by pytest.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from core import sandbox  # noqa: E402
+
+SNIPPET = "import numpy as np\nartifacts['total'] = float(np.arange(inputs).sum())"
+
+
+def bench(calls: int = 500, cold_calls: int = 20) -> None:
+    pool = sandbox.configure(size=4, max_queue=calls, preload=("numpy",))
+
+    async def warm() -> float:
+        await pool.run(SNIPPET, 10)
+        start = time.perf_counter()
+        await asyncio.gather(*(pool.run(SNIPPET, i) for i in range(calls)))
+        return time.perf_counter() - start
+
+    async def sequential() -> float:
+        start = time.perf_counter()
+        for i in range(calls):
+            await pool.run(SNIPPET, i)
+        return time.perf_counter() - start
+
+    concurrent_s = asyncio.run(warm())
+    sequential_s = asyncio.run(sequential())
+    sandbox.shutdown()
+
+    start = time.perf_counter()
+    for i in range(cold_calls):
+        subprocess.run(
+            [sys.executable, "-I", "-c", f"inputs = {i}; artifacts = {{}}\n{SNIPPET}"],
+            check=True,
+        )
+    cold_s = time.perf_counter() - start
+
+    print("code.exec, numpy snippet:")
+    print(f"  fresh interpreter  {cold_s * 1e3 / cold_calls:8.2f} ms/call")
+    print(f"  warm pool          {sequential_s * 1e3 / calls:8.2f} ms/call")
+    print(f"  warm pool x4       {calls / concurrent_s:8.0f} calls/s")
+
+
+if __name__ == "__main__":
+    bench()
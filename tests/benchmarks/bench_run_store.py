@@ -0,0 +1,52 @@
+"""Benchmark the write-behind run store.
+
+Run from the repository root::
+
+    python tests/benchmarks/bench_run_store.py
+
+Measures how long enqueueing step events takes on the caller side (the
+latency a run pays) and how many steps per second the writer thread
+commits.  Not collected by pytest.
+"""
+
+from __future__ import annotations
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from core.runtime.run_store import RunStore  # noqa: E402
+
+
+def bench(runs: int = 2_000, steps: int = 10) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        store = RunStore(str(Path(tmp) / "runs.sqlite"))
+        event = {
+            "type": "step_succeeded",
+            "node_id": "n2",
+            "latency_ms": 120,
+            "token_usage": {"prompt": 800, "completion": 120},
+        }
+        start = time.perf_counter()
+        for i in range(runs):
+            record = {"run_id": f"r{i}", "status": "running", "queued_at": f"{i:08d}"}
+            store.save_run(record)
+            for _ in range(steps):
+                store.record_event(f"r{i}", event)
+            store.save_run(dict(record, status="succeeded", outputs={"answer": "ok"}))
+        enqueued = time.perf_counter() - start
+        store.flush()
+        total = time.perf_counter() - start
+        store.close()
+
+    count = runs * steps
+    print(f"{runs} runs x {steps} steps, {store.batches_written} transactions")
+    print(f"  enqueue  {enqueued * 1e6 / count:6.2f} us/step (caller side)")
+    print(f"  persist  {count / total:,.0f} steps/s")
+
+
+if __name__ == "__main__":
+    bench()
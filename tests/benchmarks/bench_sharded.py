@@ -0,0 +1,82 @@
+"""Benchmark query throughput of sharded indexes against one in-process store.
+
+Run from the repository root::
+
+    python tests/benchmarks/bench_sharded.py --rows 1000000 --shards 1,2,4,8
+
+Every configuration holds the same random corpus and answers the same
+queries with ``concurrency`` of them in flight, as concurrent runs would.
+Throughput grows with the shard count up to the number of free cores; on a
+single core sharding only adds IPC overhead.  Not collected by pytest.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from core import vector_store  # noqa: E402
+
+
+async def throughput(index: str, queries: np.ndarray, top_k: int, concurrency: int) -> float:
+    pending = iter(queries.tolist())
+
+    async def client() -> None:
+        for q in pending:
+            await vector_store.query(q, top_k, index_name=index)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return len(queries) / (time.perf_counter() - start)
+
+
+async def bench(args: argparse.Namespace) -> None:
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=(args.rows, args.dim)).astype(np.float32)
+    queries = rng.normal(size=(args.queries, args.dim)).astype(np.float32)
+    ids = [f"c{i}" for i in range(args.rows)]
+    texts = [""] * args.rows
+    metadata = [{}] * args.rows
+
+    print(f"{args.rows} rows x {args.dim} dims, {os.cpu_count()} cpus, top_k={args.top_k}")
+    await vector_store.create_index_if_not_exists("bench_local")
+    vector_store.get_index("bench_local").add(ids, texts, metadata, data)
+    baseline = await throughput("bench_local", queries, args.top_k, args.concurrency)
+    print(f"  in-process        {baseline:10.1f} queries/s")
+    del vector_store.INDEXES["bench_local"]
+
+    for shards in args.shards:
+        name = f"bench_{shards}"
+        await vector_store.create_index_if_not_exists(name, shards=shards)
+        store = vector_store.get_index(name)
+        for start in range(0, args.rows, 100_000):
+            end = start + 100_000
+            await store.add(ids[start:end], texts[start:end], metadata[start:end], data[start:end])
+        qps = await throughput(name, queries, args.top_k, args.concurrency)
+        print(f"  {shards} shard(s)       {qps:10.1f} queries/s  x{qps / baseline:.2f}")
+        vector_store.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--queries", type=int, default=400)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument(
+        "--shards", type=lambda s: [int(x) for x in s.split(",")], default=[1, 2, 4, 8]
+    )
+    asyncio.run(bench(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
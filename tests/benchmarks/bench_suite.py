@@ -0,0 +1,440 @@
+"""Reproducible benchmark suite for the engine, vector store and gateway paths.
+
+Run from the repository root::
+
+    python tests/benchmarks/bench_suite.py --out results.json
+    python tests/benchmarks/bench_suite.py --scenarios ingest,retrieval \\
+        --sizes 10000,100000,1000000
+    python tests/benchmarks/bench_suite.py --compare before.json after.json
+
+Scenarios:
+
+``engine_sequential``
+    ``run_flow`` overhead on linear flows of trivial nodes, one run at a time.
+``engine_concurrent``
+    ``input -> llm.chat -> output`` runs against the local fake LiteLLM
+    server, many in flight at once.
+``llm_chat``
+    ``llm.chat`` calls against the fake server, buffered and streamed
+    (time to first token included).
+``ingest``
+    ``vector_store.upsert`` throughput of a synthetic corpus.
+``retrieval``
+    ``vector_store.query`` latency for exact and IVF search, IVF recall@k
+    and ``query_many`` throughput (its latencies are per batch of queries).
+
+Synthetic corpora are clustered Gaussian embeddings generated from
+``--seed``, so the same arguments produce the same data on every machine.
+Every result carries latency percentiles in milliseconds; ``--out`` writes
+them, with the commit and environment, as JSON that ``--compare`` diffs.
+Not collected by pytest.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "tests"))
+
+from core import http_client, vector_store  # noqa: E402
+from core.nodes import NODE_HANDLERS, llm_chat  # noqa: E402
+from core.runtime.contracts import NodeContext  # noqa: E402
+from core.runtime.engine import run_flow  # noqa: E402
+from core.runtime.plan import build_plan  # noqa: E402
+from fake_litellm import FakeLiteLLM  # noqa: E402
+
+INDEX = "bench"
+
+# Queries per ``query_many`` call in the batched retrieval row.
+QUERY_BATCH = 32
+
+
+# ----------------------------------------------------------------------
+# Helpers
+# ----------------------------------------------------------------------
+
+
+def percentiles(samples_ms: List[float]) -> Dict[str, float]:
+    """Summarize latencies (ms) as count, mean, min, max and p50/p90/p95/p99."""
+
+    if not samples_ms:
+        return {"count": 0}
+    arr = np.asarray(samples_ms, dtype=np.float64)
+    summary = {"count": int(arr.size), "mean": float(arr.mean())}
+    summary["min"] = float(arr.min())
+    for q in (50, 90, 95, 99):
+        summary[f"p{q}"] = float(np.percentile(arr, q))
+    summary["max"] = float(arr.max())
+    return {k: round(v, 4) if isinstance(v, float) else v for k, v in summary.items()}
+
+
+def result(scenario: str, params: Dict[str, Any], latency_ms: List[float], **extra: Any):
+    record = {"scenario": scenario, "params": params, "latency_ms": percentiles(latency_ms)}
+    record.update({k: round(v, 4) if isinstance(v, float) else v for k, v in extra.items()})
+    return record
+
+
+async def timed_calls(
+    make_call: Callable[[int], Any], count: int, concurrency: int
+) -> Tuple[List[float], float]:
+    """Await ``make_call(i)`` for ``i < count`` with ``concurrency`` in flight.
+
+    Returns the per-call latencies in milliseconds and the wall time in seconds.
+    """
+
+    latencies: List[float] = []
+    next_index = iter(range(count))
+
+    async def worker() -> None:
+        for i in next_index:
+            start = time.perf_counter()
+            await make_call(i)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - start
+
+
+def environment() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor() or None,
+    }
+
+
+_CORPORA: Dict[Tuple[int, int, int], np.ndarray] = {}
+
+
+def synthetic_corpus(size: int, dim: int, seed: int) -> np.ndarray:
+    """Return ``size`` clustered ``float32`` embeddings (cached per arguments)."""
+
+    key = (size, dim, seed)
+    if key not in _CORPORA:
+        rng = np.random.default_rng(seed)
+        clusters = max(8, int(math.sqrt(size)) // 2)
+        centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+        labels = rng.integers(0, clusters, size=size)
+        noise = rng.normal(scale=0.35, size=(size, dim)).astype(np.float32)
+        _CORPORA[key] = centers[labels] + noise
+    return _CORPORA[key]
+
+
+def sample_queries(corpus: np.ndarray, count: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed + 1)
+    picks = corpus[rng.integers(0, len(corpus), size=count)]
+    return picks + rng.normal(scale=0.1, size=picks.shape).astype(np.float32)
+
+
+async def ingest(corpus: np.ndarray, batch: int) -> List[float]:
+    vector_store.INDEXES.pop(INDEX, None)
+    await vector_store.create_index_if_not_exists(INDEX)
+    latencies = []
+    for first in range(0, len(corpus), batch):
+        chunks = [
+            {
+                "id": f"c{i}",
+                "text": f"chunk {i}",
+                "metadata": {"source": f"doc{i // 50}"},
+                "embedding": corpus[i],
+            }
+            for i in range(first, min(first + batch, len(corpus)))
+        ]
+        start = time.perf_counter()
+        await vector_store.upsert(chunks, index_name=INDEX)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def linear_flow(nodes: int, node_type: str) -> Dict[str, Any]:
+    return {
+        "id": f"bench-{nodes}",
+        "nodes": [{"id": f"n{i}", "type": node_type, "params": {}} for i in range(nodes)],
+        "edges": [{"from": f"n{i}", "to": f"n{i + 1}"} for i in range(nodes - 1)],
+    }
+
+
+def gateway(args: argparse.Namespace) -> FakeLiteLLM:
+    """Start a fake LiteLLM server and point ``llm.chat`` at it."""
+
+    server = FakeLiteLLM(
+        latency_ms=args.llm_latency_ms,
+        jitter_ms=args.llm_jitter_ms,
+        token_delay_ms=args.llm_token_delay_ms,
+        seed=args.seed,
+        record=False,
+    )
+    llm_chat.LITELLM_URL = server.url + "/v1/chat/completions"
+    http_client.configure_client(max_connections=args.concurrency)
+    return server
+
+
+# ----------------------------------------------------------------------
+# Scenarios
+# ----------------------------------------------------------------------
+
+
+async def engine_sequential(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    async def node_pass(ctx: NodeContext) -> Any:
+        return ctx.inputs
+
+    results = []
+    for nodes in (3, 10):
+        plan = build_plan(linear_flow(nodes, "pass"), {"pass": node_pass})
+        for _ in range(min(200, args.runs)):
+            await run_flow(plan, 1, {})
+        latencies, wall = await timed_calls(lambda i: run_flow(plan, i, {}), args.runs, 1)
+        params = {"nodes": nodes, "runs": args.runs}
+        results.append(
+            result("engine_sequential", params, latencies, runs_per_s=args.runs / wall)
+        )
+    return results
+
+
+async def engine_concurrent(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    flow = {
+        "id": "bench-chat",
+        "nodes": [
+            {"id": "in", "type": "input", "params": {}},
+            {"id": "chat", "type": "llm.chat", "params": {"model": "bench"}},
+            {"id": "out", "type": "output", "params": {}},
+        ],
+        "edges": [{"from": "in", "to": "chat"}, {"from": "chat", "to": "out"}],
+    }
+    plan = build_plan(flow, NODE_HANDLERS)
+    with gateway(args):
+        latencies, wall = await timed_calls(
+            lambda i: run_flow(plan, {"message": f"question {i}"}, {}),
+            args.runs,
+            args.concurrency,
+        )
+    params = {
+        "runs": args.runs,
+        "concurrency": args.concurrency,
+        "llm_latency_ms": args.llm_latency_ms,
+        "llm_jitter_ms": args.llm_jitter_ms,
+    }
+    return [result("engine_concurrent", params, latencies, runs_per_s=args.runs / wall)]
+
+
+async def llm_chat_calls(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    results = []
+    with gateway(args):
+        for stream in (False, True):
+            first_token: List[float] = []
+
+            async def call(i: int) -> None:
+                start = time.perf_counter()
+                seen: List[bool] = []
+
+                def emit(event: Dict[str, Any]) -> None:
+                    if not seen:
+                        seen.append(True)
+                        first_token.append((time.perf_counter() - start) * 1000)
+
+                ctx = NodeContext(
+                    run_id=f"r{i}",
+                    node_id="chat",
+                    inputs={"message": f"question number {i} for the gateway"},
+                    params={"model": "bench", "stream": stream},
+                    secrets={},
+                    user={},
+                    logger=lambda msg: None,
+                    emit=emit,
+                    timeout_ms=30_000,
+                )
+                await llm_chat.node_llm_chat(ctx)
+
+            latencies, wall = await timed_calls(call, args.runs, args.concurrency)
+            params = {
+                "stream": stream,
+                "calls": args.runs,
+                "concurrency": args.concurrency,
+                "llm_latency_ms": args.llm_latency_ms,
+                "llm_token_delay_ms": args.llm_token_delay_ms,
+            }
+            extra: Dict[str, Any] = {"calls_per_s": args.runs / wall}
+            if stream:
+                extra["ttft_ms"] = percentiles(first_token)
+            results.append(result("llm_chat", params, latencies, **extra))
+    return results
+
+
+async def ingest_corpus(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    results = []
+    for size in args.sizes:
+        corpus = synthetic_corpus(size, args.dim, args.seed)
+        start = time.perf_counter()
+        latencies = await ingest(corpus, args.batch)
+        wall = time.perf_counter() - start
+        params = {"size": size, "dim": args.dim, "batch": args.batch}
+        results.append(
+            result("ingest", params, latencies, chunks_per_s=size / wall, total_s=wall)
+        )
+        vector_store.INDEXES.pop(INDEX, None)
+    return results
+
+
+async def retrieval(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    results = []
+    for size in args.sizes:
+        corpus = synthetic_corpus(size, args.dim, args.seed)
+        queries = sample_queries(corpus, args.queries, args.seed)
+        await ingest(corpus, args.batch)
+        base = {"size": size, "dim": args.dim, "top_k": args.top_k, "queries": args.queries}
+
+        latencies, _ = await timed_calls(
+            lambda i: vector_store.query(queries[i], args.top_k, index_name=INDEX),
+            args.queries,
+            1,
+        )
+        results.append(result("retrieval", dict(base, mode="exact"), latencies))
+
+        # Latencies of this row are per query_many call of QUERY_BATCH queries.
+        batches = [queries[i : i + QUERY_BATCH] for i in range(0, len(queries), QUERY_BATCH)]
+        latencies, wall = await timed_calls(
+            lambda i: vector_store.query_many(batches[i], args.top_k, index_name=INDEX),
+            len(batches),
+            1,
+        )
+        results.append(
+            result(
+                "retrieval",
+                dict(base, mode="exact_batched", query_batch=QUERY_BATCH),
+                latencies,
+                queries_per_s=args.queries / wall,
+            )
+        )
+
+        nlist = max(16, int(math.sqrt(size)))
+        start = time.perf_counter()
+        await vector_store.create_index_if_not_exists(INDEX, ann="ivf", nlist=nlist)
+        build_s = time.perf_counter() - start
+        store = vector_store.get_index(INDEX)
+        for nprobe in (8, 32):
+            latencies, _ = await timed_calls(
+                lambda i: vector_store.query(
+                    queries[i], args.top_k, index_name=INDEX, nprobe=nprobe
+                ),
+                args.queries,
+                1,
+            )
+            recall = store.ann.recall(queries[: min(100, args.queries)], args.top_k, nprobe)
+            params = dict(base, mode="ivf", nlist=nlist, nprobe=nprobe)
+            results.append(
+                result("retrieval", params, latencies, recall=recall, build_s=build_s)
+            )
+        vector_store.INDEXES.pop(INDEX, None)
+    return results
+
+
+SCENARIOS = {
+    "engine_sequential": engine_sequential,
+    "engine_concurrent": engine_concurrent,
+    "llm_chat": llm_chat_calls,
+    "ingest": ingest_corpus,
+    "retrieval": retrieval,
+}
+
+
+# ----------------------------------------------------------------------
+# Reporting
+# ----------------------------------------------------------------------
+
+
+def describe(record: Dict[str, Any]) -> str:
+    params = " ".join(f"{k}={v}" for k, v in record["params"].items())
+    lat = record["latency_ms"]
+    line = f"{record['scenario']:18s} {params}\n    p50 {lat['p50']:.3f} ms  p99 {lat['p99']:.3f} ms"
+    for key in ("runs_per_s", "calls_per_s", "chunks_per_s", "queries_per_s", "recall"):
+        if key in record:
+            line += f"  {key} {record[key]:,.3f}"
+    if "ttft_ms" in record:
+        line += f"  ttft p50 {record['ttft_ms']['p50']:.3f} ms"
+    return line
+
+
+def _key(record: Dict[str, Any]) -> str:
+    return record["scenario"] + json.dumps(record["params"], sort_keys=True)
+
+
+def compare(before_path: str, after_path: str) -> None:
+    """Print the p50/p99 ratio (after / before) of every result in both files."""
+
+    before = {_key(r): r for r in json.loads(Path(before_path).read_text())["results"]}
+    after = json.loads(Path(after_path).read_text())["results"]
+    for record in after:
+        old = before.get(_key(record))
+        if old is None:
+            continue
+        ratios = []
+        for q in ("p50", "p99"):
+            prev, now = old["latency_ms"].get(q), record["latency_ms"].get(q)
+            if prev:
+                ratios.append(f"{q} {now / prev:5.2f}x")
+        params = " ".join(f"{k}={v}" for k, v in record["params"].items())
+        print(f"{record['scenario']:18s} {'  '.join(ratios)}  {params}")
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--sizes", default="10000,100000", help="corpus sizes")
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--batch", type=int, default=1000, help="chunks per upsert")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--runs", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--llm-latency-ms", type=float, default=20.0)
+    parser.add_argument("--llm-jitter-ms", type=float, default=10.0)
+    parser.add_argument("--llm-token-delay-ms", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write JSON results to this file")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    args.sizes = [int(s) for s in args.sizes.split(",") if s]
+    names = [s for s in args.scenarios.split(",") if s]
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    results = []
+    for name in names:
+        for record in asyncio.run(SCENARIOS[name](args)):
+            print(describe(record), flush=True)
+            results.append(record)
+    if args.out:
+        document = {"environment": environment(), "arguments": vars(args), "results": results}
+        Path(args.out).write_text(json.dumps(document, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
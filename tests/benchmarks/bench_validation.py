@@ -0,0 +1,89 @@
+"""Benchmark flow validation.
+
+Run from the repository root::
+
+    python tests/benchmarks/bench_validation.py
+
+Compares the interpreted ``_apply_defaults_and_validate`` with the compiled
+catalog validators, then times ``validate_and_repair`` and ``validate_many``
+on linear flows of growing size.  Not collected by pytest.
+"""
+
+from __future__ import annotations
+
+import copy
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from core.node_catalog import NODE_CATALOG  # noqa: E402
+from core.validation import (  # noqa: E402
+    _apply_defaults_and_validate,
+    compile_catalog,
+    validate_and_repair,
+    validate_many,
+)
+
+
+def build_flow(size: int) -> dict:
+    nodes = [{"id": "n1", "type": "input", "params": {}}]
+    for i in range(2, size):
+        if i % 2:
+            nodes.append({"id": f"n{i}", "type": "rag.retrieve", "params": {"top_k": 3}})
+        else:
+            nodes.append({"id": f"n{i}", "type": "llm.chat", "params": {"temperature": 0}})
+    nodes.append({"id": f"n{size}", "type": "output", "params": {}})
+    edges = [{"from": f"n{i}", "to": f"n{i + 1}"} for i in range(1, size)]
+    return {"name": f"bench-{size}", "nodes": nodes, "edges": edges}
+
+
+def best_of(fn, repeat: int = 5) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def bench_params(calls: int = 100_000) -> None:
+    schema = NODE_CATALOG["nodes"]["llm.chat"]["schema"]
+    validator = compile_catalog(NODE_CATALOG)["llm.chat"]
+    params = {"temperature": 0, "stream": True}
+
+    interpreted = best_of(
+        lambda: [_apply_defaults_and_validate(params, schema) for _ in range(calls)]
+    )
+    compiled = best_of(lambda: [validator(params) for _ in range(calls)])
+    print(f"llm.chat params x{calls}:")
+    print(f"  interpreted {interpreted * 1e9 / calls:8.0f} ns/call")
+    print(f"  compiled    {compiled * 1e9 / calls:8.0f} ns/call  ({interpreted / compiled:.1f}x)")
+
+
+def bench_flows(sizes=(10, 100, 1_000, 10_000)) -> None:
+    print("validate_and_repair:")
+    for size in sizes:
+        flow = build_flow(size)
+        copies = [copy.deepcopy(flow) for _ in range(5)]
+        elapsed = best_of(lambda: validate_and_repair(copies.pop(), NODE_CATALOG))
+        print(f"  {size:6d} nodes {elapsed * 1e3:9.3f} ms  {elapsed * 1e6 / size:6.2f} us/node")
+
+
+def bench_many(count: int = 1_000, size: int = 20) -> None:
+    flows = [build_flow(size) for _ in range(count)]
+    for flow in flows[::10]:
+        flow["nodes"][1]["params"]["temperature"] = 9
+    start = time.perf_counter()
+    results = validate_many(flows, NODE_CATALOG)
+    elapsed = time.perf_counter() - start
+    invalid = sum(not r["valid"] for r in results)
+    print(f"validate_many: {count} flows of {size} nodes ({invalid} invalid)")
+    print(f"  {elapsed * 1e3:.1f} ms  {count / elapsed:,.0f} flows/s")
+
+
+if __name__ == "__main__":
+    bench_params()
+    bench_flows()
+    bench_many()
@@ -0,0 +1,157 @@
+"""Local stand-in for the LiteLLM gateway used by tests.
+
+The server runs in a background thread and speaks just enough of the
+OpenAI-compatible API for the prototype: ``POST /v1/embeddings`` returns a
+deterministic embedding per input text and ``POST /v1/chat/completions``
+echoes the last user message, as server-sent events one word at a time when
+the request sets ``stream``.  Every request body is recorded in
+``requests`` and every client port in ``connections`` so tests can assert on
+batching and keep-alive behaviour.  Statuses queued in ``fail_next`` are
+returned (with an error body) before normal answers resume.
+
+For benchmarks the server can simulate a slow gateway: every answer waits
+``latency_ms`` plus a uniform ``jitter_ms`` before the first byte, and
+streamed answers wait ``token_delay_ms`` between tokens.  ``record=False``
+stops it from keeping request bodies around during long runs.
+"""
+
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def fake_embedding(text, dim=4):
+    vec = [0.0] * dim
+    for i, ch in enumerate(text):
+        vec[i % dim] += ord(ch)
+    return [v / max(len(text), 1) for v in vec]
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+
+class FakeLiteLLM:
+    def __init__(
+        self, latency_ms=0.0, jitter_ms=0.0, token_delay_ms=0.0, seed=0, record=True
+    ):
+        self.requests = []
+        self.connections = set()
+        self.fail_next = []
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.token_delay_ms = token_delay_ms
+        self.record = record
+        self._random = random.Random(seed)
+        handler = type("Handler", (_Handler,), {"fake": self})
+        self._server = _Server(("127.0.0.1", 0), handler)
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True
+        )
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def delay(self):
+        wait_ms = self.latency_ms
+        if self.jitter_ms:
+            wait_ms += self._random.uniform(0, self.jitter_ms)
+        if wait_ms > 0:
+            time.sleep(wait_ms / 1000)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    fake = None
+    protocol_version = "HTTP/1.1"
+    # Headers and body are separate writes; without TCP_NODELAY the body
+    # waits for the client's delayed ACK (~40 ms) on every response.
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if self.fake.record:
+            self.fake.requests.append((self.path, body))
+        self.fake.connections.add(self.client_address[1])
+        self.fake.delay()
+        if self.fake.fail_next:
+            self._send(self.fake.fail_next.pop(0), {"error": {"message": "injected"}})
+        elif self.path == "/v1/embeddings":
+            texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+            data = {
+                "object": "list",
+                "model": body.get("model"),
+                "data": [
+                    {"object": "embedding", "index": i, "embedding": fake_embedding(t)}
+                    for i, t in enumerate(texts)
+                ],
+            }
+            self._send(200, data)
+        elif self.path == "/v1/chat/completions" and body.get("stream"):
+            self._stream_chat(body)
+        elif self.path == "/v1/chat/completions":
+            content = "echo: " + body["messages"][-1]["content"]
+            data = {
+                "object": "chat.completion",
+                "model": body.get("model"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": {"prompt_tokens": 10, "completion_tokens": 3, "total_tokens": 13},
+            }
+            self._send(200, data)
+        else:
+            self._send(404, {"error": {"message": "not found"}})
+
+    def _stream_chat(self, body):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        words = ("echo: " + body["messages"][-1]["content"]).split(" ")
+        tokens = [words[0]] + [" " + w for w in words[1:]]
+        events = [
+            {"id": "c1", "model": body.get("model"), "choices": [{"delta": {"content": t}}]}
+            for t in tokens
+        ]
+        events.append({"id": "c1", "choices": [{"delta": {}, "finish_reason": "stop"}]})
+        usage = {"prompt_tokens": 10, "completion_tokens": len(tokens)}
+        events.append({"id": "c1", "choices": [], "usage": usage})
+        for event in events:
+            if self.fake.token_delay_ms:
+                time.sleep(self.fake.token_delay_ms / 1000)
+            self._chunk(f"data: {json.dumps(event)}\n\n".encode())
+        self._chunk(b"data: [DONE]\n\n")
+        self._chunk(b"")
+
+    def _chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send(self, status, data):
+        payload = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
@@ -0,0 +1,133 @@
+import asyncio
+
+from core import vector_store
+from core.nodes import BATCH_HANDLERS, NODE_HANDLERS
+from core.runtime.batch import InvalidInput, run_batch
+from core.runtime.contracts import NodeContext
+from core.runtime.engine import run_flow
+
+FLOW = {
+    "name": "km",
+    "nodes": [
+        {"id": "n1", "type": "input", "params": {}},
+        {"id": "n2", "type": "rag.retrieve", "params": {"top_k": 2, "filters": {}}},
+        {"id": "n3", "type": "output", "params": {}},
+    ],
+    "edges": [{"from": "n1", "to": "n2"}, {"from": "n2", "to": "n3"}],
+}
+
+
+def setup_function():
+    vector_store.VECTOR_DB.clear()
+    asyncio.run(
+        vector_store.upsert(
+            [
+                {"id": f"c{i}", "text": f"chunk {i}", "metadata": {"source": f"doc{i}"}}
+                for i in range(20)
+            ]
+        )
+    )
+
+
+def collect(*args, **kwargs):
+    async def main():
+        return [record async for record in run_batch(*args, **kwargs)]
+
+    return asyncio.run(main())
+
+
+def test_run_batch_matches_run_flow_and_batches_retrieval(monkeypatch):
+    questions = [{"message": f"question {i}"} for i in range(10)]
+    expected = [asyncio.run(run_flow(FLOW, q, NODE_HANDLERS)) for q in questions]
+
+    calls = []
+    query_many = vector_store.query_many
+
+    async def counting_query_many(embeddings, *args, **kwargs):
+        calls.append(len(embeddings))
+        return await query_many(embeddings, *args, **kwargs)
+
+    monkeypatch.setattr(vector_store, "query_many", counting_query_many)
+    records = collect(FLOW, iter(questions), NODE_HANDLERS, BATCH_HANDLERS, batch_size=4)
+
+    assert [r["index"] for r in records] == list(range(10))
+    assert [r["output"] for r in records] == expected
+    assert calls == [4, 4, 2]
+
+
+def test_run_batch_reports_failures_per_item_and_reads_lazily():
+    consumed = []
+
+    def inputs():
+        for i in range(100):
+            consumed.append(i)
+            yield i
+
+    async def node_check(ctx: NodeContext):
+        if ctx.inputs % 3 == 0:
+            raise ValueError(f"bad:{ctx.inputs}")
+        return ctx.inputs * 10
+
+    flow = {
+        "nodes": [
+            {"id": "n1", "type": "check", "params": {}},
+            {"id": "n2", "type": "output", "params": {}},
+        ],
+        "edges": [{"from": "n1", "to": "n2"}],
+    }
+    handlers = {"check": node_check, "output": NODE_HANDLERS["output"]}
+
+    async def main():
+        results = []
+        async for record in run_batch(flow, inputs(), handlers, batch_size=2, concurrency=2):
+            results.append(record)
+            if len(results) == 4:
+                break
+        return results
+
+    records = asyncio.run(main())
+    assert records == [
+        {"index": 0, "status": "failed", "error": "bad:0"},
+        {"index": 1, "status": "succeeded", "output": 10},
+        {"index": 2, "status": "succeeded", "output": 20},
+        {"index": 3, "status": "failed", "error": "bad:3"},
+    ]
+    assert len(consumed) <= 8
+
+
+def test_run_batch_keeps_handler_timeouts_apart_from_step_timeouts():
+    async def node_wait(ctx: NodeContext):
+        if ctx.inputs == "upstream":
+            raise TimeoutError("upstream took too long")
+        await asyncio.sleep(1)
+
+    flow = {
+        "nodes": [
+            {"id": "n1", "type": "wait", "params": {}, "timeout_ms": 50},
+            {"id": "n2", "type": "output", "params": {}},
+        ],
+        "edges": [{"from": "n1", "to": "n2"}],
+    }
+    handlers = {"wait": node_wait, "output": NODE_HANDLERS["output"]}
+    records = collect(flow, ["upstream", "slow"], handlers)
+    assert [r["error"] for r in records] == ["upstream took too long", "STEP_TIMED_OUT:n1"]
+
+
+def test_run_batch_reports_unreadable_inputs_in_place():
+    async def node_double(ctx: NodeContext):
+        return ctx.inputs * 2
+
+    flow = {
+        "nodes": [
+            {"id": "n1", "type": "double", "params": {}},
+            {"id": "n2", "type": "output", "params": {}},
+        ],
+        "edges": [{"from": "n1", "to": "n2"}],
+    }
+    handlers = {"double": node_double, "output": NODE_HANDLERS["output"]}
+    records = collect(flow, [1, InvalidInput("INVALID_JSON_LINE"), 3], handlers, batch_size=2)
+    assert records == [
+        {"index": 0, "status": "succeeded", "output": 2},
+        {"index": 1, "status": "failed", "error": "INVALID_JSON_LINE"},
+        {"index": 2, "status": "succeeded", "output": 6},
+    ]
@@ -0,0 +1,177 @@
+import asyncio
+import os
+import pwd
+
+import pytest
+
+from core import sandbox
+from core.node_catalog import NODE_CATALOG
+from core.nodes import NODE_HANDLERS, enable_code_exec
+from core.nodes.code_exec import node_code_exec
+from core.runtime.contracts import NodeContext
+from core.runtime.plan import compile_flow
+from core.validation import validate_and_repair
+
+
+@pytest.fixture
+def pool():
+    # Run as the current account: the interpreter may not be readable by nobody.
+    user = pwd.getpwuid(os.getuid()).pw_name
+    yield sandbox.configure(size=1, max_queue=1, max_tasks=3, preload=("json",), user=user)
+    sandbox.shutdown()
+
+
+def make_ctx(code, inputs=None, **params):
+    return NodeContext(
+        run_id="r1",
+        node_id="n1",
+        inputs=inputs,
+        params={"language": "python", "code": code, **params},
+        secrets={},
+        user={},
+        logger=lambda msg: None,
+        emit=lambda evt: None,
+        timeout_ms=5000,
+    )
+
+
+def run(code, inputs=None, **params):
+    return asyncio.run(node_code_exec(make_ctx(code, inputs, **params)))
+
+
+def test_code_exec_returns_output_and_artifacts(pool):
+    result = run("print(inputs['x'] * 2)\nartifacts['y'] = inputs['x'] + 1", {"x": 20})
+    assert result == {"stdout": "40\n", "stderr": "", "artifacts": {"y": 21}}
+
+
+def test_code_exec_reuses_workers_and_recycles_after_max_tasks(pool):
+    # Every job runs in its own child of the warm worker.
+    pids = [run("import os; print(os.getpid(), os.getppid())")["stdout"].split() for _ in range(4)]
+    workers = [ppid for _, ppid in pids]
+    assert len({pid for pid, _ in pids}) == 4
+    assert workers[0] == workers[1] == workers[2]
+    assert workers[3] != workers[0]
+
+
+def test_code_exec_reports_errors_with_output(pool):
+    with pytest.raises(sandbox.SandboxError) as exc:
+        run("print('before')\n1 / 0")
+    assert exc.value.code == "CODE_EXEC_FAILED"
+    assert exc.value.stdout == "before\n"
+    assert "ZeroDivisionError" in exc.value.stderr
+    assert "sandbox_worker" not in exc.value.stderr
+
+
+def test_code_exec_kills_runaway_code_and_recovers(pool):
+    with pytest.raises(sandbox.SandboxError, match="CODE_EXEC_TIMEOUT"):
+        run("while True: pass", timeout_ms=200)
+    assert run("print('ok')")["stdout"] == "ok\n"
+    # The worker killed the job's child and stays warm.
+    assert pool.recycled == 0
+
+
+def test_code_exec_enforces_sandbox_limits(pool):
+    for code in ("import socket; socket.socket()", "import subprocess; subprocess.run(['ls'])"):
+        with pytest.raises(sandbox.SandboxError, match="SANDBOX_BLOCKED"):
+            run(code)
+    with pytest.raises(sandbox.SandboxError, match="MemoryError"):
+        run("block = bytearray(512 * 1024 * 1024)")
+    assert run("import os; print(sorted(os.environ))")["stdout"].startswith("[")
+    assert "SECRET" not in run("import os; print(dict(os.environ))")["stdout"]
+
+
+def test_code_exec_isolates_workers_from_the_host(pool):
+    for module in ("_posixsubprocess", "_ctypes", "pty"):
+        with pytest.raises(sandbox.SandboxError, match=f"SANDBOX_BLOCKED:import {module}"):
+            run(f"import {module}")
+    with pytest.raises(sandbox.SandboxError, match="(FileNotFound|Permission)Error"):
+        run("import os; open(f'/proc/{os.getppid()}/environ', 'rb').read()")
+    assert run("import os; print(os.getuid())")["stdout"] != "0\n"
+    interfaces = run("import socket; print([n for _, n in socket.if_nameindex()])")
+    assert interfaces["stdout"] == "['lo']\n"
+
+
+def test_code_exec_jobs_cannot_reach_later_jobs(pool):
+    spy = (
+        "import sys\n"
+        "main = sys.modules['__main__']\n"
+        "main.seen, original = [], main.run_job\n"
+        "def run_job(job, limit):\n"
+        "    main.seen.append(job)\n"
+        "    return original(job, limit)\n"
+        "main.run_job = run_job"
+    )
+    run(spy)
+    assert run("print(inputs['secret'])", {"secret": "s3cr3t"})["stdout"] == "s3cr3t\n"
+    leaked = run("import sys; print(getattr(sys.modules['__main__'], 'seen', None))")
+    assert leaked["stdout"] == "None\n"
+
+    forge = (
+        "import json, os, struct\n"
+        "data = json.dumps({'stdout': 'FORGED', 'stderr': '', 'artifacts': None,"
+        " 'error': None}).encode()\n"
+        "for fd in range(64):\n"
+        "    try:\n"
+        "        os.write(fd, struct.pack('>I', len(data)) + data)\n"
+        "    except OSError:\n"
+        "        pass"
+    )
+    try:
+        run(forge)
+    except sandbox.SandboxError:
+        pass
+    assert run("print('mine')")["stdout"] == "mine\n"
+
+
+def test_code_exec_rejects_calls_beyond_the_queue(pool):
+    async def burst():
+        calls = [node_code_exec(make_ctx("import time; time.sleep(0.2)")) for _ in range(3)]
+        return await asyncio.gather(*calls, return_exceptions=True)
+
+    results = asyncio.run(burst())
+    rejected = [r for r in results if isinstance(r, sandbox.SandboxError)]
+    assert [r.code for r in rejected] == ["CODE_EXEC_QUEUE_FULL"]
+
+
+def test_code_exec_catalog_entry():
+    flow = {
+        "name": "sandboxed",
+        "nodes": [
+            {"id": "n1", "type": "input", "params": {}},
+            {"id": "n2", "type": "code.exec", "params": {"language": "python", "code": "1"}},
+            {"id": "n3", "type": "output", "params": {}},
+        ],
+        "edges": [{"from": "n1", "to": "n2"}, {"from": "n2", "to": "n3"}],
+    }
+    repaired = validate_and_repair(flow, NODE_CATALOG)
+    assert repaired["nodes"][1]["params"]["timeout_ms"] == 3000
+    flow["nodes"][1]["params"]["timeout_ms"] = 10_000
+    with pytest.raises(ValueError, match="MAX_EXCEEDED:timeout_ms"):
+        validate_and_repair(flow, NODE_CATALOG)
+    for bad, code in (
+        ({"language": "javascript", "code": "1"}, "INVALID_ENUM:language"),
+        ({"language": "python", "code": ""}, "MIN_LENGTH:code"),
+    ):
+        flow["nodes"][1]["params"] = bad
+        with pytest.raises(ValueError, match=code):
+            validate_and_repair(flow, NODE_CATALOG)
+
+
+def test_code_exec_is_registered_only_when_enabled():
+    flow = {
+        "name": "sandboxed",
+        "nodes": [
+            {"id": "n1", "type": "input", "params": {}},
+            {"id": "n2", "type": "code.exec", "params": {"language": "python", "code": "1"}},
+            {"id": "n3", "type": "output", "params": {}},
+        ],
+        "edges": [{"from": "n1", "to": "n2"}, {"from": "n2", "to": "n3"}],
+    }
+    assert "code.exec" not in NODE_HANDLERS
+    with pytest.raises(ValueError, match="NO_HANDLER:code.exec"):
+        compile_flow(flow, NODE_CATALOG, NODE_HANDLERS)
+    enable_code_exec()
+    try:
+        assert compile_flow(flow, NODE_CATALOG, NODE_HANDLERS)
+    finally:
+        del NODE_HANDLERS["code.exec"]
@@ -0,0 +1,97 @@
+import asyncio
+
+from core.runtime.contracts import NodeContext
+from core.runtime.events import EventLog
+from core.runtime.plan import build_plan
+from core.runtime.scheduler import RunScheduler
+
+
+def token(text, node_id="n2"):
+    return {"type": "step_token", "node_id": node_id, "token": text}
+
+
+def test_event_log_coalesces_tokens_and_replays():
+    log = EventLog()
+    log.emit({"type": "step_started", "node_id": "n2"})
+    for t in ["a", "b", "c"]:
+        log.emit(token(t))
+    log.emit(token("x", node_id="n3"))
+
+    frame, next_offset = log.read(0)
+    assert next_offset == 5
+    assert frame == [
+        {"type": "step_started", "node_id": "n2", "seq": 0},
+        {"type": "step_token", "node_id": "n2", "token": "abc", "seq": 3},
+        {"type": "step_token", "node_id": "n3", "token": "x", "seq": 4},
+    ]
+    assert log.read(3)[0] == [
+        {"type": "step_token", "node_id": "n2", "token": "c", "seq": 3},
+        {"type": "step_token", "node_id": "n3", "token": "x", "seq": 4},
+    ]
+
+
+def test_event_log_summarizes_dropped_events():
+    log = EventLog(capacity=4)
+    for i in range(10):
+        log.emit({"type": "step_log", "msg": str(i)})
+
+    frame, _ = log.read(2)
+    assert frame[0] == {"type": "events_dropped", "seq": 5, "count": 4}
+    assert [e["msg"] for e in frame[1:]] == ["6", "7", "8", "9"]
+
+
+def test_subscribers_receive_bursts_as_frames():
+    async def main():
+        log = EventLog()
+        frames = []
+
+        async def consume():
+            async for frame in log.subscribe(coalesce_ms=20):
+                frames.append(frame)
+
+        consumer = asyncio.ensure_future(consume())
+        await asyncio.sleep(0)
+        for t in "hello":
+            log.emit(token(t))
+            await asyncio.sleep(0.001)
+        await asyncio.sleep(0.05)
+        log.emit({"type": "step_succeeded", "node_id": "n2"})
+        log.close()
+        await consumer
+        late = [frame async for frame in log.subscribe(offset=-1)]
+        return frames, late
+
+    frames, late = asyncio.run(main())
+    assert frames == [
+        [{"type": "step_token", "node_id": "n2", "token": "hello", "seq": 4}],
+        [{"type": "step_succeeded", "node_id": "n2", "seq": 5}],
+    ]
+    assert late == [[{"type": "step_succeeded", "node_id": "n2", "seq": 5}]]
+
+
+async def node_echo(ctx: NodeContext):
+    ctx.emit(token("hi", node_id=ctx.node_id))
+    return ctx.inputs
+
+
+def test_scheduler_records_run_events():
+    plan = build_plan(
+        {"nodes": [{"id": "n1", "type": "echo", "params": {}}], "edges": []},
+        {"echo": node_echo},
+    )
+
+    async def main():
+        scheduler = RunScheduler()
+        run = scheduler.submit(plan, 1, run_id="r1")
+        frames = [frame async for frame in run.events.subscribe(coalesce_ms=0)]
+        await scheduler.aclose()
+        return [e for frame in frames for e in frame]
+
+    events = asyncio.run(main())
+    assert [(e["type"], e["seq"]) for e in events] == [
+        ("run_started", 0),
+        ("step_started", 1),
+        ("step_token", 2),
+        ("step_succeeded", 3),
+        ("run_succeeded", 4),
+    ]
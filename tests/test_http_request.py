@@ -0,0 +1,211 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from core import http_cache
+from core.http_client import HTTPError
+from core.node_catalog import NODE_CATALOG
+from core.nodes import http_request
+from core.nodes.http_request import node_http_request
+from core.runtime.contracts import NodeContext
+from core.validation import validate_and_repair
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_state = None
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body=b"", headers=()):
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        state = self.server_state
+        state["requests"].append((self.path, dict(self.headers)))
+        state["ports"].add(self.client_address[1])
+        if self.path == "/fresh":
+            body = json.dumps({"n": len(state["requests"])}).encode()
+            headers = [("Content-Type", "application/json"), ("Cache-Control", "max-age=60")]
+            self._reply(200, body, headers)
+        elif self.path == "/etag":
+            if self.headers.get("If-None-Match") == '"v1"':
+                self._reply(304, headers=[("ETag", '"v1"'), ("Cache-Control", "no-cache")])
+            else:
+                headers = [("ETag", '"v1"'), ("Cache-Control", "no-cache")]
+                self._reply(200, b"hello", headers)
+        elif self.path in ("/private", "/no-store"):
+            directive = "private, max-age=60" if self.path == "/private" else "no-store"
+            self._reply(200, b"secret", [("Cache-Control", directive)])
+        elif self.path == "/big":
+            self.send_response(200)
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for _ in range(64):
+                chunk = b"x" * 1024
+                self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+            self.wfile.write(b"0\r\n\r\n")
+        elif self.path == "/slow":
+            with state["lock"]:
+                state["active"] += 1
+                state["peak"] = max(state["peak"], state["active"])
+            time.sleep(0.05)
+            with state["lock"]:
+                state["active"] -= 1
+            self._reply(200, b"done")
+        else:
+            self._reply(404, b"missing")
+
+    def do_POST(self):
+        state = self.server_state
+        length = int(self.headers.get("Content-Length", 0))
+        state["requests"].append((self.path, self.rfile.read(length)))
+        if self.path == "/unavailable":
+            self._reply(503, b"busy")
+        else:
+            self._reply(200, b'{"ok": true}', [("Content-Type", "application/json")])
+
+
+@pytest.fixture
+def server():
+    state = {"requests": [], "ports": set(), "lock": threading.Lock(), "active": 0, "peak": 0}
+    handler = type("Handler", (_Handler,), {"server_state": state})
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    httpd.daemon_threads = True
+    thread = threading.Thread(target=httpd.serve_forever, kwargs={"poll_interval": 0.01})
+    thread.start()
+    http_cache.configure()
+    http_request.configure_client(backoff_s=0.001)
+    host, port = httpd.server_address
+    state["url"] = f"http://{host}:{port}"
+    yield state
+    httpd.shutdown()
+    httpd.server_close()
+    http_request.configure_client()
+
+
+def make_ctx(url, **params):
+    return NodeContext(
+        run_id="r1",
+        node_id="n1",
+        inputs=None,
+        params={"url": url, "method": "GET", **params},
+        secrets={},
+        user={},
+        logger=lambda msg: None,
+        emit=lambda evt: None,
+        timeout_ms=5000,
+    )
+
+
+def call(url, **params):
+    ctx = make_ctx(url, **params)
+    return asyncio.run(node_http_request(ctx)), ctx
+
+
+def test_http_request_get_and_post(server):
+    result, _ = call(server["url"] + "/fresh")
+    assert result["status"] == 200
+    assert result["body"] == {"n": 1}
+    result, _ = call(server["url"] + "/echo", method="POST", body={"q": 1})
+    assert result["body"] == {"ok": True}
+    assert server["requests"][-1] == ("/echo", b'{"q": 1}')
+
+
+def test_http_request_serves_fresh_responses_from_cache(server):
+    first, ctx = call(server["url"] + "/fresh", cache=True)
+    second, ctx = call(server["url"] + "/fresh", cache=True)
+    assert first["body"] == second["body"] == {"n": 1}
+    assert second["cache_hit"] and ctx.annotations["cache_hit"]
+    assert len(server["requests"]) == 1
+    # Without the param the cache is bypassed.
+    assert call(server["url"] + "/fresh")[0]["body"] == {"n": 2}
+
+
+def test_http_request_revalidates_with_etag(server):
+    first, _ = call(server["url"] + "/etag", cache=True)
+    second, _ = call(server["url"] + "/etag", cache=True)
+    assert first["body"] == second["body"] == "hello"
+    assert not first["cache_hit"] and second["cache_hit"]
+    assert server["requests"][1][1].get("If-None-Match") == '"v1"'
+    assert http_cache.HTTP_CACHE.stats()["revalidated"] == 1
+
+
+def test_http_request_does_not_cache_private_or_no_store(server):
+    for path in ("/private", "/no-store", "/private", "/no-store"):
+        call(server["url"] + path, cache=True)
+    assert len(server["requests"]) == 4
+    assert http_cache.HTTP_CACHE.stats()["entries"] == 0
+
+
+def test_http_request_caps_response_size(server):
+    with pytest.raises(ValueError, match="RESPONSE_TOO_LARGE"):
+        call(server["url"] + "/big", max_bytes=10_000)
+    assert len(call(server["url"] + "/big")[0]["body"]) == 64 * 1024
+
+
+def test_http_request_fails_on_error_status_without_retrying_post(server):
+    with pytest.raises(HTTPError) as exc:
+        call(server["url"] + "/missing")
+    assert exc.value.status == 404
+    with pytest.raises(HTTPError):
+        call(server["url"] + "/unavailable", method="POST", body="x")
+    assert [r for r in server["requests"] if r[0] == "/unavailable"] == [("/unavailable", b"x")]
+
+
+def test_http_request_limits_connections_per_host(server):
+    host = server["url"].split("//")[1]
+    http_request.configure_client(max_connections=16, host_limits={host: 2})
+
+    async def burst():
+        return await asyncio.gather(
+            *(node_http_request(make_ctx(server["url"] + "/slow")) for _ in range(8))
+        )
+
+    results = asyncio.run(burst())
+    assert [r["body"] for r in results] == ["done"] * 8
+    assert server["peak"] <= 2
+    assert len(server["ports"]) <= 2
+
+
+def test_http_request_catalog_entry():
+    flow = {
+        "name": "api",
+        "nodes": [
+            {"id": "n1", "type": "input", "params": {}},
+            {"id": "n2", "type": "http.request", "params": {"url": "http://x", "method": "GET"}},
+            {"id": "n3", "type": "output", "params": {}},
+        ],
+        "edges": [{"from": "n1", "to": "n2"}, {"from": "n2", "to": "n3"}],
+    }
+    params = validate_and_repair(flow, NODE_CATALOG)["nodes"][1]["params"]
+    assert params["cache"] is False
+    assert params["max_bytes"] == 5 * 1024 * 1024
+    for bad, code in (
+        ({"url": "http://x", "method": "DELETE"}, "INVALID_ENUM:method"),
+        ({"url": "", "method": "GET"}, "MIN_LENGTH:url"),
+    ):
+        flow["nodes"][1]["params"] = bad
+        with pytest.raises(ValueError, match=code):
+            validate_and_repair(flow, NODE_CATALOG)
+
+
+def test_http_request_rejects_unsupported_method(server):
+    with pytest.raises(ValueError, match="UNSUPPORTED_METHOD:DELETE"):
+        call(server["url"] + "/echo", method="DELETE")
+    assert server["requests"] == []
+
+
+def test_http_request_rejects_empty_url():
+    with pytest.raises(ValueError, match="URL_REQUIRED"):
+        call("")
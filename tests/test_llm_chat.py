@@ -1,35 +1,29 @@
 import asyncio
-import json
-from urllib import request
 
+import pytest
+
+from core import http_client, llm_cache
+from core.http_client import HTTPError
+from core.nodes import llm_chat
 from core.nodes.llm_chat import node_llm_chat
 from core.runtime.contracts import NodeContext
+from fake_litellm import FakeLiteLLM
 
 
-class DummyResponse:
-    def __init__(self, data: dict):
-        self._data = json.dumps(data).encode()
-
-    def read(self):
-        return self._data
-
-    def __enter__(self):
-        return self
-
-    def __exit__(self, exc_type, exc, tb):
-        return False
-
-
-def test_node_llm_chat(monkeypatch):
-    def fake_urlopen(req, timeout=10):
-        return DummyResponse({"choices": [{"message": {"content": "hi"}}]})
+@pytest.fixture
+def fake(monkeypatch):
+    with FakeLiteLLM() as server:
+        monkeypatch.setattr(llm_chat, "LITELLM_URL", server.url + "/v1/chat/completions")
+        http_client.configure_client(backoff_s=0.001)
+        yield server
+    http_client.configure_client()
 
-    monkeypatch.setattr(request, "urlopen", fake_urlopen)
 
-    ctx = NodeContext(
+def make_ctx(message="hello"):
+    return NodeContext(
         run_id="r1",
         node_id="n1",
-        inputs={"message": "hello"},
+        inputs={"message": message},
         params={},
         secrets={},
         user={},
@@ -37,5 +31,76 @@ def test_node_llm_chat(monkeypatch):
         emit=lambda evt: None,
         timeout_ms=1000,
     )
+
+
+def test_node_llm_chat(fake):
+    result = asyncio.run(node_llm_chat(make_ctx()))
+    assert result["text"] == "echo: hello"
+    assert fake.requests[0][1]["messages"][-1] == {"role": "user", "content": "hello"}
+
+
+def test_node_llm_chat_reuses_pooled_connections(fake):
+    async def many():
+        return await asyncio.gather(*(node_llm_chat(make_ctx(str(i))) for i in range(20)))
+
+    http_client.configure_client(max_connections=4)
+    results = asyncio.run(many())
+    assert [r["text"] for r in results] == [f"echo: {i}" for i in range(20)]
+    assert len(fake.connections) <= 4
+
+
+def test_node_llm_chat_retries_transient_errors(fake):
+    fake.fail_next = [429, 503]
+    assert asyncio.run(node_llm_chat(make_ctx()))["text"] == "echo: hello"
+    assert len(fake.requests) == 3
+
+    fake.fail_next = [500, 500, 500]
+    with pytest.raises(HTTPError) as exc:
+        asyncio.run(node_llm_chat(make_ctx()))
+    assert exc.value.status == 500
+
+
+def test_node_llm_chat_streams_tokens(fake):
+    events = []
+    ctx = make_ctx("how are you")
+    ctx.params = {"stream": True}
+    ctx.emit = events.append
+
     result = asyncio.run(node_llm_chat(ctx))
-    assert result["text"] == "hi"
+
+    assert [e["token"] for e in events] == ["echo:", " how", " are", " you"]
+    assert {e["type"] for e in events} == {"step_token"}
+    assert result["text"] == "echo: how are you"
+    assert result["raw"]["choices"][0]["finish_reason"] == "stop"
+    assert result["raw"]["usage"]["completion_tokens"] == 4
+    assert ctx.annotations["token_usage"] == {"prompt": 10, "completion": 4}
+    assert fake.requests[0][1]["stream"] is True
+
+
+def test_node_llm_chat_completion_cache(fake, tmp_path):
+    llm_cache.configure(path=str(tmp_path / "llm.sqlite"), deterministic=True)
+    try:
+        ctx = make_ctx("  what is   the policy? ")
+        ctx.params = {"cache": True}
+        first = asyncio.run(node_llm_chat(ctx))
+        again = make_ctx("what is the policy?")
+        again.params = {"cache": True}
+        second = asyncio.run(node_llm_chat(again))
+        assert (first["cache_hit"], second["cache_hit"]) == (False, True)
+        assert again.annotations == {"cache_hit": True}
+        assert second["text"] == first["text"]
+        assert len(fake.requests) == 1
+
+        # temperature == 0 calls are cached without the param; others are not.
+        for temperature in (0, 0, 0.7, 0.7):
+            ctx = make_ctx("x")
+            ctx.params = {"temperature": temperature}
+            asyncio.run(node_llm_chat(ctx))
+        assert len(fake.requests) == 4
+
+        # The SQLite tier survives a fresh in-memory cache.
+        llm_cache.configure(path=str(tmp_path / "llm.sqlite"))
+        asyncio.run(node_llm_chat(again))
+        assert len(fake.requests) == 4
+    finally:
+        llm_cache.configure()
@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from core.metrics import METRICS, Registry, cache_collector
+from core.runtime.contracts import NodeContext
+from core.runtime.engine import StepTimeout, run_flow
+
+
+async def node_echo(ctx: NodeContext):
+    ctx.annotations["token_usage"] = {"prompt": 7, "completion": 3}
+    ctx.annotations["cache_hit"] = False
+    return ctx.inputs
+
+
+async def node_slow(ctx: NodeContext):
+    await asyncio.sleep(1)
+
+
+def _flow(node_type):
+    return {
+        "id": "metrics-demo",
+        "nodes": [{"id": "n1", "type": node_type, "params": {}}],
+        "edges": [],
+    }
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    latency = registry.histogram("latency_ms", "Latency.", ["node_type"], buckets=[10, 100])
+    for value in (5, 50, 500):
+        latency.labels("llm.chat").observe(value)
+
+    text = registry.render()
+    assert "# TYPE latency_ms histogram" in text
+    assert 'latency_ms_bucket{node_type="llm.chat",le="10"} 1' in text
+    assert 'latency_ms_bucket{node_type="llm.chat",le="100"} 2' in text
+    assert 'latency_ms_bucket{node_type="llm.chat",le="+Inf"} 3' in text
+    assert 'latency_ms_sum{node_type="llm.chat"} 555' in text
+    assert 'latency_ms_count{node_type="llm.chat"} 3' in text
+
+
+def test_counter_labels_and_collectors():
+    registry = Registry()
+    counter = registry.counter("runs_total", "Runs.", ["status"])
+    counter.labels("ok").inc()
+    counter.labels("ok").inc(2)
+    with pytest.raises(ValueError, match="LABEL_COUNT_MISMATCH"):
+        counter.labels("ok", "extra")
+    registry.register_collector(
+        cache_collector("a", lambda: {"entries": 1, "hits": 3, "misses": 1, "hit_rate": 0.75})
+    )
+    registry.register_collector(cache_collector("b", lambda: None))
+
+    text = registry.render()
+    assert 'runs_total{status="ok"} 3' in text
+    assert 'cache_hit_ratio{cache="a"} 0.75' in text
+    assert text.count("# TYPE cache_hits_total counter") == 1
+    assert 'cache="b"' not in text
+
+
+def test_run_flow_records_step_and_run_metrics():
+    METRICS.clear()
+    asyncio.run(run_flow(_flow("echo"), 1, {"echo": node_echo}))
+    with pytest.raises(StepTimeout):
+        asyncio.run(run_flow(_flow("slow"), 1, {"slow": node_slow}, timeout_ms=10))
+
+    text = METRICS.render()
+    assert 'flow_step_latency_ms_count{node_type="echo"} 1' in text
+    assert 'flow_steps_total{node_type="echo",status="succeeded"} 1' in text
+    assert 'flow_steps_total{node_type="slow",status="timed_out"} 1' in text
+    assert 'flow_steps_in_flight{node_type="slow"} 0' in text
+    assert 'llm_tokens_total{node_type="echo",kind="prompt"} 7' in text
+    assert 'node_cache_lookups_total{node_type="echo",result="miss"} 1' in text
+    assert 'flow_runs_total{flow="metrics-demo",status="succeeded"} 1' in text
+    assert 'flow_runs_total{flow="metrics-demo",status="failed"} 1' in text
+    assert "flow_runs_in_flight 0" in text
+
+
+def test_disabled_registry_records_nothing():
+    METRICS.clear()
+    METRICS.enabled = False
+    try:
+        asyncio.run(run_flow(_flow("echo"), 1, {"echo": node_echo}))
+    finally:
+        METRICS.enabled = True
+    assert "flow_steps_total{" not in METRICS.render()
@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+from core.node_catalog import NODE_CATALOG
+from core.nodes.input import node_input
+from core.nodes.output import node_output
+from core.runtime.contracts import NodeContext
+from core.runtime.engine import run_flow
+from core.runtime.plan import PlanCache, compile_flow
+
+
+async def node_echo(ctx: NodeContext):
+    return {"inputs": ctx.inputs, "params": dict(ctx.params)}
+
+
+HANDLERS = {"input": node_input, "llm.chat": node_echo, "output": node_output}
+
+
+def build_flow(**extra):
+    return {
+        "name": "demo",
+        **extra,
+        "nodes": [
+            {"id": "n1", "type": "input", "params": {}},
+            {"id": "n2", "type": "llm.chat", "params": {"temperature": 0}},
+            {"id": "n3", "type": "output", "params": {}},
+        ],
+        "edges": [
+            {"from": "n1", "to": "n2"},
+            {"from": "n2", "to": "n3"},
+        ],
+    }
+
+
+def test_compile_flow_freezes_defaulted_params():
+    flow = build_flow()
+    plan = compile_flow(flow, NODE_CATALOG, HANDLERS)
+
+    assert flow["nodes"][1]["params"] == {"temperature": 0}
+    assert plan.linear and plan.chain == (0, 1, 2)
+    assert plan.steps[1].handler is node_echo
+    assert plan.steps[1].params["model"] == "gpt-4o-mini"
+    with pytest.raises(TypeError):
+        plan.steps[1].params["model"] = "other"
+
+    result = asyncio.run(run_flow(plan, "hi", {}))
+    assert result["inputs"] == "hi"
+    assert result["params"]["temperature"] == 0
+
+
+def test_compile_flow_requires_handlers():
+    with pytest.raises(ValueError) as exc:
+        compile_flow(build_flow(), NODE_CATALOG, {"input": node_input})
+    assert "NO_HANDLER:llm.chat" in str(exc.value)
+
+
+def test_plan_cache_hits_and_eviction():
+    cache = PlanCache(max_entries=2)
+
+    first = cache.get(build_flow(), NODE_CATALOG, HANDLERS)
+    assert cache.get(build_flow(), NODE_CATALOG, HANDLERS) is first
+
+    # Flows are keyed by content, even when they carry an id and version.
+    versioned = cache.get(build_flow(id="f1", version=1), NODE_CATALOG, HANDLERS)
+    assert cache.get(build_flow(id="f1", version=1), NODE_CATALOG, HANDLERS) is versioned
+    changed = build_flow(id="f1", version=1)
+    changed["nodes"][1]["params"]["temperature"] = 1
+    recompiled = cache.get(changed, NODE_CATALOG, HANDLERS)
+    assert recompiled is not versioned
+    assert recompiled.steps[1].params["temperature"] == 1
+
+    cache.get(build_flow(id="f1", version=2), NODE_CATALOG, HANDLERS)
+    assert cache.get(build_flow(), NODE_CATALOG, HANDLERS) is not first
+    assert cache.stats() == {
+        "entries": 2,
+        "hits": 2,
+        "misses": 5,
+        "evictions": 3,
+        "hit_rate": 2 / 7,
+    }
@@ -1,8 +1,12 @@
 import asyncio
 
+import pytest
+
+from core.node_catalog import NODE_CATALOG
 from core.nodes.rag_retrieve import node_rag_retrieve
 from core.runtime.contracts import NodeContext
 from core import vector_store
+from core.validation import validate_and_repair
 
 
 def setup_function():
@@ -42,3 +46,19 @@ def test_node_rag_retrieve_basic():
     assert len(result["chunks"]) == 1
     assert result["chunks"][0]["text"] == "hello world"
     assert result["citations"] == [{"source": "doc1", "page": 1}]
+
+
+def test_rag_retrieve_mode_is_checked_at_validation():
+    flow = {
+        "name": "rag",
+        "nodes": [
+            {"id": "n1", "type": "input", "params": {}},
+            {"id": "n2", "type": "rag.retrieve", "params": {"top_k": 3, "mode": "hybrid"}},
+            {"id": "n3", "type": "output", "params": {}},
+        ],
+        "edges": [{"from": "n1", "to": "n2"}, {"from": "n2", "to": "n3"}],
+    }
+    assert validate_and_repair(flow, NODE_CATALOG)["nodes"][1]["params"]["mode"] == "hybrid"
+    flow["nodes"][1]["params"]["mode"] = "semantic"
+    with pytest.raises(ValueError, match="INVALID_ENUM:mode"):
+        validate_and_repair(flow, NODE_CATALOG)
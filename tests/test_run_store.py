@@ -0,0 +1,81 @@
+import asyncio
+
+from core.runtime.contracts import NodeContext
+from core.runtime.plan import build_plan
+from core.runtime.run_store import RunStore
+from core.runtime.scheduler import RunScheduler
+
+
+async def node_chat(ctx: NodeContext):
+    ctx.annotations["token_usage"] = {"prompt": 12, "completion": 5}
+    return {"message": ctx.inputs["message"]}
+
+
+async def node_fail(ctx: NodeContext):
+    raise RuntimeError("boom")
+
+
+def plan_for(node_type, flow_id):
+    flow = {
+        "id": flow_id,
+        "nodes": [
+            {"id": "n1", "type": "chat", "params": {}},
+            {"id": "n2", "type": node_type, "params": {}},
+        ],
+        "edges": [{"from": "n1", "to": "n2"}],
+    }
+    return build_plan(flow, {"chat": node_chat, "fail": node_fail})
+
+
+def test_run_store_persists_scheduled_runs(tmp_path):
+    store = RunStore(str(tmp_path / "runs.sqlite"))
+
+    async def main():
+        scheduler = RunScheduler(store=store)
+        ok = scheduler.submit(
+            plan_for("chat", "f1"), {"message": "hi"}, run_id="r1", user={"id": "u1"}
+        )
+        bad = scheduler.submit(plan_for("fail", "f2"), {"message": "x"}, run_id="r2")
+        await scheduler.wait(ok.run_id)
+        await scheduler.wait(bad.run_id)
+        await scheduler.aclose()
+
+    asyncio.run(main())
+    assert store.flush(timeout=5)
+
+    record = store.get("r1")
+    assert record["status"] == "succeeded"
+    assert record["flow_id"] == "f1" and record["user_id"] == "u1"
+    assert record["inputs"] == {"message": "hi"}
+    assert record["outputs"] == {"message": "hi"}
+    assert [s["node_id"] for s in record["steps"]] == ["n1", "n2"]
+    assert record["steps"][0]["token_usage"] == {"prompt": 12, "completion": 5}
+
+    failed = store.get("r2")
+    assert failed["status"] == "failed" and failed["error"] == "boom"
+    assert [s["status"] for s in failed["steps"]] == ["succeeded", "failed"]
+    assert failed["steps"][1]["error"] == "boom"
+
+    assert [r["run_id"] for r in store.list(flow_id="f2")] == ["r2"]
+    assert [r["run_id"] for r in store.list(user_id="u1")] == ["r1"]
+    assert {r["run_id"] for r in store.list(since=record["queued_at"])} == {"r1", "r2"}
+    assert store.list(until=record["queued_at"]) == []
+    assert store.get("missing") is None
+    store.close()
+
+
+def test_run_store_batches_writes(tmp_path):
+    store = RunStore(str(tmp_path / "runs.sqlite"), batch_size=500)
+    store.flush()
+    for i in range(100):
+        store.save_run({"run_id": f"r{i}", "status": "running", "queued_at": f"t{i:03d}"})
+        for _ in range(9):
+            event = {"type": "step_succeeded", "node_id": "n1", "latency_ms": 1}
+            store.record_event(f"r{i}", event)
+            store.record_event(f"r{i}", {"type": "step_started", "node_id": "n1"})
+    store.flush()
+
+    assert len(store.get("r42")["steps"]) == 9
+    assert store.batches_written <= 4
+    assert [r["run_id"] for r in store.list(limit=2)] == ["r99", "r98"]
+    store.close()
@@ -1,8 +1,11 @@
 import asyncio
+import time
+
+import pytest
 
 from core.nodes.input import node_input
 from core.nodes.output import node_output
-from core.runtime.engine import run_flow
+from core.runtime.engine import LATENCIES, StepTimeout, run_flow
 from core.runtime.contracts import NodeContext
 
 
@@ -52,3 +55,188 @@ def test_run_flow_sequential():
         "step_started",
         "step_succeeded",
     ]
+
+
+def diamond_flow():
+    return {
+        "name": "diamond",
+        "mode": "dag",
+        "nodes": [
+            {"id": "n1", "type": "input", "params": {}},
+            {"id": "n2", "type": "slow_add", "params": {"value": 1}},
+            {"id": "n3", "type": "slow_add", "params": {"value": 10}},
+            {"id": "n4", "type": "output", "params": {}},
+        ],
+        "edges": [
+            {"from": "n1", "to": "n2"},
+            {"from": "n1", "to": "n3"},
+            {"from": "n2", "to": "n4"},
+            {"from": "n3", "to": "n4"},
+        ],
+    }
+
+
+async def node_slow_add(ctx: NodeContext):
+    await asyncio.sleep(0.1)
+    return ctx.inputs + ctx.params["value"]
+
+
+def run_diamond(**kwargs):
+    events = []
+    handlers = {"input": node_input, "slow_add": node_slow_add, "output": node_output}
+    start = time.perf_counter()
+    result = asyncio.run(
+        run_flow(diamond_flow(), 0, handlers, emit=events.append, **kwargs)
+    )
+    return result, events, time.perf_counter() - start
+
+
+def test_run_flow_dag_runs_branches_concurrently():
+    result, events, elapsed = run_diamond()
+
+    # The fan-in node receives the outputs of both branches keyed by node id.
+    assert result == {"n2": 1, "n3": 10}
+    assert elapsed < 0.19
+    assert [(e["type"], e["node_id"]) for e in events] == [
+        ("step_started", "n1"),
+        ("step_succeeded", "n1"),
+        ("step_started", "n2"),
+        ("step_started", "n3"),
+        ("step_succeeded", "n2"),
+        ("step_succeeded", "n3"),
+        ("step_started", "n4"),
+        ("step_succeeded", "n4"),
+    ]
+
+
+def test_run_flow_dag_concurrency_cap():
+    result, events, elapsed = run_diamond(max_concurrency=1)
+
+    assert result == {"n2": 1, "n3": 10}
+    assert elapsed >= 0.2
+    assert [(e["type"], e["node_id"]) for e in events][2:6] == [
+        ("step_started", "n2"),
+        ("step_succeeded", "n2"),
+        ("step_started", "n3"),
+        ("step_succeeded", "n3"),
+    ]
+
+
+def test_run_flow_dag_failure_cancels_siblings():
+    cancelled = []
+
+    async def node_fail(ctx: NodeContext):
+        raise RuntimeError("boom")
+
+    async def node_hang(ctx: NodeContext):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(ctx.node_id)
+            raise
+
+    flow = diamond_flow()
+    flow["nodes"][1]["type"] = "fail"
+    flow["nodes"][2]["type"] = "hang"
+    handlers = {"input": node_input, "fail": node_fail, "hang": node_hang}
+    with pytest.raises(RuntimeError):
+        asyncio.run(run_flow(flow, 0, handlers))
+    assert cancelled == ["n3"]
+
+
+def single_node_flow(node_type, **node):
+    return {
+        "name": "single",
+        "nodes": [{"id": "n1", "type": node_type, "params": {}, **node}],
+        "edges": [],
+    }
+
+
+def test_run_flow_enforces_node_timeout_and_run_deadline():
+    budgets = []
+    cancelled = []
+
+    async def node_sleep(ctx: NodeContext):
+        budgets.append(ctx.timeout_ms)
+        try:
+            await asyncio.sleep(ctx.params.get("seconds", ctx.inputs))
+        except asyncio.CancelledError:
+            cancelled.append(ctx.node_id)
+            raise
+        return ctx.inputs
+
+    events = []
+    handlers = {"sleep": node_sleep}
+    with pytest.raises(StepTimeout):
+        asyncio.run(
+            run_flow(single_node_flow("sleep", timeout_ms=20), 5, handlers, emit=events.append)
+        )
+    assert cancelled == ["n1"]
+    assert events[-1]["type"] == "step_timed_out"
+    assert events[-1]["timeout_ms"] == 20
+
+    # The second node only gets what is left of the run deadline.
+    flow = {
+        "name": "chain",
+        "nodes": [
+            {"id": "n1", "type": "sleep", "params": {}},
+            {"id": "n2", "type": "sleep", "params": {}},
+        ],
+        "edges": [{"from": "n1", "to": "n2"}],
+    }
+    budgets.clear()
+    with pytest.raises(StepTimeout):
+        asyncio.run(run_flow(flow, 0.06, handlers, deadline_ms=100))
+    assert 95 <= budgets[0] <= 100 and 30 <= budgets[1] <= 40
+
+
+def test_run_flow_reports_handler_timeouts_as_failures():
+    async def node_upstream_timeout(ctx: NodeContext):
+        raise TimeoutError("upstream took too long")
+
+    events = []
+    with pytest.raises(TimeoutError) as exc:
+        asyncio.run(
+            run_flow(
+                single_node_flow("slow_api", timeout_ms=1000),
+                None,
+                {"slow_api": node_upstream_timeout},
+                emit=events.append,
+            )
+        )
+    assert not isinstance(exc.value, StepTimeout)
+    assert events[-1]["type"] == "step_failed"
+    assert events[-1]["error"] == "upstream took too long"
+
+
+def test_run_flow_hedges_slow_idempotent_nodes():
+    calls = []
+
+    async def node_search(ctx: NodeContext):
+        calls.append(ctx.timeout_ms)
+        # The first attempt is stuck; the hedged one answers right away.
+        await asyncio.sleep(10 if len(calls) == 1 else 0)
+        return len(calls)
+
+    LATENCIES.clear()
+    for _ in range(LATENCIES.min_samples):
+        LATENCIES.observe("rag.retrieve", 20)
+    events = []
+    try:
+        start = time.perf_counter()
+        result = asyncio.run(
+            run_flow(
+                single_node_flow("rag.retrieve"),
+                None,
+                {"rag.retrieve": node_search},
+                emit=events.append,
+                hedge=True,
+            )
+        )
+        elapsed = time.perf_counter() - start
+    finally:
+        LATENCIES.clear()
+
+    assert result == 2 and len(calls) == 2
+    assert elapsed < 1
+    assert events[-1]["type"] == "step_succeeded" and events[-1]["hedged"] is True
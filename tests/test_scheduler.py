@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+from core.runtime.contracts import NodeContext
+from core.runtime.plan import build_plan
+from core.runtime.scheduler import QueueFull, RunScheduler
+
+started = []
+cancelled = []
+
+
+async def node_sleep(ctx: NodeContext):
+    started.append(ctx.run_id)
+    try:
+        await asyncio.sleep(ctx.inputs)
+    except asyncio.CancelledError:
+        cancelled.append(ctx.run_id)
+        raise
+    return ctx.run_id
+
+
+async def node_fail(ctx: NodeContext):
+    raise RuntimeError("boom")
+
+
+PLAN = build_plan(
+    {"nodes": [{"id": "n1", "type": "sleep", "params": {}}], "edges": []},
+    {"sleep": node_sleep},
+)
+
+
+def setup_function():
+    started.clear()
+    cancelled.clear()
+
+
+def test_scheduler_bounds_workers_and_prefers_interactive():
+    async def main():
+        scheduler = RunScheduler(workers=1)
+        scheduler.submit(PLAN, 0.02, run_id="first")
+        scheduler.submit(PLAN, 0, priority="batch", run_id="batch")
+        scheduler.submit(PLAN, 0, run_id="chat")
+        await asyncio.sleep(0)
+        assert scheduler.get("batch").status == "queued"
+        run = await scheduler.wait("batch")
+        await scheduler.aclose()
+        return run
+
+    run = asyncio.run(main())
+    assert started == ["first", "chat", "batch"]
+    assert run.status == "succeeded" and run.outputs == "batch"
+    assert run.started_at is not None and run.ended_at is not None
+
+
+def test_scheduler_sheds_load_per_priority():
+    async def main():
+        scheduler = RunScheduler(workers=1, max_queued={"batch": 2})
+        for i in range(2):
+            scheduler.submit(PLAN, 0, priority="batch")
+        with pytest.raises(QueueFull) as exc:
+            scheduler.submit(PLAN, 0, priority="batch")
+        # Other classes keep their own budget.
+        scheduler.submit(PLAN, 0)
+        stats = scheduler.stats()
+        await scheduler.aclose()
+        return exc.value, stats
+
+    exc, stats = asyncio.run(main())
+    assert str(exc) == "QUEUE_FULL:batch"
+    assert stats["queued"] == {"interactive": 1, "batch": 2}
+    assert stats["shed"] == {"interactive": 0, "batch": 1}
+
+
+def test_scheduler_cancels_queued_and_running_runs():
+    async def main():
+        scheduler = RunScheduler(workers=1)
+        scheduler.submit(PLAN, 10, run_id="slow")
+        scheduler.submit(PLAN, 0, run_id="queued")
+        await asyncio.sleep(0.01)
+        scheduler.cancel("queued")
+        scheduler.cancel("slow")
+        slow = await scheduler.wait("slow")
+        failing = build_plan(
+            {"nodes": [{"id": "n1", "type": "fail", "params": {}}], "edges": []},
+            {"fail": node_fail},
+        )
+        scheduler.submit(failing, None, run_id="failing")
+        failed = await scheduler.wait("failing")
+        await scheduler.aclose()
+        return slow, scheduler.get("queued"), failed
+
+    slow, queued, failed = asyncio.run(main())
+    assert slow.status == "cancelled" and queued.status == "cancelled"
+    assert started == ["slow"] and cancelled == ["slow"]
+    assert failed.status == "failed" and failed.error == "boom"
@@ -0,0 +1,130 @@
+import asyncio
+import os
+import signal
+import time
+
+import numpy as np
+import pytest
+
+from core import vector_store
+from core.vector_store.columnar import ColumnarStore
+
+
+def _chunks(data):
+    return [
+        {"id": f"c{i}", "text": f"chunk {i}", "embedding": e.tolist(), "metadata": {"part": i % 3}}
+        for i, e in enumerate(data)
+    ]
+
+
+@pytest.fixture
+def sharded():
+    names = []
+
+    def create(name, **options):
+        asyncio.run(vector_store.create_index_if_not_exists(name, **options))
+        names.append(name)
+        return vector_store.get_index(name)
+
+    yield create
+    for name in names:
+        vector_store.get_index(name).close()
+        del vector_store.INDEXES[name]
+
+
+def test_sharded_query_matches_single_store(sharded):
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=(600, 8))
+    chunks = _chunks(data)
+    store = sharded("sharded", shards=3)
+    asyncio.run(vector_store.upsert(chunks, index_name="sharded"))
+    asyncio.run(vector_store.upsert(chunks[:5], index_name="sharded"))
+    assert len(store) == 600
+    assert all(s["rows"] > 0 for s in asyncio.run(store.shard_stats()).values())
+
+    single = ColumnarStore()
+    single.add(
+        [c["id"] for c in chunks],
+        [c["text"] for c in chunks],
+        [c["metadata"] for c in chunks],
+        data,
+    )
+    queries = rng.normal(size=(5, 8))
+    for filters in (None, {"part": 1}):
+        for q in queries:
+            expected = [chunks[row]["text"] for row, _ in single.search(q, 10, filters=filters)]
+            result = asyncio.run(
+                vector_store.query(q.tolist(), 10, filters, index_name="sharded")
+            )
+            assert [r["text"] for r in result] == expected
+        batched = asyncio.run(
+            vector_store.query_many(queries.tolist(), 10, filters, index_name="sharded")
+        )
+        assert [[r["text"] for r in hits] for hits in batched] == [
+            [chunks[row]["text"] for row, _ in single.search(q, 10, filters=filters)]
+            for q in queries
+        ]
+    lexical = asyncio.run(
+        vector_store.query(None, 1, text="chunk 42", mode="lexical", index_name="sharded")
+    )
+    assert lexical[0]["text"] == "chunk 42"
+
+    # Hybrid fuses global rankings, so it matches the single store's fusion
+    # (up to the order of tied chunks).
+    vector_store.INDEXES["single"] = single
+    try:
+        for q in queries:
+            hybrid = [
+                sorted(
+                    (-round(r["score"], 9), r["text"])
+                    for r in asyncio.run(
+                        vector_store.query(
+                            q.tolist(), 5, text="42", mode="hybrid", index_name=name
+                        )
+                    )
+                )
+                for name in ("sharded", "single")
+            ]
+            assert hybrid[0] == hybrid[1]
+            assert "chunk 42" in [text for _, text in hybrid[0]]
+    finally:
+        del vector_store.INDEXES["single"]
+
+
+def test_sharded_query_survives_a_shard_crash(sharded, tmp_path):
+    rng = np.random.default_rng(1)
+    chunks = _chunks(rng.normal(size=(300, 4)))
+    store = sharded("durable", shards=3, path=str(tmp_path))
+    asyncio.run(vector_store.upsert(chunks, index_name="durable"))
+
+    os.kill(store._shards[0].proc.pid, signal.SIGKILL)
+    result = asyncio.run(vector_store.query([0.0] * 4, 300, index_name="durable"))
+    assert 0 < len(result) < 300
+    assert store.stats()["partial"] == 1
+    with pytest.raises(RuntimeError, match="SHARD_UNAVAILABLE"):
+        asyncio.run(vector_store.upsert(chunks[:30], index_name="durable"))
+
+    # The replacement reloads its partition from the shard's snapshot.
+    deadline = time.monotonic() + 60
+    while store.stats()["restarts"] == 0 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert store.stats()["live_shards"] == 3 and store.stats()["lost_rows"] == 0
+    result = asyncio.run(vector_store.query([0.0] * 4, 300, index_name="durable"))
+    assert len(result) == 300
+
+
+def test_sharded_store_never_reads_a_late_reply(sharded):
+    rng = np.random.default_rng(2)
+    chunks = _chunks(rng.normal(size=(600, 8)))
+    store = sharded("slow", shards=1)
+    asyncio.run(vector_store.upsert(chunks, index_name="slow"))
+    shard = store._shards[0]
+
+    queries = rng.normal(size=(2000, 8)).astype(np.float32)
+    with pytest.raises(TimeoutError):
+        shard.call("search_many", (queries, 10, None, None, None), 0)
+    time.sleep(0.5)
+    # The reply to the timed-out request is still in the pipe; it must not
+    # be taken as the answer to this one.
+    with pytest.raises(EOFError):
+        shard.call("len", (), 5)
@@ -0,0 +1,45 @@
+import sqlite3
+import threading
+
+from core.sqlite_writer import SQLiteWriter
+
+
+def test_sqlite_writer_serves_pending_entries_until_committed(tmp_path):
+    path = str(tmp_path / "kv.sqlite")
+    gate = threading.Event()
+
+    def write(connection, writes):
+        gate.wait(5)
+        connection.executemany("INSERT OR REPLACE INTO kv VALUES (?, ?)", writes)
+
+    writer = SQLiteWriter(path, write, schema="CREATE TABLE kv (k TEXT PRIMARY KEY, v TEXT);")
+    try:
+        writer.put(("a", "1"), {"a": "1"})
+        writer.put(("a", "2"), {"a": "2"})
+        assert writer.pending("a") == "2"
+        gate.set()
+        assert writer.flush(5)
+        assert writer.pending("a") is None
+        assert writer.batches_written >= 1 and writer.failed_batches == 0
+    finally:
+        writer.close()
+    assert sqlite3.connect(path).execute("SELECT v FROM kv").fetchall() == [("2",)]
+
+
+def test_sqlite_writer_keeps_draining_after_a_failed_batch(tmp_path):
+    def write(connection, writes):
+        connection.executemany("INSERT INTO kv VALUES (?, ?)", writes)
+
+    writer = SQLiteWriter(
+        str(tmp_path / "kv.sqlite"), write, schema="CREATE TABLE kv (k TEXT PRIMARY KEY, v TEXT);"
+    )
+    try:
+        writer.put(("a", "1"))
+        writer.flush(5)
+        writer.put(("a", "duplicate"))
+        writer.flush(5)
+        writer.put(("b", "2"))
+        assert writer.flush(5)
+        assert writer.failed_batches == 1 and writer.batches_written == 2
+    finally:
+        writer.close()
@@ -0,0 +1,110 @@
+import asyncio
+import json
+
+import pytest
+
+from core import tracing
+from core.runtime.contracts import NodeContext
+from core.runtime.engine import run_flow
+
+
+async def node_work(ctx: NodeContext):
+    with ctx.span("work.inner", size=3) as span:
+        await asyncio.sleep(0.01)
+        span.set(done=True)
+    return ctx.inputs
+
+
+async def node_fail(ctx: NodeContext):
+    with ctx.span("work.inner"):
+        raise RuntimeError("boom")
+
+
+FAN_OUT = {
+    "nodes": [
+        {"id": "a", "type": "work", "params": {}},
+        {"id": "b", "type": "work", "params": {}},
+        {"id": "c", "type": "work", "params": {}},
+    ],
+    "edges": [{"from": "a", "to": "b"}, {"from": "a", "to": "c"}],
+}
+
+
+def _spans(trace):
+    return {s.name: s for s in trace.finished()}
+
+
+def test_traced_run_nests_spans():
+    tracing.clear()
+    asyncio.run(run_flow(FAN_OUT, 1, {"work": node_work}, run_id="r1", trace=True))
+
+    trace = tracing.get_trace("r1")
+    spans = trace.finished()
+    by_id = {s.span_id: s for s in spans}
+    root = next(s for s in spans if s.name == "run")
+    steps = [s for s in spans if s.name.startswith("step:")]
+    inner = [s for s in spans if s.name == "work.inner"]
+
+    assert root.parent_id is None
+    assert sorted(s.name for s in steps) == ["step:a", "step:b", "step:c"]
+    assert all(s.parent_id == root.span_id for s in steps)
+    assert len(inner) == 3
+    for s in inner:
+        parent = by_id[s.parent_id]
+        assert parent.name.startswith("step:")
+        assert parent.start_ns <= s.start_ns <= s.end_ns <= parent.end_ns
+        assert s.attributes == {"size": 3, "done": True}
+
+
+def test_chrome_export_puts_overlapping_branches_on_separate_rows():
+    tracing.clear()
+    asyncio.run(run_flow(FAN_OUT, 1, {"work": node_work}, run_id="r2", trace=True))
+
+    events = tracing.to_chrome(tracing.get_trace("r2"))["traceEvents"]
+    assert {e["ph"] for e in events} == {"X"}
+    step_rows = {e["name"]: e["tid"] for e in events if e["name"].startswith("step:")}
+    assert step_rows["step:b"] != step_rows["step:c"]
+    # Events sharing a row never partially overlap.
+    for row in {e["tid"] for e in events}:
+        same = sorted((e for e in events if e["tid"] == row), key=lambda e: e["ts"])
+        for x, y in zip(same, same[1:]):
+            x_end = x["ts"] + x["dur"]
+            assert y["ts"] >= x_end or y["ts"] + y["dur"] <= x_end
+
+
+def test_otlp_export_records_parents_and_errors():
+    tracing.clear()
+    with pytest.raises(RuntimeError):
+        asyncio.run(run_flow(FAN_OUT, 1, {"work": node_fail}, run_id="r3", trace=True))
+
+    doc = tracing.to_otlp(tracing.get_trace("r3"))
+    spans = doc["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    ids = {s["spanId"] for s in spans}
+    assert all(s.get("parentSpanId") in ids for s in spans if s["name"] != "run")
+    inner = next(s for s in spans if s["name"] == "work.inner")
+    assert inner["status"] == {"code": 2, "message": "boom"}
+    assert int(inner["endTimeUnixNano"]) >= int(inner["startTimeUnixNano"])
+
+
+def test_untraced_runs_record_nothing():
+    tracing.clear()
+    tracing.configure(0.0)
+    asyncio.run(run_flow(FAN_OUT, 1, {"work": node_work}, run_id="r4"))
+
+    assert tracing.get_trace("r4") is None
+    assert tracing.span("anything") is tracing.NOOP_SPAN
+
+
+def test_sampled_traces_are_written_to_the_directory(tmp_path):
+    tracing.configure(1.0, directory=str(tmp_path), format="otlp")
+    try:
+        asyncio.run(run_flow(FAN_OUT, 1, {"work": node_work}, run_id="r5"))
+        # The file is written by the background writer.
+        assert tracing.flush(5)
+    finally:
+        tracing.configure(0.0)
+
+    doc = json.loads((tmp_path / "r5.otlp.json").read_text())
+    assert doc["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    with pytest.raises(ValueError, match="UNKNOWN_TRACE_FORMAT"):
+        tracing.configure(1.0, format="xml")
@@ -26,6 +26,8 @@ def test_validate_and_repair_defaults():
         "model": "gpt-4o-mini",
         "system": "Answer concisely.",
         "temperature": 0.2,
+        "stream": False,
+        "cache": False,
     }
 
 
@@ -45,3 +47,113 @@ def test_validate_and_repair_errors(mutator, code):
     with pytest.raises(ValueError) as exc:
         validate_and_repair(flow, NODE_CATALOG)
     assert code in str(exc.value)
+
+
+def build_dag_flow():
+    flow = build_flow()
+    flow["mode"] = "dag"
+    flow["nodes"].insert(2, {"id": "n4", "type": "rag.retrieve", "params": {}})
+    flow["edges"] += [{"from": "n1", "to": "n4"}, {"from": "n4", "to": "n3"}]
+    return flow
+
+
+def test_validate_and_repair_dag_mode():
+    repaired = validate_and_repair(build_dag_flow(), NODE_CATALOG)
+    assert repaired["nodes"][2]["params"]["top_k"] == 5
+
+
+@pytest.mark.parametrize(
+    "mutator,code",
+    [
+        (lambda f: f.update({"mode": "tree"}), "UNKNOWN_MODE"),
+        (lambda f: f["edges"].append({"from": "n3", "to": "n1"}), "CYCLE_DETECTED"),
+        (lambda f: f["edges"].pop(2), "UNREACHABLE_NODE"),
+        (lambda f: f["edges"].pop(), "DEAD_END_NODE"),
+    ],
+)
+def test_validate_and_repair_dag_errors(mutator, code):
+    flow = build_dag_flow()
+    mutator(flow)
+    with pytest.raises(ValueError) as exc:
+        validate_and_repair(flow, NODE_CATALOG)
+    assert code in str(exc.value)
+
+
+@pytest.mark.parametrize(
+    "node_type", ["input", "rag.retrieve", "llm.chat", "http.request", "code.exec", "output"]
+)
+@pytest.mark.parametrize(
+    "params",
+    [
+        {},
+        {"top_k": 0},
+        {"top_k": 60, "filters": {"source": "a"}},
+        {"top_k": "5"},
+        {"model": 1},
+        {"temperature": 3, "stream": True},
+        {"temperature": -1},
+        {"cache": "yes"},
+        {"unknown": 1},
+        {"top_k": 3, "mode": "fuzzy"},
+        {"url": "", "method": "GET"},
+        {"url": "http://x", "method": "DELETE"},
+        {"language": "python", "code": ""},
+        {"language": "ruby", "code": "1"},
+        [],
+    ],
+)
+def test_compiled_validators_match_schema(node_type, params):
+    from core.validation import _apply_defaults_and_validate, compile_catalog
+
+    schema = NODE_CATALOG["nodes"][node_type]["schema"]
+    validator = compile_catalog(NODE_CATALOG)[node_type]
+
+    def outcome(fn):
+        try:
+            return fn(params, schema) if fn is _apply_defaults_and_validate else fn(params)
+        except ValueError as exc:
+            # The interpreter reports an arbitrary one of several unknown names.
+            return str(exc).split(":")[0] if "UNKNOWN_PARAM" in str(exc) else str(exc)
+
+    assert outcome(validator) == outcome(_apply_defaults_and_validate)
+
+
+def test_compiled_validators_enforce_enum_and_min_length():
+    from core.validation import compile_schema
+
+    validate = compile_schema(
+        {
+            "properties": {
+                "name": {"type": "string", "minLength": 2},
+                "color": {"type": "string", "enum": ["red", "blue"], "default": "red"},
+            }
+        }
+    )
+    assert validate({"name": "ab"}) == {"name": "ab", "color": "red"}
+    with pytest.raises(ValueError, match="MIN_LENGTH:name"):
+        validate({"name": "a"})
+    with pytest.raises(ValueError, match="INVALID_ENUM:color"):
+        validate({"name": "ab", "color": "green"})
+    with pytest.raises(ValueError, match="UNSUPPORTED_SCHEMA_KEYWORD:name.pattern"):
+        compile_schema({"properties": {"name": {"type": "string", "pattern": "^a"}}})
+
+
+def test_validate_many_reports_all_errors():
+    from core.validation import validate_many
+
+    good = build_flow()
+    bad = build_flow()
+    bad["nodes"].append({"id": "n2", "type": "output", "params": {}})
+    bad["nodes"][1]["params"] = {"temperature": 5}
+    bad["edges"].append({"from": "n3", "to": "n9"})
+
+    results = validate_many([good, bad, "nope"], NODE_CATALOG)
+
+    assert results[0] == {"valid": True, "flow": good, "errors": []}
+    assert results[1]["valid"] is False and results[1]["flow"] is None
+    assert results[1]["errors"] == [
+        {"code": "DUPLICATE_NODE_ID", "node_id": "n2"},
+        {"code": "EDGE_REF_INVALID", "edge": 2},
+        {"code": "MAX_EXCEEDED:temperature", "node_id": "n2"},
+    ]
+    assert results[2]["errors"] == [{"code": "FLOW_NOT_OBJECT"}]
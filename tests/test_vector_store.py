@@ -0,0 +1,376 @@
+import asyncio
+import json
+import math
+import random
+
+import numpy as np
+import pytest
+
+from core import vector_store
+from core.vector_store.columnar import ColumnarStore
+from core.vector_store.lexical import LexicalIndex, reciprocal_rank_fusion, tokenize
+from core.vector_store.quantization import ProductQuantizer
+from core.vector_store.segments import Snapshot
+from fake_litellm import FakeLiteLLM, fake_embedding
+
+
+def setup_function():
+    vector_store.VECTOR_DB.clear()
+
+
+def test_query_matches_bruteforce_ranking():
+    rng = random.Random(0)
+    chunks = [
+        {"id": f"c{i}", "text": f"t{i}", "embedding": [rng.uniform(-1, 1) for _ in range(8)]}
+        for i in range(500)
+    ]
+    asyncio.run(vector_store.upsert(chunks))
+    q = [rng.uniform(-1, 1) for _ in range(8)]
+
+    def score(c):
+        return 1.0 / (1.0 + math.dist(q, c["embedding"]))
+
+    expected = sorted(chunks, key=score, reverse=True)[:10]
+    result = asyncio.run(vector_store.query(q, top_k=10))
+    assert [r["text"] for r in result] == [c["text"] for c in expected]
+    assert [r["score"] for r in result] == pytest.approx([score(c) for c in expected], rel=1e-5)
+
+
+def test_search_many_matches_single_queries():
+    rng = np.random.default_rng(1)
+    for metric in ("euclidean", "cosine"):
+        store = ColumnarStore(metric=metric)
+        data = rng.normal(size=(300, 8))
+        store.add(
+            [f"c{i}" for i in range(300)],
+            [f"t{i}" for i in range(300)],
+            [{"part": i % 3} for i in range(300)],
+            data,
+        )
+        queries = rng.normal(size=(7, 8))
+        for filters in (None, {"part": 1}, {"part": [0, 1]}):
+            expected = [store.search(q, 5, filters=filters) for q in queries]
+            assert store.search_many(queries, 5, filters=filters) == expected
+
+
+def test_upsert_same_id_overwrites_row():
+    asyncio.run(vector_store.upsert([{"id": "c1", "text": "old", "embedding": [0.0]}]))
+    asyncio.run(vector_store.upsert([{"id": "c1", "text": "new", "embedding": [1.0]}]))
+    assert len(vector_store.VECTOR_DB) == 1
+    result = asyncio.run(vector_store.query([1.0], top_k=5))
+    assert result == [{"text": "new", "meta": {}, "score": 1.0}]
+
+
+def test_cosine_metric_and_dim_mismatch():
+    store = ColumnarStore(metric="cosine")
+    store.add(["a", "b"], ["a", "b"], [{}, {}], [[1.0, 0.0], [0.0, 2.0]])
+    assert store.search([0.0, 5.0], 1) == [(1, pytest.approx(1.0))]
+    with pytest.raises(ValueError, match="EMBEDDING_DIM_MISMATCH"):
+        store.add(["c"], ["c"], [{}], [[1.0, 2.0, 3.0]])
+
+
+def _upsert(chunks, index_name):
+    asyncio.run(vector_store.upsert(chunks, index_name=index_name))
+
+
+def test_ivf_index_recall_and_incremental_insert():
+    rng = np.random.default_rng(0)
+    centers = rng.normal(scale=10, size=(16, 16))
+    data = centers[rng.integers(0, 16, size=4000)] + rng.normal(size=(4000, 16))
+    chunks = [{"id": f"c{i}", "embedding": e.tolist()} for i, e in enumerate(data)]
+    asyncio.run(
+        vector_store.create_index_if_not_exists(
+            "ivf_test", ann="ivf", nlist=16, nprobe=4, train_size=2000
+        )
+    )
+    store = vector_store.get_index("ivf_test")
+    try:
+        _upsert(chunks[:2000], "ivf_test")
+        assert store.ann.trained
+        _upsert(chunks[2000:], "ivf_test")
+        assert sum(len(m) for m in store.ann._members) == 4000
+
+        queries = data[:50]
+        assert store.ann.recall(queries, top_k=10, nprobe=16) == 1.0
+        assert store.ann.recall(queries, top_k=10) >= 0.9
+        assert len(store.ann.candidates(data[0].astype(np.float32), nprobe=1)) < 4000
+    finally:
+        del vector_store.INDEXES["ivf_test"]
+
+
+def test_query_filters_prune_rows_before_scoring():
+    chunks = [
+        {
+            "id": f"c{i}",
+            "text": f"t{i}",
+            "embedding": [float(i)],
+            "metadata": {"source": f"doc{i % 3}", "page": i, "acl": [f"group:{i % 2}"]},
+        }
+        for i in range(30)
+    ]
+    asyncio.run(vector_store.upsert(chunks))
+
+    def texts(filters, top_k=3):
+        return [r["text"] for r in asyncio.run(vector_store.query([0.0], top_k, filters))]
+
+    assert texts({"source": "doc1"}) == ["t1", "t4", "t7"]
+    assert texts({"source": ["doc1", "doc2"]}) == ["t1", "t2", "t4"]
+    assert texts({"page": {"$gte": 10, "$lt": 12}}) == ["t10", "t11"]
+    assert texts({"acl": {"$in": ["group:1"]}, "source": {"$eq": "doc0"}}) == ["t3", "t9", "t15"]
+    assert texts({"source": "missing"}) == []
+
+    # Overwriting a chunk moves it between postings.
+    asyncio.run(vector_store.upsert([{"id": "c1", "text": "t1", "embedding": [1.0]}]))
+    assert texts({"source": "doc1"}) == ["t4", "t7", "t10"]
+    with pytest.raises(ValueError, match="UNKNOWN_FILTER_OP"):
+        texts({"page": {"$regex": "x"}})
+
+
+def test_snapshot_roundtrip_appends_segments(tmp_path):
+    path = tmp_path / "snap"
+    asyncio.run(
+        vector_store.upsert(
+            [{"id": "c1", "text": "hello", "embedding": [1.0, 0.0], "metadata": {"page": 1}}]
+        )
+    )
+    asyncio.run(vector_store.open_snapshot(str(path)))
+    reader = ColumnarStore()
+    reader.attach(Snapshot(path))
+    reader.lexical = LexicalIndex(reader)
+    reader.lexical.add(reader.live_rows())
+    asyncio.run(
+        vector_store.upsert(
+            [
+                {"id": "c2", "text": "สวัสดี", "embedding": [0.0, 1.0], "metadata": {"page": 2}},
+                {"id": "c1", "text": "hello again", "embedding": [1.0, 0.1], "metadata": {"page": 3}},
+            ]
+        )
+    )
+    # The overwrite is appended and the old row tombstoned; nothing committed
+    # is rewritten, so a reader that has not refreshed still sees the old row.
+    manifest = json.loads((path / "manifest.json").read_text())
+    assert manifest["rows"] == 3 and manifest["tombstones"] == 1
+    assert [s["rows"] for s in manifest["segments"]] == [1, 2]
+    assert [c["text"] for c in reader] == ["hello"]
+    assert reader.search([1.0, 0.0], 1) == [(0, 1.0)]
+
+    # A fresh store maps the same files without re-embedding anything.
+    store = ColumnarStore()
+    store.attach(Snapshot(path))
+    assert isinstance(store.embeddings, np.memmap)
+    assert len(store) == 2
+    assert [c["text"] for c in store] == ["สวัสดี", "hello again"]
+    assert store.search([1.0, 0.1], 1, filters={"page": {"$gte": 3}}) == [(2, 1.0)]
+    assert [row for row, _ in store.search([1.0, 0.0], 3)] == [2, 1]
+    asyncio.run(vector_store.upsert([{"id": "c3", "text": "x", "embedding": [5.0, 5.0]}]))
+    store.refresh()
+    assert len(store) == 3
+
+    # Refreshing picks up the tombstone in every structure of the reader.
+    reader.refresh()
+    assert len(reader) == 3
+    assert [row for row, _ in reader.search([1.0, 0.0], 5)] == [2, 1, 3]
+    assert reader.search([1.0, 0.0], 5, filters={"page": 1}) == []
+    assert [row for row, _ in reader.search_text("hello", 5)] == [2]
+    assert reader.lexical.stats()["docs"] == 3
+
+
+def test_gateway_embeddings_are_batched():
+    with FakeLiteLLM() as fake:
+        vector_store.configure_embeddings(fake.url + "/v1/embeddings", max_wait_ms=20)
+        try:
+            chunks = [{"id": f"c{i}", "text": f"chunk {i}"} for i in range(10)]
+            asyncio.run(vector_store.upsert(chunks))
+
+            async def many_queries():
+                return await asyncio.gather(
+                    *(vector_store.embed(t) for t in ["a", "b", "a", "chunk 3"])
+                )
+
+            embeddings = asyncio.run(many_queries())
+        finally:
+            vector_store.configure_embeddings(None)
+
+    assert [len(body["input"]) for _, body in fake.requests] == [10, 3]
+    assert embeddings[0] == embeddings[2] == fake_embedding("a")
+    result = asyncio.run(vector_store.query(embeddings[3], top_k=1))
+    assert result[0]["text"] == "chunk 3"
+
+
+def test_embedding_cache_tiers_and_model_invalidation(tmp_path):
+    db = str(tmp_path / "emb.sqlite")
+    with FakeLiteLLM() as fake:
+        vector_store.configure_embeddings(fake.url + "/v1/embeddings", model="m1")
+        cache = vector_store.configure_embedding_cache(2, path=db)
+        try:
+            asyncio.run(vector_store.embed_many(["a", "b", "c"]))
+            # "a" fell out of memory but is served from SQLite; spacing is normalized.
+            assert asyncio.run(vector_store.embed_many([" a ", "c"])) == [
+                pytest.approx(fake_embedding("a")),
+                pytest.approx(fake_embedding("c")),
+            ]
+            assert asyncio.run(vector_store.embed("b")) == pytest.approx(fake_embedding("b"))
+            assert len(fake.requests) == 1
+            assert cache.stats()["disk_hits"] == 2 and cache.stats()["evictions"] == 3
+
+            # Writes are committed off the caller; a fresh cache reads them back.
+            assert cache.flush(10)
+            cache = vector_store.configure_embedding_cache(2, path=db)
+            assert asyncio.run(vector_store.embed_many(["a", "b", "c"])) == [
+                pytest.approx(fake_embedding(t)) for t in "abc"
+            ]
+            assert len(fake.requests) == 1 and cache.stats()["disk_hits"] == 3
+
+            vector_store.configure_embeddings(fake.url + "/v1/embeddings", model="m2")
+            asyncio.run(vector_store.embed("a"))
+            assert len(fake.requests) == 2
+        finally:
+            vector_store.configure_embedding_cache(None)
+            vector_store.configure_embeddings(None)
+
+
+def test_tokenize_codes_and_thai():
+    assert tokenize("Policy POL-2023-0017") == ["policy", "pol-2023-0017", "pol", "2023", "0017"]
+    assert tokenize("ＦＯＲＭ A1") == ["form", "a1"]
+    # Thai runs become overlapping bigrams, so any segmentation still matches.
+    assert tokenize("ประกัน") == ["ปร", "ระ", "ะก", "กั", "ัน"]
+    assert set(tokenize("กัน")) <= set(tokenize("ประกันภัย"))
+
+
+def _bm25(docs, query, k1=1.2, b=0.75):
+    tokenized = [tokenize(d) for d in docs]
+    avg = sum(map(len, tokenized)) / len(tokenized)
+    scores = {}
+    for term in set(tokenize(query)):
+        df = sum(term in t for t in tokenized)
+        if not df:
+            continue
+        idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+        for row, t in enumerate(tokenized):
+            tf = t.count(term)
+            if tf:
+                norm = tf + k1 * (1 - b + b * len(t) / avg)
+                scores[row] = scores.get(row, 0.0) + idf * tf * (k1 + 1) / norm
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+
+def test_lexical_search_matches_bm25_reference():
+    rng = random.Random(3)
+    words = [f"w{i}" for i in range(40)]
+    docs = [" ".join(rng.choices(words, k=rng.randint(3, 30))) for i in range(700)]
+    store = ColumnarStore()
+    store.lexical = LexicalIndex(store)
+    store.add([f"c{i}" for i in range(700)], docs, [{} for _ in docs], [[0.0]] * 700)
+    # Overwrites move rows between compressed blocks.
+    docs[5] = docs[600] = "w1 w1 w2 rare"
+    store.add(["c5", "c600"], [docs[5], docs[600]], [{}, {}], [[0.0], [0.0]])
+
+    for query in ("w1 w2 w3", "w7", "rare w39 w1", "w0 w1 w2 w3 w4 w5 w6"):
+        expected = _bm25(docs, query)[:10]
+        result = store.search_text(query, 10)
+        assert [row for row, _ in result] == [row for row, _ in expected]
+        assert [score for _, score in result] == pytest.approx(
+            [score for _, score in expected], rel=1e-4
+        )
+    assert store.search_text("missing", 5) == []
+    assert store.lexical.stats()["docs"] == 700
+
+    store.clear()
+    store.add([None] * 5000, ["w1 w2"] * 5000, [{}] * 5000, [[0.0]] * 5000)
+    stats = store.lexical.stats()
+    assert stats["postings"] == 10000 and stats["bytes_per_posting"] < 3
+
+
+def test_query_modes_find_exact_codes():
+    chunks = [
+        {"id": f"c{i}", "text": f"claim form {i} for policy POL-{1000 + i}", "embedding": [i / 10]}
+        for i in range(50)
+    ]
+    chunks.append({"id": "th", "text": "เงื่อนไขกรมธรรม์ประกันภัย", "embedding": [9.0]})
+    asyncio.run(vector_store.upsert(chunks))
+
+    def texts(mode, text, embedding=None, **kwargs):
+        result = asyncio.run(
+            vector_store.query(embedding, 3, text=text, mode=mode, **kwargs)
+        )
+        return [r["text"] for r in result]
+
+    assert texts("lexical", "POL-1042")[0] == chunks[42]["text"]
+    assert texts("lexical", "กรมธรรม์") == [chunks[-1]["text"]]
+    # Fusion lifts the exact code above the vector ranking's favourite.
+    assert texts("vector", None, [4.4])[0] == chunks[44]["text"]
+    assert texts("hybrid", "POL-1042", [4.4], candidates=10)[0] == chunks[42]["text"]
+    # The shortlist (at least top_k rows) is re-ranked by vector similarity.
+    assert texts("shortlist", "POL-1042 POL-1007", [0.0], candidates=2) == [
+        chunks[0]["text"],
+        chunks[7]["text"],
+        chunks[42]["text"],
+    ]
+    assert texts("lexical", "policy", filters={"id": "none"}) == []
+    with pytest.raises(ValueError, match="QUERY_TEXT_REQUIRED"):
+        texts("hybrid", None, [0.0])
+    with pytest.raises(ValueError, match="UNKNOWN_QUERY_MODE"):
+        texts("fuzzy", "x")
+    assert reciprocal_rank_fusion([[1, 2], [2, 3]], k=1) == [
+        (2, pytest.approx(1 / 2 + 1 / 3)),
+        (1, 0.5),
+        (3, pytest.approx(1 / 3)),
+    ]
+
+
+def test_quantized_indexes_rerank_to_exact_results():
+    rng = np.random.default_rng(2)
+    centers = rng.normal(scale=10, size=(16, 16))
+    data = centers[rng.integers(0, 16, size=3000)] + rng.normal(size=(3000, 16))
+    chunks = [{"id": f"c{i}", "embedding": e.tolist()} for i, e in enumerate(data)]
+    queries = data[:30] + rng.normal(scale=0.1, size=(30, 16))
+    try:
+        for name, options in (
+            ("q_int8", {"quantization": "int8"}),
+            ("q_pq", {"quantization": "pq", "pq_m": 8}),
+        ):
+            asyncio.run(
+                vector_store.create_index_if_not_exists(
+                    name, train_size=1000, rerank=10, **options
+                )
+            )
+            _upsert(chunks[:1500], name)
+            store = vector_store.get_index(name)
+            assert store.quantizer.trained
+            _upsert(chunks[1500:], name)
+
+            stats = vector_store.index_stats(name)
+            assert stats["rows"] == 3000 and stats["quantizer"]["float_bytes_per_chunk"] == 64
+            assert stats["vector_bytes_per_chunk"] == (20 if name == "q_int8" else 8)
+            assert store.quantizer.recall(queries, top_k=5) >= 0.95
+            # Without re-ranking the scores are approximations of the exact ones.
+            exact = store.search(queries[0], 5, exact=True)
+            approx = store.search(queries[0], 5, rerank=0)
+            assert approx[0][0] == exact[0][0]
+            assert approx[0][1] == pytest.approx(exact[0][1], rel=0.1 if name == "q_int8" else 0.3)
+            result = asyncio.run(vector_store.query(queries[0].tolist(), 5, index_name=name))
+            assert [r["score"] for r in result] == pytest.approx([s for _, s in exact])
+    finally:
+        vector_store.INDEXES.pop("q_int8", None)
+        vector_store.INDEXES.pop("q_pq", None)
+
+    # An indivisible dimension fails the first insert, before any row is written.
+    store = ColumnarStore()
+    store.quantizer = ProductQuantizer(store, m=3, train_size=10)
+    with pytest.raises(ValueError, match="PQ_DIM_NOT_DIVISIBLE"):
+        store.add([None] * 10, [""] * 10, [{}] * 10, np.ones((10, 4)))
+    assert len(store) == 0 and store.dim is None
+    store.add([None] * 10, [""] * 10, [{}] * 10, np.ones((10, 6)))
+    assert store.quantizer.trained
+    vector_store.INDEXES["q_dim"] = ColumnarStore()
+    try:
+        vector_store.INDEXES["q_dim"].add(["a"], [""], [{}], np.ones((1, 12)))
+        with pytest.raises(ValueError, match="PQ_DIM_NOT_DIVISIBLE:12"):
+            asyncio.run(
+                vector_store.create_index_if_not_exists("q_dim", quantization="pq", pq_m=8)
+            )
+        assert vector_store.INDEXES["q_dim"].quantizer is None
+    finally:
+        del vector_store.INDEXES["q_dim"]
+    with pytest.raises(ValueError, match="UNKNOWN_QUANTIZATION"):
+        asyncio.run(vector_store.create_index_if_not_exists("q_x", quantization="fp4"))
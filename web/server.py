@@ -1,15 +1,67 @@
+import json
+import os
+from contextlib import asynccontextmanager
 from pathlib import Path
+from typing import Optional
 
-from fastapi import FastAPI
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import HTMLResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 
-from core.validation import validate_and_repair
+from core import http_cache, llm_cache, sandbox, tracing, vector_store
+from core.metrics import METRICS, cache_collector
 from core.node_catalog import NODE_CATALOG
-from core.nodes import NODE_HANDLERS
+from core.nodes import BATCH_HANDLERS, NODE_HANDLERS, enable_code_exec
+from core.runtime.batch import InvalidInput, run_batch
 from core.runtime.engine import run_flow
+from core.runtime.plan import PLAN_CACHE
+from core.runtime.run_store import RunStore
+from core.runtime.scheduler import QueueFull, RunScheduler
+from core.validation import validate_and_repair
+
+# SQLite file holding the run history.
+RUN_STORE_PATH = os.environ.get("RUN_STORE_PATH", "runs.sqlite")
+
+# Fraction of runs traced, and where finished traces are written.
+tracing.configure(
+    float(os.environ.get("TRACE_SAMPLE_RATE", "0")),
+    directory=os.environ.get("TRACE_DIR") or None,
+    format=os.environ.get("TRACE_FORMAT", "chrome"),
+)
+
+# code.exec runs caller-supplied Python; it stays unregistered unless enabled.
+if os.environ.get("CODE_EXEC_ENABLED", "").lower() in ("1", "true", "yes"):
+    enable_code_exec()
+
+SCHEDULER = RunScheduler()
+
+# Cache statistics are read at scrape time; the lambdas pick up caches
+# replaced by ``configure_*``.
+METRICS.register_collector(cache_collector("plan", PLAN_CACHE.stats))
+METRICS.register_collector(
+    cache_collector("completion", lambda: llm_cache.COMPLETION_CACHE.stats())
+)
+METRICS.register_collector(cache_collector("http", lambda: http_cache.HTTP_CACHE.stats()))
+METRICS.register_collector(
+    cache_collector(
+        "embedding",
+        lambda: vector_store.EMBEDDING_CACHE and vector_store.EMBEDDING_CACHE.stats(),
+    )
+)
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    SCHEDULER.store = RunStore(RUN_STORE_PATH)
+    yield
+    await SCHEDULER.aclose()
+    SCHEDULER.store.close()
+    sandbox.shutdown()
+    vector_store.shutdown()
+    tracing.flush(5)
+
+
+app = FastAPI(lifespan=lifespan)
 
 BASE_DIR = Path(__file__).resolve().parent
 INDEX_PATH = BASE_DIR / "index.html"
@@ -23,18 +75,215 @@ def index() -> HTMLResponse:
     return HTMLResponse(INDEX_PATH.read_text())
 
 
+@app.get("/metrics")
+def metrics() -> PlainTextResponse:
+    """Prometheus scrape endpoint."""
+
+    return PlainTextResponse(METRICS.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.post("/api/validate")
 async def api_validate(flow: dict):
+    """Check ``flow`` against the node catalog, whether or not it can run here.
+
+    Handler registration (e.g. ``code.exec`` without ``CODE_EXEC_ENABLED``)
+    is only checked when a flow is run.
+    """
+
     try:
         repaired = validate_and_repair(flow, NODE_CATALOG)
-    except Exception as exc:  # pragma: no cover - simple error path
+    except ValueError as exc:
         return {"valid": False, "error": str(exc)}
     return {"valid": True, "flow": repaired}
 
 
 @app.post("/api/run")
 async def api_run(payload: dict):
-    flow = payload["flow"]
-    inputs = payload.get("inputs")
-    result = await run_flow(flow, inputs, NODE_HANDLERS)
+    try:
+        plan = PLAN_CACHE.get(payload["flow"], NODE_CATALOG, NODE_HANDLERS)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    result = await run_flow(plan, payload.get("inputs"), NODE_HANDLERS)
     return {"result": result}
+
+
+@app.post("/runs")
+async def create_run(payload: dict):
+    """Queue a run of ``payload["flow"]`` and return its id immediately.
+
+    ``priority`` is ``"interactive"`` (default) or ``"batch"``.  Requests
+    beyond the queue-depth limit of their class are shed with ``429``.
+    ``deadline_ms``, ``hedge`` and ``trace`` are passed on to ``run_flow``.
+    """
+
+    try:
+        plan = PLAN_CACHE.get(payload["flow"], NODE_CATALOG, NODE_HANDLERS)
+        run = SCHEDULER.submit(
+            plan,
+            payload.get("inputs"),
+            priority=payload.get("priority", "interactive"),
+            deadline_ms=payload.get("deadline_ms"),
+            hedge=bool(payload.get("hedge", False)),
+            trace=payload.get("trace"),
+        )
+    except QueueFull as exc:
+        raise HTTPException(status_code=429, detail=str(exc), headers={"Retry-After": "1"})
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    return {"run_id": run.run_id}
+
+
+def _ndjson_value(line: bytes):
+    try:
+        return json.loads(line)
+    except ValueError as exc:
+        return InvalidInput(f"INVALID_JSON_LINE:{exc}")
+
+
+async def _ndjson_lines(request: Request):
+    """Yield the JSON value of each non-empty line; bad lines as InvalidInput."""
+
+    buffer = b""
+    async for data in request.stream():
+        buffer += data
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield _ndjson_value(line)
+    if buffer.strip():
+        yield _ndjson_value(buffer)
+
+
+def _batch_option(header: dict, name: str, default: int) -> int:
+    value = header.get(name, default)
+    if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+        raise ValueError(f"INVALID_BATCH_OPTION:{name}")
+    return value
+
+
+@app.post("/runs/batch")
+async def create_batch(request: Request):
+    """Run a flow over many inputs and stream one JSON line per result.
+
+    The body is either JSON ``{"flow", "inputs": [...], ...options}`` or, for
+    large datasets, JSON lines: a first line with ``flow`` and the options,
+    then one input per line, read as the batch progresses.  Options are
+    ``batch_size`` and ``concurrency``, positive integers checked before
+    anything runs.  Results are streamed back as ``application/x-ndjson`` in
+    input order; an input line that is not valid JSON gets a failed record.
+    """
+
+    try:
+        if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+            lines = _ndjson_lines(request)
+            try:
+                header = await lines.__anext__()
+            except StopAsyncIteration:
+                raise ValueError("BATCH_HEADER_REQUIRED") from None
+            if isinstance(header, InvalidInput):
+                raise ValueError(header.error)
+            inputs = lines
+        else:
+            header = await request.json()
+            inputs = header.get("inputs", []) if isinstance(header, dict) else []
+        if not isinstance(header, dict) or "flow" not in header:
+            raise ValueError("FLOW_REQUIRED")
+        batch_size = _batch_option(header, "batch_size", 32)
+        concurrency = _batch_option(header, "concurrency", 4)
+        if not isinstance(inputs, list) and not hasattr(inputs, "__aiter__"):
+            raise ValueError("INPUTS_NOT_ARRAY")
+        plan = PLAN_CACHE.get(header["flow"], NODE_CATALOG, NODE_HANDLERS)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+
+    async def results():
+        async for record in run_batch(
+            plan,
+            inputs,
+            NODE_HANDLERS,
+            BATCH_HANDLERS,
+            batch_size=batch_size,
+            concurrency=concurrency,
+        ):
+            yield json.dumps(record, ensure_ascii=False, default=str) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
+@app.get("/runs")
+def list_runs(
+    flow_id: Optional[str] = None,
+    user_id: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    limit: int = 50,
+):
+    """List stored runs, newest first; ``since``/``until`` are ISO-8601 times."""
+
+    if SCHEDULER.store is None:
+        return {"runs": []}
+    runs = SCHEDULER.store.list(
+        flow_id=flow_id, user_id=user_id, since=since, until=until, limit=min(limit, 500)
+    )
+    return {"runs": runs}
+
+
+@app.get("/runs/{run_id}")
+def get_run(run_id: str):
+    """Return the RunRecord of a run, including its finished steps."""
+
+    record = SCHEDULER.store.get(run_id) if SCHEDULER.store is not None else None
+    run = SCHEDULER.get(run_id)
+    if run is not None:
+        # Live state is fresher than the write-behind copy.
+        steps = record["steps"] if record is not None else []
+        record = dict(run.to_dict(), steps=steps)
+    if record is None:
+        raise HTTPException(status_code=404, detail="RUN_NOT_FOUND")
+    return record
+
+
+@app.get("/runs/{run_id}/trace")
+def get_run_trace(run_id: str, format: str = "chrome"):
+    """Return the trace of a recently finished traced run.
+
+    ``format`` is ``chrome`` (trace-event JSON for Perfetto/chrome://tracing)
+    or ``otlp`` (OTLP-JSON).
+    """
+
+    trace = tracing.get_trace(run_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="TRACE_NOT_FOUND")
+    try:
+        return tracing.export(trace, format)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+
+
+@app.post("/runs/{run_id}/cancel")
+async def cancel_run(run_id: str):
+    run = SCHEDULER.cancel(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="RUN_NOT_FOUND")
+    return {"run_id": run_id, "status": run.status}
+
+
+@app.websocket("/runs/{run_id}/events")
+async def run_events(websocket: WebSocket, run_id: str, offset: int = 0):
+    """Stream the events of a run as JSON arrays, replaying from ``offset``.
+
+    Every event carries its ``seq``; reconnect with ``offset=seq + 1`` of the
+    last event received to resume.  The socket closes when the run ends.
+    """
+
+    run = SCHEDULER.get(run_id)
+    await websocket.accept()
+    if run is None:
+        await websocket.close(code=4404, reason="RUN_NOT_FOUND")
+        return
+    try:
+        async for frame in run.events.subscribe(offset):
+            await websocket.send_json(frame)
+    except WebSocketDisconnect:
+        return
+    await websocket.close()